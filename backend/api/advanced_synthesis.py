@@ -1,9 +1,9 @@
 import uuid
 import asyncio
 import logging
-from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from typing import List, Optional
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query
+from typing import Dict, List, Optional, Set
 from supabase import Client
 
 from backend.db.supabase import get_db
@@ -11,8 +11,8 @@ from backend.models.schemas import (
     AdvancedSynthesisRequest, AdvancedSynthesisResponse,
     SynthesisJob, SynthesisJobCreate, SynthesisJobUpdate, SynthesisJobStatus,
     ContentAnalysisResponse, QualityAssessmentResponse,
-    PromptVersionCreate, PromptVersion, SynthesisRequest, SynthesisResponse,
-    ContentSource, SourceType
+    PromptVersionCreate, PromptVersion, SynthesisRequest,
+    ContentSource, SourceType, SynthesisType
 )
 from backend.services.synthesis_engine import AdvancedSynthesisEngine
 
@@ -25,6 +25,20 @@ router = APIRouter()
 # Background synthesis jobs storage (in production, use Redis/Celery)
 synthesis_jobs_status = {}
 
+# Long-poll support for GET /synthesis-jobs/{job_id}?wait=N: each waiter blocks on its
+# own event, registered under the job and set whenever this process changes its status.
+# Jobs run in the worker that enqueued them; a waiter on another worker simply
+# times out and gets the current row.
+MAX_JOB_WAIT_SECONDS = 60
+TERMINAL_JOB_STATUSES = {SynthesisJobStatus.COMPLETED.value, SynthesisJobStatus.FAILED.value, "cancelled"}
+_job_waiters: Dict[str, Set[asyncio.Event]] = {}
+
+def _set_job_status(job_id: str, status: dict):
+    """Record a job's in-memory status and wake any long-polling readers."""
+    synthesis_jobs_status[job_id] = status
+    for event in _job_waiters.pop(job_id, ()):
+        event.set()
+
 # --- Helper Function ---
 async def _get_or_create_content_source_from_text(
     text_id: str,
@@ -33,109 +47,38 @@ async def _get_or_create_content_source_from_text(
 ) -> str:
     """
     Checks for an existing content source for a text, creates one if it doesn't exist,
-    and ensures it's linked to the correct realm.
+    and ensures it's linked to the correct realm. The get-or-create runs atomically in a
+    single round trip (see backend/utils/add_rpc_functions.sql).
     """
-    # 1. Fetch text details
-    text_res = db.table("texts").select("id, title, content, created_at").eq("id", text_id).single().execute()
-    if not text_res.data:
-        raise HTTPException(status_code=404, detail=f"Text with id {text_id} not found.")
-    text_data = text_res.data
-
-    # 2. Check if a content source already exists for this text
-    existing_source_res = db.table("content_sources").select("id, realm_id").eq("metadata->>original_text_id", str(text_id)).maybe_single().execute()
-    
-    if existing_source_res.data:
-        source_id = existing_source_res.data['id']
-        # If it exists but isn't linked to a realm, link it now.
-        if existing_source_res.data.get('realm_id') is None:
-            db.table("content_sources").update({"realm_id": realm_id}).eq("id", source_id).execute()
-            logger.info(f"Linked existing content source {source_id} to realm {realm_id}")
-        return source_id
-
-    # 3. If not, create a new content source
-    new_source_id = str(uuid.uuid4())
-    new_source = {
-        "id": new_source_id,
-        "realm_id": realm_id,
-        "source_type": SourceType.TEXT.value,
-        "title": text_data["title"],
-        "content": text_data["content"],
-        "metadata": {
-            "original_text_id": str(text_data["id"]),
-            "migrated_at": datetime.utcnow().isoformat()
-        },
-        "weight": 1.0,
-        "created_at": text_data["created_at"]
-    }
-
     try:
-        db.table("content_sources").insert(new_source).execute()
-        logger.info(f"Created new content source {new_source_id} from text {text_id} for realm {realm_id}")
-        return new_source_id
-    except Exception as e:
-        logger.error(f"Failed to create content source from text {text_id}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to create content source for synthesis.")
-
-@router.post("/texts/{text_id}/synthesize/advanced", response_model=SynthesisResponse, tags=["texts"])
-async def synthesize_text_to_realm_advanced(text_id: str, req: SynthesisRequest, db: Client = Depends(get_db)):
-    """
-    Performs advanced synthesis of a text into a realm's system prompt using the multi-stage engine.
-    """
-    realm_id = req.realm_id
-    logger.info(f"Starting ADVANCED synthesis for text_id: {text_id} into realm_id: {realm_id}")
-
-    # 1. Get or create a content source from the text
-    content_source_id = await _get_or_create_content_source_from_text(text_id, realm_id, db)
-
-    # 2. Instantiate the synthesis engine
-    synthesis_engine = AdvancedSynthesisEngine(db)
-
-    # 3. Run the full synthesis process
-    logger.info(f"Running full synthesis for realm {realm_id} using content source {content_source_id}")
-    try:
-        # The engine will fetch all sources for the realm, including the one we just made
-        synthesized_prompt, _ = await synthesis_engine.run_full_synthesis(
-            realm_id=realm_id, 
-            content_source_ids=[content_source_id] # Pass the specific source to ensure it's prioritized
+        res = await asyncio.to_thread(
+            db.rpc("get_or_create_content_source_for_text", {"p_text_id": text_id, "p_realm_id": realm_id}).execute
         )
-        logger.info(f"Received advanced synthesized prompt for realm {realm_id}:\n{synthesized_prompt}")
     except Exception as e:
-        logger.error(f"Error during advanced synthesis engine call: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to run advanced synthesis: {e}")
-
-    # 4. Update the realm's system_prompt
-    logger.info(f"Updating realm {realm_id} with new advanced system prompt.")
-    update_res = db.from_("realms").update({"system_prompt": synthesized_prompt}).eq("id", realm_id).execute()
+        logger.error(f"Failed to get or create content source from text {text_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create content source for synthesis.")
 
-    if not update_res.data:
-        logger.error(f"Failed to update realm {realm_id} with advanced prompt. Response: {update_res}")
-        raise HTTPException(status_code=500, detail="Failed to update realm.")
-    
-    logger.info(f"Successfully updated realm {realm_id} with advanced prompt.")
-        
-    return SynthesisResponse(synthesized_prompt=synthesized_prompt)
+    if not res.data:
+        raise HTTPException(status_code=404, detail=f"Text with id {text_id} not found.")
 
+    logger.info(f"Using content source {res.data} from text {text_id} for realm {realm_id}")
+    return res.data
 
-@router.post("/realms/{realm_id}/synthesize/advanced", response_model=AdvancedSynthesisResponse)
-async def start_advanced_synthesis(
+def _enqueue_synthesis_job(
     realm_id: str,
-    synthesis_request: AdvancedSynthesisRequest,
+    synthesis_type: SynthesisType,
+    content_source_ids: Optional[List[str]],
+    configuration: dict,
     background_tasks: BackgroundTasks,
-    db: Client = Depends(get_db)
-):
-    """Start an advanced synthesis job for a realm."""
-    # Verify realm exists
-    realm_response = db.table("realms").select("*").eq("id", realm_id).single().execute()
-    if not realm_response.data:
-        raise HTTPException(status_code=404, detail="Realm not found")
-    
-    # Create synthesis job record
+    db: Client
+) -> AdvancedSynthesisResponse:
+    """Record a pending synthesis job and schedule it to run after the response is sent."""
     job_id = str(uuid.uuid4())
     job_create = SynthesisJobCreate(
         realm_id=realm_id,
-        synthesis_type=synthesis_request.synthesis_type,
-        input_sources=synthesis_request.content_source_ids or [],
-        configuration=synthesis_request.configuration
+        synthesis_type=synthesis_type,
+        input_sources=content_source_ids or [],
+        configuration=configuration
     )
     
     job_data = {
@@ -145,7 +88,7 @@ async def start_advanced_synthesis(
         "synthesis_type": job_create.synthesis_type.value,
         "input_sources": job_create.input_sources,
         "configuration": job_create.configuration,
-        "created_at": datetime.utcnow().isoformat()
+        "created_at": datetime.now(timezone.utc).isoformat()
     }
     
     # Store job in database
@@ -154,18 +97,18 @@ async def start_advanced_synthesis(
         raise HTTPException(status_code=500, detail="Failed to create synthesis job")
     
     # Initialize job status tracking
-    synthesis_jobs_status[job_id] = {
+    _set_job_status(job_id, {
         "status": SynthesisJobStatus.PENDING,
         "estimated_completion": 30  # seconds
-    }
+    })
     
     # Start background synthesis task
     background_tasks.add_task(
         process_synthesis_job,
         job_id, 
         realm_id,
-        synthesis_request.content_source_ids,
-        synthesis_request.synthesis_type,
+        content_source_ids,
+        synthesis_type,
         db
     )
     
@@ -177,16 +120,93 @@ async def start_advanced_synthesis(
         estimated_completion_seconds=30
     )
 
-@router.get("/synthesis-jobs/{job_id}", response_model=SynthesisJob)
-async def get_synthesis_job_status(job_id: str, db: Client = Depends(get_db)):
-    """Get the status and results of a synthesis job."""
-    response = db.table("synthesis_jobs").select("*").eq("id", job_id).single().execute()
+@router.post("/texts/{text_id}/synthesize/advanced", response_model=AdvancedSynthesisResponse, tags=["texts"])
+async def synthesize_text_to_realm_advanced(
+    text_id: str,
+    req: SynthesisRequest,
+    background_tasks: BackgroundTasks,
+    db: Client = Depends(get_db)
+):
+    """
+    Starts advanced synthesis of a text into a realm's system prompt using the multi-stage engine.
+    Returns a job to poll via GET /synthesis-jobs/{job_id}.
+    """
+    realm_id = req.realm_id
+    logger.info(f"Starting ADVANCED synthesis for text_id: {text_id} into realm_id: {realm_id}")
+
+    # Get or create a content source from the text, then hand the engine run to a job.
+    # Passing the source id ensures it is prioritized alongside the realm's other sources.
+    content_source_id = await _get_or_create_content_source_from_text(text_id, realm_id, db)
+
+    return _enqueue_synthesis_job(
+        realm_id, SynthesisType.FULL, [content_source_id], {}, background_tasks, db
+    )
+
+@router.post("/realms/{realm_id}/synthesize/advanced", response_model=AdvancedSynthesisResponse)
+async def start_advanced_synthesis(
+    realm_id: str,
+    synthesis_request: AdvancedSynthesisRequest,
+    background_tasks: BackgroundTasks,
+    db: Client = Depends(get_db)
+):
+    """Start an advanced synthesis job for a realm."""
+    # Verify realm exists
+    realm_response = db.table("realms").select("*").eq("id", realm_id).single().execute()
+    if not realm_response.data:
+        raise HTTPException(status_code=404, detail="Realm not found")
     
+    return _enqueue_synthesis_job(
+        realm_id,
+        synthesis_request.synthesis_type,
+        synthesis_request.content_source_ids,
+        synthesis_request.configuration,
+        background_tasks,
+        db
+    )
+
+def _read_job(job_id: str, db: Client) -> dict:
+    response = db.table("synthesis_jobs").select("*").eq("id", job_id).single().execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Synthesis job not found")
-    
     return response.data
 
+@router.get("/synthesis-jobs/{job_id}", response_model=SynthesisJob)
+async def get_synthesis_job_status(
+    job_id: str,
+    wait: int = Query(0, ge=0, le=MAX_JOB_WAIT_SECONDS, description="Seconds to wait for a status change of an unfinished job"),
+    db: Client = Depends(get_db)
+):
+    """
+    Get the status and results of a synthesis job.
+    
+    With wait > 0, an unfinished job is held until its status changes or the wait
+    expires, so clients can long-poll instead of polling on a fixed interval.
+    """
+    if not wait:
+        return _read_job(job_id, db)
+    
+    # Register before reading so a change between the read and the wait is not missed
+    event = asyncio.Event()
+    _job_waiters.setdefault(job_id, set()).add(event)
+    try:
+        job = _read_job(job_id, db)
+        if job["status"] in TERMINAL_JOB_STATUSES:
+            return job
+        
+        try:
+            await asyncio.wait_for(event.wait(), timeout=wait)
+        except asyncio.TimeoutError:
+            return job
+        
+        return _read_job(job_id, db)
+    finally:
+        # Only this waiter's event is removed; other long-pollers of the job stay registered
+        waiters = _job_waiters.get(job_id)
+        if waiters is not None:
+            waiters.discard(event)
+            if not waiters:
+                del _job_waiters[job_id]
+
 @router.get("/realms/{realm_id}/synthesis-jobs", response_model=List[SynthesisJob])
 async def get_realm_synthesis_jobs(realm_id: str, db: Client = Depends(get_db)):
     """Get all synthesis jobs for a realm."""
@@ -346,7 +366,7 @@ async def analyze_realm_content(realm_id: str, db: Client = Depends(get_db)):
         "realm_name": realm_name,
         "content_sources_count": len(content_sources),
         "analysis": analysis.model_dump(),
-        "analyzed_at": datetime.utcnow().isoformat()
+        "analyzed_at": datetime.now(timezone.utc).isoformat()
     }
 
 async def process_synthesis_job(
@@ -359,7 +379,7 @@ async def process_synthesis_job(
     """Background task to process synthesis jobs."""
     try:
         # Update job status to processing
-        synthesis_jobs_status[job_id] = {"status": SynthesisJobStatus.PROCESSING}
+        _set_job_status(job_id, {"status": SynthesisJobStatus.PROCESSING})
         
         update_data = {
             "status": SynthesisJobStatus.PROCESSING.value
@@ -368,8 +388,8 @@ async def process_synthesis_job(
         
         logger.info(f"Processing synthesis job {job_id}")
         
-        # Create synthesis engine and run synthesis
-        synthesis_engine = AdvancedSynthesisEngine(db)
+        # Create synthesis engine and run synthesis (nobody waits on a job, so run it as background work)
+        synthesis_engine = AdvancedSynthesisEngine(db, background=True)
         
         synthesized_prompt, quality_analysis = await synthesis_engine.run_full_synthesis(
             realm_id,
@@ -381,7 +401,7 @@ async def process_synthesis_job(
         realm_update_data = {
             "system_prompt": synthesized_prompt,
             "quality_score": quality_analysis["quality_assessment"]["overall_quality"],
-            "last_synthesis_at": datetime.utcnow().isoformat(),
+            "last_synthesis_at": datetime.now(timezone.utc).isoformat(),
             "current_version": 1  # Will be incremented in versioning system
         }
         
@@ -400,7 +420,7 @@ async def process_synthesis_job(
             "quality_score": quality_analysis["quality_assessment"]["overall_quality"],
             "effectiveness_metrics": quality_analysis["quality_assessment"],
             "improvement_suggestions": quality_analysis["quality_assessment"]["improvement_suggestions"],
-            "created_at": datetime.utcnow().isoformat()
+            "created_at": datetime.now(timezone.utc).isoformat()
         }
         
         db.table("prompt_versions").insert(version_data).execute()
@@ -416,7 +436,7 @@ async def process_synthesis_job(
         db.table("synthesis_jobs").update(job_completion_data).eq("id", job_id).execute()
         
         # Update in-memory status
-        synthesis_jobs_status[job_id] = {"status": SynthesisJobStatus.COMPLETED}
+        _set_job_status(job_id, {"status": SynthesisJobStatus.COMPLETED})
         
         logger.info(f"Completed synthesis job {job_id} successfully")
         
@@ -432,7 +452,7 @@ async def process_synthesis_job(
         db.table("synthesis_jobs").update(error_data).eq("id", job_id).execute()
         
         # Update in-memory status
-        synthesis_jobs_status[job_id] = {"status": SynthesisJobStatus.FAILED}
+        _set_job_status(job_id, {"status": SynthesisJobStatus.FAILED})
 
 @router.delete("/synthesis-jobs/{job_id}")
 async def cancel_synthesis_job(job_id: str, db: Client = Depends(get_db)):
@@ -452,6 +472,6 @@ async def cancel_synthesis_job(job_id: str, db: Client = Depends(get_db)):
     
     # Update in-memory status
     if job_id in synthesis_jobs_status:
-        synthesis_jobs_status[job_id] = {"status": "cancelled"}
+        _set_job_status(job_id, {"status": "cancelled"})
     
     return {"message": f"Synthesis job {job_id} cancelled successfully"} 
\ No newline at end of file
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import re
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
+import orjson
+from fastapi import APIRouter, HTTPException, Request
+
+from backend.models.schemas import BatchCall, BatchCallResult
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+MAX_BATCH_CALLS = 50
+PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+# App tasks whose response has been returned but which are still running background work
+_background_calls: set = set()
+
+async def _dispatch(app, method: str, path: str, body: Any) -> BatchCallResult:
+    """
+    Run one call through the app in-process and return as soon as its response is complete;
+    background tasks the endpoint scheduled keep running afterwards, as they would over HTTP.
+    """
+    url = urlsplit(path)
+    payload = b"" if body is None else orjson.dumps(body)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method.upper(),
+        "scheme": "http",
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"batch"), (b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+        "client": None,
+        "server": ("batch", 80),
+    }
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    status = {"code": 500}
+    chunks: List[bytes] = []
+    disconnected = asyncio.Event()  # never set: the caller stays connected
+
+    async def receive():
+        nonlocal payload
+        if payload is not None:
+            message = {"type": "http.request", "body": payload, "more_body": False}
+            payload = None
+            return message
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body") and not done.done():
+                done.set_result(None)
+
+    def _finished(task: asyncio.Task):
+        _background_calls.discard(task)
+        error = None if task.cancelled() else task.exception()
+        if not done.done():
+            done.set_exception(error or RuntimeError("No response was sent"))
+        elif error:
+            # The app already answered 500 (or failed in a background task); the server would log this
+            logger.error(f"Batched {method.upper()} {path} failed: {error!r}")
+
+    task = asyncio.create_task(app(scope, receive, send))
+    _background_calls.add(task)
+    task.add_done_callback(_finished)
+    await done
+
+    content = b"".join(chunks)
+    try:
+        result_body = orjson.loads(content) if content else None
+    except orjson.JSONDecodeError:
+        result_body = content.decode(errors="replace")
+    return BatchCallResult(status_code=status["code"], body=result_body)
+
+def _dependencies(call: BatchCall) -> set:
+    return {ref.partition(".")[0] for ref in call.input_from.values()} | set(call.depends_on)
+
+def _lookup(results: Dict[str, BatchCallResult], reference: str) -> Any:
+    """Resolve "<call_id>.<field>[.<field>...]" against earlier results."""
+    call_id, _, field_path = reference.partition(".")
+    value: Any = results[call_id].body
+    for field in filter(None, field_path.split(".")):
+        if isinstance(value, list) and field.isdigit():
+            value = value[int(field)]
+        elif isinstance(value, dict):
+            value = value[field]
+        else:
+            raise KeyError(field)
+    return value
+
+async def _run_call(app, call: BatchCall, results: Dict[str, BatchCallResult]) -> BatchCallResult:
+    failed = [ref for ref in call.input_from.values() if results[ref.partition(".")[0]].status_code >= 400]
+    if failed:
+        return BatchCallResult(call_id=call.call_id, status_code=424, body={"detail": f"Dependency failed: {', '.join(failed)}"})
+    try:
+        values = {name: _lookup(results, ref) for name, ref in call.input_from.items()}
+    except (KeyError, IndexError) as e:
+        return BatchCallResult(call_id=call.call_id, status_code=424, body={"detail": f"Missing input field: {e}"})
+
+    path = PLACEHOLDER_RE.sub(lambda m: str(values.get(m.group(1), m.group(0))), call.path)
+    body = {**call.body, **values} if isinstance(call.body, dict) else call.body
+
+    result = await _dispatch(app, call.method, path, body)
+    result.call_id = call.call_id
+    return result
+
+@router.post("/batch", response_model=List[BatchCallResult])
+async def run_batch(calls: List[BatchCall], request: Request):
+    """
+    Run several API calls in one round trip. A call may take values from earlier results via
+    input_from ({"realm_id": "create_realm.id"}): they fill {realm_id} in its path and are set
+    as fields of its JSON object body. depends_on orders calls without passing values. Calls
+    run in dependency layers, each layer concurrently; a call whose input failed returns 424.
+    """
+    if len(calls) > MAX_BATCH_CALLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_CALLS} calls per batch")
+    ids = [call.call_id for call in calls]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="call_id values must be unique")
+    for call in calls:
+        if urlsplit(call.path).path.rstrip("/") == "/batch":
+            raise HTTPException(status_code=400, detail="Batches cannot be nested")
+        unknown = _dependencies(call) - set(ids)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Call {call.call_id} depends on unknown calls: {', '.join(sorted(unknown))}")
+
+    results: Dict[str, BatchCallResult] = {}
+    pending = list(calls)
+    while pending:
+        layer = [
+            call for call in pending
+            if _dependencies(call) <= results.keys()
+        ]
+        if not layer:
+            raise HTTPException(status_code=400, detail="Call dependencies form a cycle")
+        for result in await asyncio.gather(*(_run_call(request.app, call, results) for call in layer)):
+            results[result.call_id] = result
+        pending = [call for call in pending if call.call_id not in results]
+
+    return [results[call_id] for call_id in ids]
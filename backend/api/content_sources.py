@@ -1,7 +1,9 @@
+import asyncio
 import uuid
 import logging
-from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends, Query
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 from supabase import Client
 import google.generativeai as genai
@@ -12,6 +14,7 @@ from backend.models.schemas import (
     Realm, Text, Reflection
 )
 from backend.core.config import settings
+from backend.core.http_cache import conditional_response
 from backend.services.smart_synthesis_manager import SmartSynthesisManager
 
 # Configure logging
@@ -23,26 +26,87 @@ genai.configure(api_key=settings.GEMINI_API_KEY)
 
 router = APIRouter()
 
+# Columns a listing may be narrowed to with ?fields=
+CONTENT_SOURCE_FIELDS = set(ContentSource.model_fields)
+
 @router.get("/content-sources", response_model=List[ContentSource])
 async def get_content_sources(
+    request: Request,
+    response: Response,
     realm_id: Optional[str] = Query(None, description="Filter by realm ID"),
     source_type: Optional[SourceType] = Query(None, description="Filter by source type"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,title,source_type"),
     db: Client = Depends(get_db)
 ):
-    """Get all content sources with optional filtering."""
-    query = db.table("content_sources").select("*")
+    """Get all content sources with optional filtering. Supports If-None-Match (304 when unchanged)."""
+    columns = "*"
+    if fields:
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = set(requested) - CONTENT_SOURCE_FIELDS
+        if not requested or unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown content source fields: {', '.join(sorted(unknown)) or fields}")
+        columns = ",".join(requested)
+    
+    query = db.table("content_sources").select(columns)
     
     if realm_id:
         query = query.eq("realm_id", realm_id)
     if source_type:
         query = query.eq("source_type", source_type.value)
     
-    response = query.order("created_at", desc=True).execute()
+    sources = query.order("created_at", desc=True).execute().data or []
     
-    if not response.data:
-        return []
+    payload = conditional_response(request, response, sources)
+    if fields and not isinstance(payload, Response):
+        # Partial rows don't satisfy ContentSource, so bypass response_model validation
+        return ORJSONResponse(payload, headers=dict(response.headers))
+    return payload
+
+@router.head("/content-sources")
+async def count_content_sources(
+    realm_id: Optional[str] = Query(None, description="Filter by realm ID"),
+    source_type: Optional[SourceType] = Query(None, description="Filter by source type"),
+    db: Client = Depends(get_db)
+):
+    """Headers only: X-Total-Count for the same filters as GET, from a PostgREST row count."""
+    query = db.table("content_sources").select("id", count="exact", head=True)
     
-    return response.data
+    if realm_id:
+        query = query.eq("realm_id", realm_id)
+    if source_type:
+        query = query.eq("source_type", source_type.value)
+    
+    count = query.execute().count or 0
+    return Response(headers={"X-Total-Count": str(count)})
+
+# Table each migration endpoint copies from, and the metadata key recording the original row
+MIGRATION_ORIGINS = {
+    SourceType.REFLECTION: ("reflections", "original_reflection_id"),
+    SourceType.TEXT: ("texts", "original_text_id"),
+}
+
+@router.get("/content-sources/migration-status")
+async def get_migration_status(
+    request: Request,
+    response: Response,
+    source_type: SourceType = Query(..., description="reflection or text"),
+    realm_id: Optional[str] = Query(None, description="Limit reflections to one realm"),
+    db: Client = Depends(get_db)
+):
+    """
+    How many reflections/texts are not yet content sources, so callers can skip a
+    migration that has nothing to do. Supports If-None-Match.
+    """
+    if source_type not in MIGRATION_ORIGINS:
+        raise HTTPException(status_code=400, detail="Only reflection and text sources are migrated")
+    
+    # One round trip; remaining is an anti-join, not total - migrated (see add_rpc_functions.sql)
+    params = {"p_source_type": source_type.value}
+    if realm_id and source_type == SourceType.REFLECTION:
+        params["p_realm"] = realm_id
+    status = (await asyncio.to_thread(db.rpc("migration_status", params).execute)).data
+    
+    return conditional_response(request, response, {"source_type": source_type.value, **status})
 
 @router.get("/content-sources/{source_id}", response_model=ContentSource)
 async def get_content_source(source_id: str, db: Client = Depends(get_db)):
@@ -104,6 +168,43 @@ async def create_content_source(
         logger.error(f"Error creating content source: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to create content source: {str(e)}")
 
+@router.post("/content-sources/bulk", response_model=List[ContentSource])
+async def create_content_sources_bulk(
+    content_sources: List[ContentSourceCreate],
+    db: Client = Depends(get_db)
+):
+    """
+    Create many content sources in one request and one INSERT.
+    
+    Sources are stored with their lightweight analysis; no synthesis is triggered
+    (like POST /content-sources with auto_synthesize=false).
+    """
+    # Validate every referenced realm exists, in one query
+    realm_ids = {source.realm_id for source in content_sources if source.realm_id}
+    if realm_ids:
+        realms_response = db.table("realms").select("id").in_("id", list(realm_ids)).execute()
+        missing = realm_ids - {realm["id"] for realm in realms_response.data or []}
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Realm not found: {', '.join(sorted(missing))}")
+    
+    smart_manager = SmartSynthesisManager(db)
+    
+    try:
+        return await smart_manager.add_content_sources([
+            {
+                "realm_id": source.realm_id,
+                "source_type": source.source_type.value,
+                "title": source.title,
+                "content": source.content,
+                "metadata": source.metadata or {},
+                "weight": source.weight or 1.0
+            }
+            for source in content_sources
+        ])
+    except Exception as e:
+        logger.error(f"Error creating content sources in bulk: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to create content sources: {str(e)}")
+
 @router.put("/content-sources/{source_id}", response_model=ContentSource)
 async def update_content_source(
     source_id: str,
@@ -201,16 +302,21 @@ async def delete_content_source(source_id: str, db: Client = Depends(get_db)):
     return {"message": "Content source deleted successfully"}
 
 @router.get("/realms/{realm_id}/content-sources", response_model=List[ContentSource])
-async def get_realm_content_sources(realm_id: str, db: Client = Depends(get_db)):
-    """Get all content sources for a specific realm."""
+async def get_realm_content_sources(
+    realm_id: str,
+    request: Request,
+    response: Response,
+    db: Client = Depends(get_db)
+):
+    """Get all content sources for a specific realm. Supports If-None-Match (304 when unchanged)."""
     # Verify realm exists
     realm_response = db.table("realms").select("id").eq("id", realm_id).single().execute()
     if not realm_response.data:
         raise HTTPException(status_code=404, detail="Realm not found")
     
-    response = db.table("content_sources").select("*").eq("realm_id", realm_id).order("weight", desc=True).execute()
+    sources = db.table("content_sources").select("*").eq("realm_id", realm_id).order("weight", desc=True).execute().data or []
     
-    return response.data or []
+    return conditional_response(request, response, sources)
 
 @router.get("/realms/{realm_id}/content-map")
 async def get_realm_content_map(realm_id: str, db: Client = Depends(get_db)):
@@ -310,6 +416,21 @@ async def process_realm_batch_queue(realm_id: str, db: Client = Depends(get_db))
         logger.error(f"Batch processing failed for realm {realm_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Batch processing failed: {str(e)}")
 
+@router.post("/content-sources/process-batch-queues")
+async def process_all_batch_queues(db: Client = Depends(get_db)):
+    """Process the batch queues of every realm with queued content sources."""
+    smart_manager = SmartSynthesisManager(db)
+    
+    try:
+        processed_realm_ids = await smart_manager.process_all_batch_queues()
+        return {
+            "message": f"Processed batch queues for {len(processed_realm_ids)} realms",
+            "realm_ids": processed_realm_ids
+        }
+    except Exception as e:
+        logger.error(f"Batch processing failed across realms: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch processing failed: {str(e)}")
+
 @router.post("/realms/{realm_id}/force-full-synthesis")
 async def force_full_synthesis(realm_id: str, db: Client = Depends(get_db)):
     """
@@ -343,7 +464,7 @@ async def extract_lightweight_insights(source_id: str, db: Client = Depends(get_
     content_source = ContentSource(**source_data)
     
     smart_manager = SmartSynthesisManager(db)
-    analysis = await smart_manager._lightweight_content_analysis(content_source)
+    analysis = await smart_manager.refresh_lightweight_analysis(content_source)
     
     return {
         "source_id": source_id,
@@ -352,26 +473,73 @@ async def extract_lightweight_insights(source_id: str, db: Client = Depends(get_
     }
 
 # Migration utilities (unchanged but now using smart processing)
+MIGRATION_PAGE_SIZE = 1000  # PostgREST caps a single response at 1000 rows
+DEFAULT_MIGRATION_BATCH_SIZE = 500
+
+def _select_all(build_query) -> list:
+    """Read every row of a query page by page."""
+    rows = []
+    start = 0
+    while True:
+        page = build_query().range(start, start + MIGRATION_PAGE_SIZE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < MIGRATION_PAGE_SIZE:
+            return rows
+        start += MIGRATION_PAGE_SIZE
+
+def _insert_in_batches(db: Client, rows: list, batch_size: int, label: str) -> int:
+    """
+    Insert content sources batch_size rows per request; returns how many were inserted.
+    A batch that fails is retried one row at a time, logging each row that still fails.
+    """
+    inserted = 0
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        try:
+            db.table("content_sources").insert(batch, returning="minimal").execute()
+            inserted += len(batch)
+            continue
+        except Exception as e:
+            # One bad row fails the whole INSERT; retry row by row so only it is lost
+            logger.error(f"Failed to migrate {label} {i + 1}-{i + len(batch)}: {e}; retrying rows individually")
+        
+        for row in batch:
+            try:
+                db.table("content_sources").insert(row, returning="minimal").execute()
+                inserted += 1
+            except Exception as e:
+                metadata = row.get("metadata") or {}
+                original_id = metadata.get("original_reflection_id") or metadata.get("original_text_id")
+                logger.error(f"Failed to migrate {label} row {original_id}: {e}")
+    return inserted
+
 @router.post("/content-sources/migrate-from-reflections")
 async def migrate_reflections_to_content_sources(
     realm_id: Optional[str] = None,
+    batch_size: int = Query(DEFAULT_MIGRATION_BATCH_SIZE, ge=1, le=MIGRATION_PAGE_SIZE, description="Rows per insert request"),
     db: Client = Depends(get_db)
 ):
     """Migrate existing reflections to content sources (no auto-synthesis)."""
-    query = db.table("reflections").select("*")
-    if realm_id:
-        query = query.eq("realm_id", realm_id)
-    
-    reflections_response = query.execute()
-    reflections = reflections_response.data or []
-    
-    migrated_count = 0
+    def reflections_query():
+        query = db.table("reflections").select("id,realm_id,question,answer,importance_score,created_at")
+        if realm_id:
+            query = query.eq("realm_id", realm_id)
+        return query.order("id")
+    
+    reflections = _select_all(reflections_query)
+    # Already-migrated reflection ids, read once instead of one lookup per reflection
+    migrated = {
+        row["reflection_id"] for row in _select_all(
+            lambda: db.table("content_sources")
+            .select("reflection_id:metadata->>original_reflection_id")
+            .eq("source_type", "reflection")
+            .order("id")
+        )
+    }
     
+    new_sources = []
     for reflection in reflections:
-        # Check if already migrated
-        existing = db.table("content_sources").select("id").eq("source_type", "reflection").contains("metadata", {"original_reflection_id": reflection["id"]}).execute()
-        
-        if existing.data:
+        if str(reflection["id"]) in migrated:
             continue  # Already migrated
         
         # Create content from Q&A
@@ -381,7 +549,7 @@ async def migrate_reflections_to_content_sources(
         else:
             content += f"\nA: [Unanswered]"
         
-        new_source = {
+        new_sources.append({
             "id": str(uuid.uuid4()),
             "realm_id": reflection["realm_id"],
             "source_type": "reflection",
@@ -391,41 +559,45 @@ async def migrate_reflections_to_content_sources(
                 "original_reflection_id": reflection["id"],
                 "question": reflection["question"],
                 "answer": reflection.get("answer"),
-                "migrated_at": datetime.utcnow().isoformat()
+                "migrated_at": datetime.now(timezone.utc).isoformat()
             },
             "weight": reflection.get("importance_score", 1.0),
             "created_at": reflection["created_at"]
-        }
-        
-        try:
-            db.table("content_sources").insert(new_source).execute()
-            migrated_count += 1
-        except Exception as e:
-            logger.error(f"Failed to migrate reflection {reflection['id']}: {e}")
+        })
+    
+    migrated_count = _insert_in_batches(db, new_sources, batch_size, "reflections")
     
     return {
         "message": f"Migrated {migrated_count} reflections to content sources",
         "migrated_count": migrated_count,
+        "failed_count": len(new_sources) - migrated_count,
         "realm_id": realm_id,
         "note": "Migration completed without auto-synthesis. Use /process-batch-queue or /force-full-synthesis to update prompts."
     }
 
 @router.post("/content-sources/migrate-from-texts")
-async def migrate_texts_to_content_sources(db: Client = Depends(get_db)):
+async def migrate_texts_to_content_sources(
+    batch_size: int = Query(DEFAULT_MIGRATION_BATCH_SIZE, ge=1, le=MIGRATION_PAGE_SIZE, description="Rows per insert request"),
+    db: Client = Depends(get_db)
+):
     """Migrate existing texts to content sources (no auto-synthesis)."""
-    texts_response = db.table("texts").select("*").execute()
-    texts = texts_response.data or []
-    
-    migrated_count = 0
+    texts = _select_all(lambda: db.table("texts").select("id,title,content,source_file_name,created_at").order("id"))
+    # Already-migrated text ids, read once instead of one lookup per text
+    migrated = {
+        row["text_id"] for row in _select_all(
+            lambda: db.table("content_sources")
+            .select("text_id:metadata->>original_text_id")
+            .eq("source_type", "text")
+            .order("id")
+        )
+    }
     
+    new_sources = []
     for text in texts:
-        # Check if already migrated
-        existing = db.table("content_sources").select("id").eq("source_type", "text").contains("metadata", {"original_text_id": str(text["id"])}).execute()
-        
-        if existing.data:
+        if str(text["id"]) in migrated:
             continue  # Already migrated
         
-        new_source = {
+        new_sources.append({
             "id": str(uuid.uuid4()),
             "realm_id": None,  # Texts don't have realm associations yet
             "source_type": "text",
@@ -434,20 +606,17 @@ async def migrate_texts_to_content_sources(db: Client = Depends(get_db)):
             "metadata": {
                 "original_text_id": str(text["id"]),
                 "source_file_name": text.get("source_file_name"),
-                "migrated_at": datetime.utcnow().isoformat()
+                "migrated_at": datetime.now(timezone.utc).isoformat()
             },
             "weight": 1.0,
             "created_at": text["created_at"]
-        }
-        
-        try:
-            db.table("content_sources").insert(new_source).execute()
-            migrated_count += 1
-        except Exception as e:
-            logger.error(f"Failed to migrate text {text['id']}: {e}")
+        })
+    
+    migrated_count = _insert_in_batches(db, new_sources, batch_size, "texts")
     
     return {
         "message": f"Migrated {migrated_count} texts to content sources",
         "migrated_count": migrated_count,
+        "failed_count": len(new_sources) - migrated_count,
         "note": "Migration completed without auto-synthesis. Assign to realms and use synthesis endpoints to update prompts."
     } 
\ No newline at end of file
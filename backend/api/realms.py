@@ -1,10 +1,13 @@
+import asyncio
 import uuid
 import json
 import logging
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from typing import List
 from supabase import Client
 import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted
 
 from backend.db.supabase import get_db
 from backend.models.schemas import (
@@ -13,6 +16,9 @@ from backend.models.schemas import (
     OnboardingRequest, OnboardingResponse
 )
 from backend.core.config import settings
+from backend.core.http_cache import conditional_response
+from backend.core.sse import sse_event
+from backend.services.gemini import generate_content
 
 # Configure the Gemini API
 genai.configure(api_key=settings.GEMINI_API_KEY)
@@ -21,6 +27,9 @@ genai.configure(api_key=settings.GEMINI_API_KEY)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Models are stateless, so one instance is shared by every request.
+GEMINI_FLASH = genai.GenerativeModel('gemini-2.5-flash')
+
 router = APIRouter()
 
 DEFAULT_REALM_NAME = "About Me"
@@ -34,14 +43,34 @@ DEFAULT_REFLECTION_QUESTIONS = [
     "What is your general life philosophy or worldview?",
 ]
 
+# Prompt skeleton for Q&A synthesis; only the variable slots are filled per request.
+REALM_SYNTHESIS_PROMPT_TEMPLATE = """You are an AI assistant helping a user refine their personal profile.
+The user's current profile about '{realm_name}' is:
+---
+{existing_prompt}
+---
+
+Now, augment and refine this profile using the following new questions and answers.
+Create a concise background profile that captures key traits, goals, preferences, and relevant context about the user.
+
+Focus on factual information that would help an AI assistant provide better, more contextually relevant responses.
+Write this as background information about the user, not as instructions.
+Keep it concise and avoid overly complimentary language.
+
+New Q&A:
+{qa_pairs}
+
+Updated Profile:
+"""
+
 @router.get("/realms", response_model=List[Realm])
-async def get_realms(db: Client = Depends(get_db)):
+async def get_realms(request: Request, response: Response, db: Client = Depends(get_db)):
     """
     Get all realms, ensuring the default 'About Me' realm exists and is first.
     If it doesn't exist, create it with default reflection questions.
+    Supports If-None-Match: an unchanged listing is answered with 304.
     """
-    response = db.table("realms").select("*").execute()
-    realms = response.data or []
+    realms = db.table("realms").select("*").execute().data or []
 
     about_me_realm = next((r for r in realms if r.get("name") == DEFAULT_REALM_NAME), None)
 
@@ -73,14 +102,13 @@ async def get_realms(db: Client = Depends(get_db)):
         logger.info(f"Created About Me realm {new_realm_id} with synthesis disabled")
         
         # Re-fetch realms to include the new one
-        response = db.table("realms").select("*").execute()
-        realms = response.data or []
+        realms = db.table("realms").select("*").execute().data or []
         about_me_realm = created_realm
 
     # Sort to bring "About Me" to the front
     realms.sort(key=lambda r: r.get("name") != DEFAULT_REALM_NAME)
     
-    return realms
+    return conditional_response(request, response, realms)
 
 @router.get("/realms/{realm_id}", response_model=Realm)
 async def get_realm(realm_id: str, db: Client = Depends(get_db)):
@@ -117,11 +145,11 @@ async def update_realm(realm_id: str, realm_update: RealmUpdate, db: Client = De
     if not target_realm_response.data:
         raise HTTPException(status_code=404, detail="Realm not found.")
 
-    if target_realm_response.data['name'] == DEFAULT_REALM_NAME and 'name' in realm_update.dict(exclude_unset=True):
+    if target_realm_response.data['name'] == DEFAULT_REALM_NAME and 'name' in realm_update.model_dump(exclude_unset=True):
          if realm_update.name != DEFAULT_REALM_NAME:
             raise HTTPException(status_code=400, detail=f"Cannot rename the '{DEFAULT_REALM_NAME}' realm.")
 
-    update_data = realm_update.dict(exclude_unset=True)
+    update_data = realm_update.model_dump(exclude_unset=True)
     response = db.table("realms").update(update_data).eq("id", realm_id).execute()
     
     if not response.data:
@@ -161,7 +189,7 @@ async def generate_questions(realm_id: str, db: Client = Depends(get_db)):
 
     # 2. Generate questions using Gemini
     prompt = f"Generate 3-5 simple, open-ended reflection questions about '{realm_name}'. Return as a JSON list. Example: [\"What is...\", \"How does...\"]"
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    model = GEMINI_FLASH
     try:
         response = await model.generate_content_async(prompt)
         # Clean the response to extract the JSON part
@@ -170,20 +198,31 @@ async def generate_questions(realm_id: str, db: Client = Depends(get_db)):
     except (json.JSONDecodeError, Exception) as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate or parse questions: {e}")
 
-    # 3. Save questions to the 'reflections' table
+    # 3. Save questions to the 'reflections' table; retries are a no-op for
+    # questions that already exist thanks to the (realm_id, question) unique index.
+    questions = list(dict.fromkeys(questions))
     reflections_to_insert = [
         {"realm_id": realm_id, "question": q} for q in questions
     ]
-    
-    insert_res = db.table("reflections").insert(reflections_to_insert).execute()
-    if not insert_res.data:
+
+    insert_res = db.table("reflections").upsert(
+        reflections_to_insert,
+        on_conflict="realm_id,question",
+        ignore_duplicates=True,
+        returning="representation",
+    ).execute()
+    if len(insert_res.data) == len(questions):
+        return insert_res.data
+
+    # Some questions were already saved by an earlier call; return the full set.
+    existing_res = db.table("reflections").select("*").eq("realm_id", realm_id).in_("question", questions).execute()
+    if not existing_res.data:
         raise HTTPException(status_code=500, detail="Failed to save generated questions.")
 
-    return insert_res.data
+    return existing_res.data
 
-@router.post("/realms/{realm_id}/synthesize", response_model=SynthesisResponse)
-async def synthesize_realm(realm_id: str, db: Client = Depends(get_db)):
-    """Synthesize Q&A pairs into a system prompt and update the realm."""
+def _build_realm_synthesis_prompt(realm_id: str, db: Client) -> str:
+    """Fetch the realm and its answered reflections and build the synthesis prompt."""
     logger.info(f"Starting synthesis for realm_id: {realm_id}")
 
     # 1. Fetch realm name and existing prompt
@@ -199,45 +238,38 @@ async def synthesize_realm(realm_id: str, db: Client = Depends(get_db)):
     if not reflections_res.data:
         raise HTTPException(status_code=404, detail="No reflections found for this realm.")
 
-    # 3. Format Q&A for the prompt
-    qa_pairs = ""
-    answered_reflections = 0
-    for reflection in reflections_res.data:
-        if reflection.get('answer'): # Only include answered questions
-            qa_pairs += f"Q: {reflection['question']}\\nA: {reflection['answer']}\\n\\n"
-            answered_reflections += 1
-    
-    logger.info(f"Found {answered_reflections} answered reflections for synthesis.")
+    # 3. Format Q&A for the prompt (only answered questions)
+    answered = [r for r in reflections_res.data if r.get('answer')]
+    qa_pairs = "".join(f"Q: {r['question']}\nA: {r['answer']}\n\n" for r in answered)
+
+    logger.info(f"Found {len(answered)} answered reflections for synthesis.")
 
     if not qa_pairs:
         raise HTTPException(status_code=400, detail="No answered reflections to synthesize.")
 
-    # 4. Call Gemini to synthesize the prompt
-    synthesis_prompt = f"""
-    You are an AI assistant helping a user refine their personal profile.
-    The user's current profile about '{realm_name}' is:
-    ---
-    {existing_prompt or "No existing prompt."}
-    ---
-
-    Now, augment and refine this profile using the following new questions and answers.
-    Create a concise background profile that captures key traits, goals, preferences, and relevant context about the user.
-    
-    Focus on factual information that would help an AI assistant provide better, more contextually relevant responses.
-    Write this as background information about the user, not as instructions.
-    Keep it concise and avoid overly complimentary language.
-
-    New Q&A:
-    {qa_pairs}
-    
-    Updated Profile:
-    """
+    # 4. Build the synthesis prompt
+    synthesis_prompt = REALM_SYNTHESIS_PROMPT_TEMPLATE.format_map({
+        "realm_name": realm_name,
+        "existing_prompt": existing_prompt or "No existing prompt.",
+        "qa_pairs": qa_pairs,
+    })
     logger.info(f"Sending synthesis prompt to Gemini for realm '{realm_name}'.")
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    return synthesis_prompt
+
+@router.post("/realms/{realm_id}/synthesize", response_model=SynthesisResponse)
+async def synthesize_realm(realm_id: str, db: Client = Depends(get_db)):
+    """Synthesize Q&A pairs into a system prompt and update the realm."""
+    synthesis_prompt = _build_realm_synthesis_prompt(realm_id, db)
+
+    # 4. Call Gemini to synthesize the prompt
+    model = GEMINI_FLASH
     try:
-        response = await model.generate_content_async(synthesis_prompt)
+        response = await generate_content(model, synthesis_prompt)
         synthesized_prompt = response.text.strip()
         logger.info(f"Received synthesized prompt from Gemini:\\n{synthesized_prompt}")
+    except ResourceExhausted as e:
+        logger.error(f"Gemini quota exhausted after retries: {e}")
+        raise HTTPException(status_code=429, detail="Gemini quota exhausted, please try again shortly.")
     except Exception as e:
         logger.error(f"Error during Gemini API call: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to synthesize prompt: {e}")
@@ -249,10 +281,67 @@ async def synthesize_realm(realm_id: str, db: Client = Depends(get_db)):
     if not update_res.data:
         logger.error(f"Failed to update realm {realm_id} in Supabase. Response: {update_res}")
         raise HTTPException(status_code=500, detail="Failed to update realm with synthesized prompt.")
-    
+
     logger.info(f"Successfully updated realm {realm_id}.")
-        
-    return SynthesisResponse(synthesized_prompt=synthesized_prompt) 
+
+    return SynthesisResponse(synthesized_prompt=synthesized_prompt)
+
+def _save_streamed_prompt(realm_id: str, synthesized_prompt: str, db: Client) -> bool:
+    """Persist the fully streamed prompt to the realm."""
+    update_res = db.from_("realms").update({"system_prompt": synthesized_prompt}).eq("id", realm_id).execute()
+    if not update_res.data:
+        logger.error(f"Failed to update realm {realm_id} in Supabase. Response: {update_res}")
+        return False
+
+    logger.info(f"Successfully updated realm {realm_id} from streamed synthesis.")
+    return True
+
+async def _stream_synthesized_prompt(realm_id: str, synthesis_prompt: str, db: Client):
+    """
+    Streams the synthesized prompt from Gemini as SSE `data:` events, then saves the
+    full prompt to the realm and finishes with a `done` (or `error`) event. The save
+    only happens once the whole prompt has been generated, so a client that disconnects
+    mid-stream never leaves a truncated prompt behind.
+    """
+    model = GEMINI_FLASH
+    chunks: List[str] = []
+    try:
+        response = await generate_content(model, synthesis_prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield sse_event(chunk.text)
+    except Exception as e:
+        logger.error(f"Error during streamed Gemini synthesis for realm {realm_id}: {e}")
+        yield sse_event(f"Failed to synthesize prompt: {e}", event="error")
+        return
+
+    synthesized_prompt = "".join(chunks).strip()
+    if not synthesized_prompt:
+        logger.error(f"Streamed synthesis for realm {realm_id} produced no output; realm not updated.")
+        yield sse_event("Synthesis produced no output.", event="error")
+        return
+
+    # The write is a blocking supabase-py call; keep it off the event loop.
+    saved = await asyncio.to_thread(_save_streamed_prompt, realm_id, synthesized_prompt, db)
+    if not saved:
+        yield sse_event("Failed to update realm with synthesized prompt.", event="error")
+        return
+
+    yield sse_event("", event="done")
+
+@router.post("/realms/{realm_id}/synthesize/stream")
+async def stream_synthesize_realm(realm_id: str, db: Client = Depends(get_db)):
+    """
+    Streams the synthesized system prompt back as server-sent events while it is generated.
+    The realm is updated once generation completes, before the final `done` event.
+    """
+    synthesis_prompt = _build_realm_synthesis_prompt(realm_id, db)
+
+    return StreamingResponse(
+        _stream_synthesized_prompt(realm_id, synthesis_prompt, db),
+        media_type="text/event-stream"
+    )
 
 # --- New Onboarding and Smart Creation Endpoints ---
 
@@ -361,7 +450,7 @@ async def generate_prompt(request: GeneratePromptRequest):
     Write a system prompt that captures the essence of this realm:
     """
     
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    model = GEMINI_FLASH
     try:
         response = await model.generate_content_async(generation_prompt)
         system_prompt = response.text.strip()
@@ -446,7 +535,7 @@ async def onboard_new_realm(request: OnboardingRequest, db: Client = Depends(get
         Return as a JSON array of strings.
         """
         
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        model = GEMINI_FLASH
         try:
             questions_response = await model.generate_content_async(questions_prompt)
             questions_text = questions_response.text.strip().replace("```json", "").replace("```", "").strip()
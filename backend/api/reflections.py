@@ -8,13 +8,16 @@ from backend.models.schemas import Reflection
 
 router = APIRouter()
 
+# Every column the Reflection response model exposes, so list rows match single reads
+REFLECTION_LIST_COLUMNS = "id, realm_id, question, answer, category, importance_score, last_synthesized_at, created_at"
+
 class ReflectionUpdate(BaseModel):
     answer: str
 
 @router.get("/realms/{realm_id}/reflections", response_model=List[Reflection])
 async def get_reflections(realm_id: str):
     """Get all unanswered reflections for a given realm."""
-    response = supabase_client.table("reflections").select("*").eq("realm_id", realm_id).is_("answer", "null").execute()
+    response = supabase_client.table("reflections").select(REFLECTION_LIST_COLUMNS).eq("realm_id", realm_id).is_("answer", "null").execute()
     if response.data is None:
         return []
     return response.data
@@ -22,7 +25,7 @@ async def get_reflections(realm_id: str):
 @router.get("/realms/{realm_id}/reflections/archived", response_model=List[Reflection])
 async def get_archived_reflections(realm_id: str):
     """Get all answered reflections for a given realm."""
-    response = supabase_client.table("reflections").select("*").eq("realm_id", realm_id).not_.is_("answer", "null").execute()
+    response = supabase_client.table("reflections").select(REFLECTION_LIST_COLUMNS).eq("realm_id", realm_id).not_.is_("answer", "null").execute()
     if response.data is None:
         return []
     return response.data
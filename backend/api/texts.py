@@ -1,17 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-import uuid
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional, Tuple
+from cachetools import TTLCache
+import orjson
+import redis.asyncio as redis
 import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted
 from supabase import Client
+from postgrest import AsyncPostgrestClient
+import asyncio
+import hashlib
 import logging
-from datetime import datetime
+import string
+import time
 
-from backend.db.supabase import supabase_client, get_db
-from backend.models.schemas import Text, TextCreate, TextUpdate, SynthesisRequest, SynthesisResponse
+from backend.db.supabase import get_db, get_async_db
+from backend.db.loaders import TextLoader, get_text_loader
+from backend.models.schemas import Text, TextSummary, TextCreate, TextUpdate, SynthesisRequest, SynthesisResponse
 from backend.core.config import settings
-from backend.services.synthesis_engine import AdvancedSynthesisEngine
-from backend.models.schemas import ContentSource, SourceType
+from backend.core.sse import sse_event
+from backend.core.http_cache import conditional_response, etag_for
+from backend.services.prompt_cache import get_realm_synthesis_model, invalidate_realm_cache
+from backend.services.gemini import generate_content
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,156 +30,260 @@ logger = logging.getLogger(__name__)
 # Configure the Gemini API
 genai.configure(api_key=settings.GEMINI_API_KEY)
 
-router = APIRouter()
+# Models are stateless, so one instance is shared by every request.
+GEMINI_FLASH = genai.GenerativeModel('gemini-2.5-flash')
 
-class TextCreate(BaseModel):
-    title: str
-    content: str
+router = APIRouter()
 
-class TextUpdate(BaseModel):
-    title: str
-    content: str
+# Every column the Text response model exposes, so list rows match single reads
+TEXT_LIST_COLUMNS = "id, title, content, source_file_name, processing_metadata, synthesis_history, created_at"
+# Columns for lightweight listings that don't need the text bodies.
+TEXT_SUMMARY_COLUMNS = "id, title, created_at"
+
+# Read-through cache for GET /texts and GET /texts/{id}, invalidated on every write.
+# Values are (payload, etag) so conditional requests never re-hash the payload.
+# List pages are keyed by (columns, offset, limit) and all dropped on any write.
+# With REDIS_URL set the entries live in Redis, so a write on any worker invalidates them
+# for all; list pages share one hash so a single DEL drops them. Without Redis they are
+# per-process TTLCaches, used only when one worker serves the API: with several, a write
+# would only invalidate the worker that handled it. Local entries are only touched
+# between awaits on the event loop, so no lock is needed.
+TEXTS_CACHE_TTL_SECONDS = 30
+TEXT_CACHE_KEY = "texts:item:{text_id}"
+TEXT_LISTS_CACHE_KEY = "texts:lists"
+_redis = redis.from_url(settings.REDIS_URL) if settings.REDIS_URL else None
+_local_cache_enabled = _redis is None and settings.WEB_CONCURRENCY <= 1
+_texts_cache: TTLCache = TTLCache(maxsize=1024, ttl=TEXTS_CACHE_TTL_SECONDS)
+_text_lists_cache: TTLCache = TTLCache(maxsize=128, ttl=TEXTS_CACHE_TTL_SECONDS)
+
+async def _cached_text(text_id: str) -> Optional[Tuple[Any, str]]:
+    if _redis:
+        value = await _redis.get(TEXT_CACHE_KEY.format(text_id=text_id))
+        return tuple(orjson.loads(value)) if value else None
+    return _texts_cache.get(text_id) if _local_cache_enabled else None
+
+async def _store_text(text_id: str, cached: Tuple[Any, str]):
+    if _redis:
+        await _redis.set(TEXT_CACHE_KEY.format(text_id=text_id), orjson.dumps(cached), ex=TEXTS_CACHE_TTL_SECONDS)
+    elif _local_cache_enabled:
+        _texts_cache[text_id] = cached
+
+async def _cached_text_list(cache_key: Tuple) -> Optional[Tuple[Any, str]]:
+    if _redis:
+        value = await _redis.hget(TEXT_LISTS_CACHE_KEY, orjson.dumps(cache_key))
+        return tuple(orjson.loads(value)) if value else None
+    return _text_lists_cache.get(cache_key) if _local_cache_enabled else None
+
+async def _store_text_list(cache_key: Tuple, cached: Tuple[Any, str]):
+    if _redis:
+        async with _redis.pipeline(transaction=False) as pipe:
+            pipe.hset(TEXT_LISTS_CACHE_KEY, orjson.dumps(cache_key), orjson.dumps(cached))
+            # The hash expires as a whole, TTL seconds after its first page was stored
+            pipe.expire(TEXT_LISTS_CACHE_KEY, TEXTS_CACHE_TTL_SECONDS, nx=True)
+            await pipe.execute()
+    elif _local_cache_enabled:
+        _text_lists_cache[cache_key] = cached
+
+async def _invalidate_texts_cache(text_id: Optional[str] = None):
+    if _redis:
+        keys = [TEXT_LISTS_CACHE_KEY]
+        if text_id is not None:
+            keys.append(TEXT_CACHE_KEY.format(text_id=text_id))
+        await _redis.delete(*keys)
+        return
+    _text_lists_cache.clear()
+    if text_id is not None:
+        _texts_cache.pop(text_id, None)
+
+# Text synthesis prompt, split so the static scaffolding and the realm's current
+# profile can be served from a Gemini context cache and only the text is sent per call.
+TEXT_SYNTHESIS_INSTRUCTION = """You are an AI assistant helping a user refine their personal profile.
+Augment and refine the user's current profile using the new text that follows it.
+Create a concise background profile that captures key traits, goals, preferences, and relevant context about the user.
+
+Focus on factual information that would help an AI assistant provide better, more contextually relevant responses.
+Write this as background information about the user, not as instructions.
+Keep it concise and avoid overly complimentary language.
+"""
+
+TEXT_SYNTHESIS_PROFILE_TEMPLATE = """The user's current profile about '{realm_name}' is:
+---
+{existing_prompt}
+---
+"""
+
+TEXT_SYNTHESIS_REQUEST_TEMPLATE = """New Text:
+{text_content}
+
+Updated Profile:
+"""
+
+async def _list_texts(
+    request: Request,
+    response: Response,
+    db: AsyncPostgrestClient,
+    columns: str,
+    offset: int,
+    limit: Optional[int]
+):
+    """Newest-first text listing with optional pagination, served through the list cache."""
+    cache_key = (columns, offset, limit)
+    cached = await _cached_text_list(cache_key)
+    if cached is None:
+        query = db.from_("texts").select(columns).order("created_at", desc=True)
+        if limit is not None:
+            query = query.range(offset, offset + limit - 1)
+        elif offset:
+            query = query.offset(offset)
+        result = await query.execute()
+        texts = result.data or []
+        cached = (texts, etag_for(texts))
+        await _store_text_list(cache_key, cached)
+
+    texts, etag = cached
+    return conditional_response(request, response, texts, etag)
 
 @router.get("/texts", response_model=List[Text])
-async def get_texts(db: Client = Depends(get_db)):
-    """Get all text entries."""
-    response = supabase_client.table("texts").select("*").order("created_at", desc=True).execute()
-    if response.data is None:
-        return []
-    return response.data
+async def get_texts(
+    request: Request,
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    db: AsyncPostgrestClient = Depends(get_async_db)
+):
+    """Get all text entries, optionally paginated with offset/limit."""
+    return await _list_texts(request, response, db, TEXT_LIST_COLUMNS, offset, limit)
+
+@router.get("/texts/summaries", response_model=List[TextSummary])
+async def get_text_summaries(
+    request: Request,
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    db: AsyncPostgrestClient = Depends(get_async_db)
+):
+    """List texts without their content; fetch GET /texts/{id} for the full entry."""
+    return await _list_texts(request, response, db, TEXT_SUMMARY_COLUMNS, offset, limit)
 
 @router.post("/texts", response_model=Text)
-async def create_text(text_create: TextCreate):
+async def create_text(text_create: TextCreate, db: AsyncPostgrestClient = Depends(get_async_db)):
     """Create a new text entry."""
-    response = supabase_client.table("texts").insert(text_create.dict()).execute()
+    response = await db.from_("texts").insert(text_create.model_dump()).execute()
     if not response.data:
         raise HTTPException(status_code=500, detail="Error creating text entry")
+    await _invalidate_texts_cache()
     return response.data[0]
 
 @router.get("/texts/{text_id}", response_model=Text)
-async def get_text(text_id: str):
+async def get_text(
+    text_id: str,
+    request: Request,
+    response: Response,
+    loader: TextLoader = Depends(get_text_loader)
+):
     """Get a single text entry by ID."""
-    response = supabase_client.table("texts").select("*").eq("id", text_id).single().execute()
-    if not response.data:
-        raise HTTPException(status_code=404, detail="Text not found")
-    return response.data
+    cached = await _cached_text(text_id)
+    if cached is None:
+        text = await loader.load(text_id)
+        if not text:
+            raise HTTPException(status_code=404, detail="Text not found")
+        cached = (text, etag_for(text))
+        await _store_text(text_id, cached)
+
+    text, etag = cached
+    return conditional_response(request, response, text, etag)
 
 @router.put("/texts/{text_id}", response_model=Text)
-async def update_text(text_id: str, text_update: TextUpdate, db: Client = Depends(get_db)):
+async def update_text(text_id: str, text_update: TextUpdate, db: AsyncPostgrestClient = Depends(get_async_db)):
     """Update a text entry."""
-    update_data = text_update.dict()
-    response = db.table("texts").update(update_data).eq("id", text_id).execute()
+    update_data = text_update.model_dump(exclude_unset=True, exclude_none=True)
+    if not update_data:
+        raise HTTPException(status_code=400, detail="No fields provided to update")
+    response = await db.from_("texts").update(update_data).eq("id", text_id).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Text not found or error updating")
+    await _invalidate_texts_cache(text_id)
     return response.data[0]
 
 @router.delete("/texts/{text_id}", status_code=204)
-async def delete_text(text_id: str):
+async def delete_text(text_id: str, db: AsyncPostgrestClient = Depends(get_async_db)):
     """Delete a text entry."""
-    response = supabase_client.table("texts").delete().eq("id", text_id).execute()
-    if not response.data:
+    response = await db.from_("texts").delete(count="exact", returning="minimal").eq("id", text_id).execute()
+    await _invalidate_texts_cache(text_id)
+    if not response.count:
         raise HTTPException(status_code=404, detail="Text not found")
-    return 
+    return Response(status_code=204)
 
-# --- New Helper Function ---
-async def _get_or_create_content_source_from_text(
-    text_id: str,
-    realm_id: str,
-    db: Client = Depends(get_db)
-) -> str:
-    """
-    Checks for an existing content source for a text, creates one if it doesn't exist,
-    and ensures it's linked to the correct realm.
-    """
-    # 1. Fetch text details
-    text_res = db.table("texts").select("id, title, content, created_at").eq("id", text_id).single().execute()
-    if not text_res.data:
-        raise HTTPException(status_code=404, detail=f"Text with id {text_id} not found.")
-    text_data = text_res.data
-
-    # 2. Check if a content source already exists for this text
-    existing_source_res = db.table("content_sources").select("id, realm_id").eq("metadata->>original_text_id", text_id).maybe_single().execute()
-    
-    if existing_source_res.data:
-        source_id = existing_source_res.data['id']
-        # If it exists but isn't linked to a realm, link it now.
-        if existing_source_res.data.get('realm_id') is None:
-            db.table("content_sources").update({"realm_id": realm_id}).eq("id", source_id).execute()
-            logger.info(f"Linked existing content source {source_id} to realm {realm_id}")
-        return source_id
-
-    # 3. If not, create a new content source
-    new_source_id = str(uuid.uuid4())
-    new_source = {
-        "id": new_source_id,
-        "realm_id": realm_id,
-        "source_type": SourceType.TEXT.value,
-        "title": text_data["title"],
-        "content": text_data["content"],
-        "metadata": {
-            "original_text_id": str(text_data["id"]),
-            "migrated_at": datetime.utcnow().isoformat()
-        },
-        "weight": 1.0,
-        "created_at": text_data["created_at"]
-    }
+# --- Logic moved from synthesis.py ---
 
-    try:
-        db.table("content_sources").insert(new_source).execute()
-        logger.info(f"Created new content source {new_source_id} from text {text_id} for realm {realm_id}")
-        return new_source_id
-    except Exception as e:
-        logger.error(f"Failed to create content source from text {text_id}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to create content source for synthesis.")
+INSIGHT_PROMPT_TEMPLATE = string.Template("""Given the following text and the context of the '$realm' realm, which is about '$realm_prompt',
+extract a single, concise insight. The insight should be a statement or observation that fits into the realm's theme.
 
+Text:
+---
+$text
+---
 
-# --- Logic moved from synthesis.py ---
+Realm: $realm
+Insight:
+""")
+
+INSIGHT_CACHE_TTL_SECONDS = 6 * 60 * 60
+INSIGHT_CACHE_MAX_ENTRIES = 512
+
+# (realm_name, realm_prompt_hash, normalized_text_hash) -> (insight, monotonic expiry)
+_insight_cache: Dict[Tuple[str, str, str], Tuple[str, float]] = {}
 
-class SynthesizeRequest(BaseModel):
-    realm_id: str
+def _insight_cache_key(text_content: str, realm_name: str, realm_prompt: str) -> Tuple[str, str, str]:
+    """Keys near-duplicate texts (case and whitespace edits) to the same entry for a realm."""
+    normalized_text = " ".join(text_content.lower().split())
+    return (
+        realm_name,
+        hashlib.sha256((realm_prompt or "").encode("utf-8")).hexdigest(),
+        hashlib.sha256(normalized_text.encode("utf-8")).hexdigest(),
+    )
 
 async def generate_insight_from_text(text_content: str, realm_name: str, realm_prompt: str) -> str:
     """
     Uses the LLM to generate a concise insight from text for a specific realm.
+    Results are cached per realm prompt, so a changed realm prompt never serves a stale insight.
     """
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    
-    prompt = f"""
-    Given the following text and the context of the '{realm_name}' realm, which is about '{realm_prompt}', 
-    extract a single, concise insight. The insight should be a statement or observation that fits into the realm's theme.
-
-    Text:
-    ---
-    {text_content}
-    ---
-
-    Realm: {realm_name}
-    Insight:
-    """
+    cache_key = _insight_cache_key(text_content, realm_name, realm_prompt)
+    cached = _insight_cache.get(cache_key)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+
+    prompt = INSIGHT_PROMPT_TEMPLATE.substitute(
+        text=text_content, realm=realm_name, realm_prompt=realm_prompt
+    )
 
     try:
-        response = await model.generate_content_async(prompt)
-        return response.text.strip()
+        response = await generate_content(GEMINI_FLASH, prompt)
+        insight = response.text.strip()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate insight from text: {e}")
 
-@router.post("/texts/{text_id}/synthesize", response_model=SynthesisResponse)
-async def synthesize_text_to_realm(text_id: str, req: SynthesisRequest, db: Client = Depends(get_db)):
-    """
-    Synthesizes the content of a text and updates the system prompt of a specified realm.
-    """
-    realm_id = req.realm_id
+    if len(_insight_cache) >= INSIGHT_CACHE_MAX_ENTRIES:
+        # Evict the oldest entry (dicts keep insertion order)
+        _insight_cache.pop(next(iter(_insight_cache)))
+    _insight_cache[cache_key] = (insight, time.monotonic() + INSIGHT_CACHE_TTL_SECONDS)
+    return insight
+
+async def _prepare_text_synthesis(text_id: str, realm_id: str, db: Client) -> Tuple[genai.GenerativeModel, str]:
+    """Fetch the text and target realm and return the model and prompt to send."""
     logger.info(f"Starting synthesis for text_id: {text_id} into realm_id: {realm_id}")
 
-    # 1. Fetch text content
-    text_res = db.from_("texts").select("content").eq("id", text_id).single().execute()
+    # 1. Fetch text content and the realm's name and existing prompt concurrently
+    text_res, realm_res = await asyncio.gather(
+        asyncio.to_thread(db.from_("texts").select("content").eq("id", text_id).single().execute),
+        asyncio.to_thread(db.from_("realms").select("name, system_prompt").eq("id", realm_id).single().execute),
+    )
     if not text_res.data:
         raise HTTPException(status_code=404, detail="Text not found")
     text_content = text_res.data['content']
     logger.info("Successfully fetched text content.")
 
-    # 2. Fetch realm name and existing prompt
-    realm_res = db.from_("realms").select("name, system_prompt").eq("id", realm_id).single().execute()
+    # 2. Check the target realm
     if not realm_res.data:
         raise HTTPException(status_code=404, detail="Realm not found")
     realm_name = realm_res.data['name']
@@ -179,83 +293,110 @@ async def synthesize_text_to_realm(text_id: str, req: SynthesisRequest, db: Clie
     if not text_content.strip():
         raise HTTPException(status_code=400, detail="Text content is empty, nothing to synthesize.")
 
-    # 3. Call Gemini to synthesize the prompt
-    synthesis_prompt_template = f"""
-    You are an AI assistant helping a user refine their personal profile.
-    The user's current profile about '{realm_name}' is:
-    ---
-    {existing_prompt or "No existing prompt."}
-    ---
-    
-    Now, augment and refine this profile using the following new text.
-    Create a concise background profile that captures key traits, goals, preferences, and relevant context about the user.
-    
-    Focus on factual information that would help an AI assistant provide better, more contextually relevant responses.
-    Write this as background information about the user, not as instructions.
-    Keep it concise and avoid overly complimentary language.
-
-    New Text:
-    {text_content}
-    
-    Updated Profile:
-    """
+    # 3. Build the synthesis prompt; the realm profile block is cached per realm
+    realm_context = TEXT_SYNTHESIS_PROFILE_TEMPLATE.format_map({
+        "realm_name": realm_name,
+        "existing_prompt": existing_prompt or "No existing prompt.",
+    })
+    request_prompt = TEXT_SYNTHESIS_REQUEST_TEMPLATE.format_map({"text_content": text_content})
+    model, synthesis_prompt = await get_realm_synthesis_model(
+        realm_id, TEXT_SYNTHESIS_INSTRUCTION, realm_context, request_prompt
+    )
     logger.info(f"Sending synthesis prompt to Gemini for text '{text_id}' into realm '{realm_name}'.")
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    return model, synthesis_prompt
+
+@router.post("/texts/{text_id}/synthesize", response_model=SynthesisResponse)
+async def synthesize_text_to_realm(text_id: str, req: SynthesisRequest, db: Client = Depends(get_db)):
+    """
+    Synthesizes the content of a text and updates the system prompt of a specified realm.
+    """
+    realm_id = req.realm_id
+    model, synthesis_prompt = await _prepare_text_synthesis(text_id, realm_id, db)
+
+    # 3. Call Gemini to synthesize the prompt
     try:
-        response = await model.generate_content_async(synthesis_prompt_template)
+        response = await generate_content(model, synthesis_prompt)
         synthesized_prompt = response.text.strip()
         logger.info(f"Received synthesized prompt from Gemini:\\n{synthesized_prompt}")
+    except ResourceExhausted as e:
+        logger.error(f"Gemini quota exhausted after retries: {e}")
+        raise HTTPException(status_code=429, detail="Gemini quota exhausted, please try again shortly.")
     except Exception as e:
         logger.error(f"Error during Gemini API call: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to synthesize prompt: {e}")
 
     # 4. Update the realm's system_prompt
     logger.info(f"Updating realm {realm_id} with new system prompt from text {text_id}.")
-    update_res = db.from_("realms").update({"system_prompt": synthesized_prompt}).eq("id", realm_id).execute()
+    update_query = db.from_("realms").update({"system_prompt": synthesized_prompt}).eq("id", realm_id)
+    update_res = await asyncio.to_thread(update_query.execute)
 
     if not update_res.data:
         logger.error(f"Failed to update realm {realm_id} in Supabase. Response: {update_res}")
         raise HTTPException(status_code=500, detail="Failed to update realm with synthesized prompt.")
-    
+
+    await asyncio.to_thread(invalidate_realm_cache, realm_id)
     logger.info(f"Successfully updated realm {realm_id}.")
         
     return SynthesisResponse(synthesized_prompt=synthesized_prompt)
 
-@router.post("/texts/{text_id}/synthesize/advanced", response_model=SynthesisResponse)
-async def synthesize_text_to_realm_advanced(text_id: str, req: SynthesisRequest, db: Client = Depends(get_db)):
+async def _save_streamed_prompt(text_id: str, realm_id: str, synthesized_prompt: str, db: Client) -> bool:
+    """Persist the fully streamed prompt to the realm."""
+    update_query = db.from_("realms").update({"system_prompt": synthesized_prompt}).eq("id", realm_id)
+    update_res = await asyncio.to_thread(update_query.execute)
+    if not update_res.data:
+        logger.error(f"Failed to update realm {realm_id} in Supabase. Response: {update_res}")
+        return False
+
+    await asyncio.to_thread(invalidate_realm_cache, realm_id)
+    logger.info(f"Successfully updated realm {realm_id} from streamed synthesis of text {text_id}.")
+    return True
+
+async def _stream_synthesized_prompt(
+    text_id: str,
+    realm_id: str,
+    model: genai.GenerativeModel,
+    synthesis_prompt: str,
+    db: Client
+):
     """
-    Performs advanced synthesis of a text into a realm's system prompt using the multi-stage engine.
+    Streams the synthesized prompt from Gemini as SSE `data:` events, then saves the
+    full prompt to the realm and finishes with a `done` (or `error`) event.
     """
-    realm_id = req.realm_id
-    logger.info(f"Starting ADVANCED synthesis for text_id: {text_id} into realm_id: {realm_id}")
+    chunks: List[str] = []
+    try:
+        response = await generate_content(model, synthesis_prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield sse_event(chunk.text)
+    except Exception as e:
+        logger.error(f"Error during streamed Gemini synthesis of text {text_id}: {e}")
+        yield sse_event(f"Failed to synthesize prompt: {e}", event="error")
+        return
 
-    # 1. Get or create a content source from the text
-    content_source_id = await _get_or_create_content_source_from_text(text_id, realm_id, db)
+    synthesized_prompt = "".join(chunks).strip()
+    if not synthesized_prompt:
+        logger.error(f"Streamed synthesis of text {text_id} produced no output; realm {realm_id} not updated.")
+        yield sse_event("Synthesis produced no output.", event="error")
+        return
 
-    # 2. Instantiate the synthesis engine
-    synthesis_engine = AdvancedSynthesisEngine(db)
+    saved = await _save_streamed_prompt(text_id, realm_id, synthesized_prompt, db)
+    if not saved:
+        yield sse_event("Failed to update realm with synthesized prompt.", event="error")
+        return
 
-    # 3. Run the full synthesis process
-    logger.info(f"Running full synthesis for realm {realm_id} using content source {content_source_id}")
-    try:
-        # The engine will fetch all sources for the realm, including the one we just made
-        synthesized_prompt, _ = await synthesis_engine.run_full_synthesis(
-            realm_id=realm_id, 
-            content_source_ids=[content_source_id] # Pass the specific source to ensure it's prioritized
-        )
-        logger.info(f"Received advanced synthesized prompt for realm {realm_id}:\\n{synthesized_prompt}")
-    except Exception as e:
-        logger.error(f"Error during advanced synthesis engine call: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to run advanced synthesis: {e}")
+    yield sse_event("", event="done")
 
-    # 4. Update the realm's system_prompt
-    logger.info(f"Updating realm {realm_id} with new advanced system prompt.")
-    update_res = db.from_("realms").update({"system_prompt": synthesized_prompt}).eq("id", realm_id).execute()
+@router.post("/texts/{text_id}/synthesize/stream")
+async def stream_synthesize_text_to_realm(text_id: str, req: SynthesisRequest, db: Client = Depends(get_db)):
+    """
+    Streams the synthesized system prompt back as server-sent events while it is generated.
+    The realm is updated once generation completes, before the final `done` event.
+    """
+    realm_id = req.realm_id
+    model, synthesis_prompt = await _prepare_text_synthesis(text_id, realm_id, db)
 
-    if not update_res.data:
-        logger.error(f"Failed to update realm {realm_id} with advanced prompt. Response: {update_res}")
-        raise HTTPException(status_code=500, detail="Failed to update realm.")
-    
-    logger.info(f"Successfully updated realm {realm_id} with advanced prompt.")
-        
-    return SynthesisResponse(synthesized_prompt=synthesized_prompt) 
\ No newline at end of file
+    return StreamingResponse(
+        _stream_synthesized_prompt(text_id, realm_id, model, synthesis_prompt, db),
+        media_type="text/event-stream"
+    )
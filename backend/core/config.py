@@ -8,6 +8,22 @@ class Settings:
     SUPABASE_KEY: str = os.environ.get("SUPABASE_KEY")
     SUPABASE_SERVICE_KEY: str = os.environ.get("SUPABASE_SERVICE_KEY")
     GEMINI_API_KEY: str = os.environ.get("GEMINI_API_KEY")
+    # Postgres connection string for running SQL migrations directly (backend/utils/simple_migration.py).
+    SUPABASE_DB_URL: str = os.environ.get("SUPABASE_DB_URL")
+    # Upper bound on concurrent Gemini calls per process.
+    GEMINI_MAX_CONCURRENCY: int = int(os.environ.get("GEMINI_MAX_CONCURRENCY") or 8)
+    # Share of those slots background synthesis may hold, so interactive calls always get the rest.
+    GEMINI_BACKGROUND_CONCURRENCY: int = int(os.environ.get("GEMINI_BACKGROUND_CONCURRENCY") or max(1, GEMINI_MAX_CONCURRENCY // 2))
+    # Per-process requests/tokens per minute budget for Gemini, matched to the key's quota tier; 0 disables.
+    GEMINI_RPM_LIMIT: int = int(os.environ.get("GEMINI_RPM_LIMIT") or 0)
+    GEMINI_TPM_LIMIT: int = int(os.environ.get("GEMINI_TPM_LIMIT") or 0)
+    # Optional Redis for the smart-synthesis batch queue; the synthesis_queue table is used when unset.
+    REDIS_URL: str = os.environ.get("REDIS_URL")
+    # Worker processes serving the API (also read by uvicorn and gunicorn); per-process caches
+    # that writes on other workers can't invalidate are turned off when this is above 1.
+    WEB_CONCURRENCY: int = int(os.environ.get("WEB_CONCURRENCY") or 1)
+    # Enables ?profile=1 request profiling; never turn this on in production.
+    PROFILING: bool = os.environ.get("PROFILING", "").lower() in ("1", "true", "yes")
 
 settings = Settings()
 
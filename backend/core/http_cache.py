@@ -0,0 +1,33 @@
+import hashlib
+from typing import Any
+import orjson
+from fastapi import Request, Response
+
+# Browsers must revalidate: the UI re-reads resources right after editing them.
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+def etag_for(payload: Any) -> str:
+    """Weak ETag over the payload itself; most rows have no updated_at, so timestamps would miss edits."""
+    digest = hashlib.blake2b(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+def not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    payload: Any,
+    etag: str = None,
+    cache_control: str = DEFAULT_CACHE_CONTROL
+):
+    """Returns 304 when the client's copy is current, otherwise the payload with its ETag."""
+    etag = etag or etag_for(payload)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return payload
@@ -0,0 +1,7 @@
+from typing import Optional
+
+def sse_event(data: str, event: Optional[str] = None) -> str:
+    """Frames a payload as a server-sent event; each line of a multi-line payload gets its own data field."""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,31 @@
+from typing import Any, Dict, List, Optional
+from aiodataloader import DataLoader
+from fastapi import Depends
+from postgrest import AsyncPostgrestClient
+
+from backend.db.supabase import get_async_db
+
+# Keep IN lists well below PostgREST's URL and row limits.
+TEXT_LOADER_MAX_BATCH_SIZE = 100
+
+class TextLoader(DataLoader):
+    """
+    Coalesces text lookups made in the same event-loop tick into one
+    `id=in.(...)` query. Missing ids resolve to None.
+    """
+
+    def __init__(self, db: AsyncPostgrestClient):
+        super().__init__(max_batch_size=TEXT_LOADER_MAX_BATCH_SIZE)
+        self.db = db
+
+    async def batch_load_fn(self, text_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        response = await self.db.from_("texts").select("*").in_("id", text_ids).execute()
+        texts_by_id = {str(text["id"]): text for text in response.data or []}
+        return [texts_by_id.get(str(text_id)) for text_id in text_ids]
+
+async def get_text_loader(db: AsyncPostgrestClient = Depends(get_async_db)) -> TextLoader:
+    """
+    Per-request loader, so batching never leaks results across requests. Declared
+    async so FastAPI builds it on the event loop rather than in a worker thread.
+    """
+    return TextLoader(db)
@@ -1,10 +1,47 @@
-from supabase import create_client, Client
+import httpx
+from postgrest import AsyncPostgrestClient
+from supabase import create_client, Client, ClientOptions
 from backend.core.config import settings
 
 # Use the service key if available to bypass RLS for admin-level operations.
 # Fall back to the anon key if the service key is not set.
 key = settings.SUPABASE_SERVICE_KEY if settings.SUPABASE_SERVICE_KEY else settings.SUPABASE_KEY
-supabase_client: Client = create_client(settings.SUPABASE_URL, key)
+
+# One keep-alive pool shared by every handler, so DB calls after the first
+# reuse an open connection instead of paying a new TCP+TLS handshake.
+sync_http_client = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=15, max_connections=50, keepalive_expiry=30),
+    timeout=120,
+    follow_redirects=True,
+)
+supabase_client: Client = create_client(
+    settings.SUPABASE_URL,
+    key,
+    options=ClientOptions(httpx_client=sync_http_client),
+)
+
+# Async PostgREST client for handlers that should not block the event loop.
+# It talks to the same REST endpoint as supabase_client over one shared connection pool.
+rest_url = f"{settings.SUPABASE_URL}/rest/v1"
+rest_headers = {
+    "apikey": key,
+    "Authorization": f"Bearer {key}",
+    "Accept": "application/json",
+    "Content-Type": "application/json",
+}
+async_http_client = httpx.AsyncClient(
+    base_url=rest_url,
+    headers=rest_headers,
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+    timeout=120,
+    follow_redirects=True,
+)
+async_postgrest_client = AsyncPostgrestClient(rest_url, headers=rest_headers, http_client=async_http_client)
 
 def get_db():
-    return supabase_client 
\ No newline at end of file
+    return supabase_client
+
+def get_async_db():
+    return async_postgrest_client
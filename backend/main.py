@@ -1,12 +1,26 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse
 
-from backend.api import realms, chats, reflections, texts, content_sources, advanced_synthesis
+from backend.api import realms, chats, reflections, texts, content_sources, advanced_synthesis, batch
+from backend.db.supabase import async_http_client, sync_http_client
+from backend.core.config import settings
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close the shared HTTP clients on shutdown
+    await async_http_client.aclose()
+    sync_http_client.close()
 
 app = FastAPI(
     title="Pathfinder API",
     description="Smart chat application for personal reflection with persistent storage",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -24,6 +38,26 @@ app.add_middleware(
     expose_headers=["X-Chat-Id"],
 )
 
+# Compress JSON bodies over 1 KB (content-source and text listings carry full bodies);
+# text/event-stream responses are left uncompressed so streamed tokens are not held back.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Opt-in request profiling: a request with ?profile=1 returns a pyinstrument report instead
+# of its response. The endpoint still runs in full (writes included); only its body is dropped.
+if settings.PROFILING:
+    from pyinstrument import Profiler
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if request.query_params.get("profile") != "1":
+            return await call_next(request)
+
+        profiler = Profiler(async_mode="enabled", interval=0.001)
+        profiler.start()
+        await call_next(request)
+        profiler.stop()
+        return HTMLResponse(profiler.output_html())
+
 # Include API routers
 app.include_router(realms.router)
 app.include_router(chats.router)
@@ -31,6 +65,7 @@ app.include_router(reflections.router)
 app.include_router(texts.router)
 app.include_router(content_sources.router)
 app.include_router(advanced_synthesis.router)
+app.include_router(batch.router)
 
 @app.get("/")
 async def root():
@@ -41,5 +76,23 @@ async def health_check():
     return {"status": "healthy"}
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+
+    # DEV=1 keeps the auto-reloading single-process server (see run.sh).
+    # Otherwise run several workers on uvloop/httptools; for production,
+    # gunicorn -k uvicorn.workers.UvicornWorker -w N backend.main:app works too.
+    dev = os.getenv("DEV") == "1"
+    workers = None if dev else int(os.getenv("WEB_CONCURRENCY", "4"))
+    if workers:
+        # Workers read this via settings.WEB_CONCURRENCY to know they aren't alone
+        os.environ["WEB_CONCURRENCY"] = str(workers)
+    uvicorn.run(
+        "backend.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=dev,
+        workers=workers,
+        loop="auto" if dev else "uvloop",
+        http="auto" if dev else "httptools",
+    ) 
\ No newline at end of file
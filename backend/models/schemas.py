@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 import uuid
@@ -42,6 +42,8 @@ class RealmUpdate(BaseModel):
     system_prompt: Optional[str] = None
 
 class Realm(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
     id: str
     name: str
     description: Optional[str] = None
@@ -67,6 +69,8 @@ class ContentSourceUpdate(BaseModel):
     weight: Optional[float] = None
 
 class ContentSource(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
     id: str
     realm_id: Optional[str] = None
     source_type: SourceType
@@ -152,6 +156,8 @@ class ChatCreate(BaseModel):
     title: Optional[str] = None
 
 class Chat(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
     id: str
     realm_id: Optional[str] = None
     title: Optional[str] = None
@@ -165,6 +171,8 @@ class MessageCreate(BaseModel):
     role: str = "user"
 
 class Message(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
     id: str
     chat_id: str
     role: str
@@ -185,6 +193,8 @@ class ReflectionUpdate(BaseModel):
     importance_score: Optional[float] = None
 
 class Reflection(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
     id: uuid.UUID
     realm_id: uuid.UUID
     question: str
@@ -208,6 +218,8 @@ class TextUpdate(BaseModel):
     synthesis_history: Optional[List[str]] = None
 
 class Text(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
     id: uuid.UUID
     title: str
     content: str
@@ -216,6 +228,13 @@ class Text(BaseModel):
     synthesis_history: Optional[List[str]] = []
     created_at: datetime
 
+class TextSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True, extra="ignore")
+
+    id: uuid.UUID
+    title: str
+    created_at: datetime
+
 # Synthesis and Analysis Response Models
 class SynthesisRequest(BaseModel):
     realm_id: str
@@ -241,6 +260,14 @@ class ContentAnalysisResponse(BaseModel):
     quality_score: float
     suggestions: List[str]
 
+class PersonaProfile(BaseModel):
+    core_identity: str
+    values_beliefs: List[str]
+    communication_style: str
+    goals_aspirations: List[str]
+    context_background: str
+    preferences_patterns: List[str]
+
 class QualityAssessmentResponse(BaseModel):
     coherence_score: float
     completeness_score: float
@@ -284,4 +311,18 @@ class OnboardingResponse(BaseModel):
     realm: Realm
     generated_prompt: str
     suggested_questions: List[str]
-    next_steps: List[str] 
\ No newline at end of file
+    next_steps: List[str]
+
+# Batch Models
+class BatchCall(BaseModel):
+    call_id: str
+    method: str = "GET"
+    path: str
+    body: Optional[Any] = None
+    input_from: Dict[str, str] = {}  # name -> "<call_id>.<field>"
+    depends_on: List[str] = []  # call_ids that must finish first (ordering only)
+
+class BatchCallResult(BaseModel):
+    call_id: Optional[str] = None
+    status_code: int
+    body: Optional[Any] = None
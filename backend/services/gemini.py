@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from typing import Any, Optional
+import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+from backend.core.config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: quota (429) and temporary unavailability (503).
+RETRYABLE_GEMINI_ERRORS = (ResourceExhausted, ServiceUnavailable)
+
+# AIMD: halve the concurrency limit on a quota/availability error, add this much
+# back after every window of consecutive successes.
+AIMD_INCREASE = 0.5
+AIMD_WINDOW = 20
+RATE_WINDOW_SECONDS = 60
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+class _AdaptiveLimiter:
+    """
+    Concurrency limit for Gemini calls that backs off like TCP congestion control:
+    multiplicative decrease on 429/503, additive increase after sustained success,
+    never above `max_limit`.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self.in_flight -= 1
+            if exc_type is not None and issubclass(exc_type, RETRYABLE_GEMINI_ERRORS):
+                self.limit = max(1.0, self.limit / 2)
+                self._successes = 0
+                logger.warning(f"Gemini throttled; concurrency limit now {int(self.limit)}")
+            elif exc_type is None:
+                self._successes += 1
+                if self._successes >= AIMD_WINDOW and self.limit < self.max_limit:
+                    self.limit = min(float(self.max_limit), self.limit + AIMD_INCREASE)
+                    self._successes = 0
+            self._condition.notify_all()
+        return False
+
+
+class _RateWindow:
+    """Sliding one-minute request and token budget; a limit of 0 disables that check."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests: deque = deque()
+        self._tokens: deque = deque()
+        self._token_total = 0
+
+    def _expire(self, now: float):
+        while self._requests and self._requests[0] <= now - RATE_WINDOW_SECONDS:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] <= now - RATE_WINDOW_SECONDS:
+            self._token_total -= self._tokens.popleft()[1]
+
+    async def wait_if_throttled(self):
+        while True:
+            now = time.monotonic()
+            self._expire(now)
+            waits = []
+            if self.rpm and len(self._requests) >= self.rpm:
+                waits.append(self._requests[0] + RATE_WINDOW_SECONDS - now)
+            if self.tpm and self._token_total >= self.tpm:
+                waits.append(self._tokens[0][0] + RATE_WINDOW_SECONDS - now)
+            if not waits:
+                self._requests.append(now)
+                return
+            await asyncio.sleep(max(waits))
+
+    def record_tokens(self, tokens: int):
+        if self.tpm and tokens:
+            self._tokens.append((time.monotonic(), tokens))
+            self._token_total += tokens
+
+
+# Bounds in-flight Gemini calls across all synthesis paths in this process.
+_gemini_limiter = _AdaptiveLimiter(settings.GEMINI_MAX_CONCURRENCY)
+_rate_window = _RateWindow(settings.GEMINI_RPM_LIMIT, settings.GEMINI_TPM_LIMIT)
+# Background (non-latency-critical) calls must also hold one of these, so they can
+# never take every slot above and queue ahead of user-facing requests.
+_background_semaphore = asyncio.Semaphore(settings.GEMINI_BACKGROUND_CONCURRENCY)
+_backoff = wait_exponential_jitter(initial=1, max=10)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Server-suggested retry delay from a Gemini error (RetryInfo detail or message), if any."""
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return float(delay.seconds) + delay.nanos / 1e9
+        if isinstance(detail, dict) and detail.get("retryDelay"):
+            return float(str(detail["retryDelay"]).rstrip("s"))
+    match = re.search(r"retry in ([\d.]+)s", str(error), re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+
+def _retry_wait(retry_state) -> float:
+    delay = _retry_after(retry_state.outcome.exception())
+    if delay is not None:
+        return min(delay, MAX_RETRY_AFTER_SECONDS)
+    return _backoff(retry_state)
+
+
+def _log_retry(retry_state):
+    logger.warning(
+        f"Gemini call failed with {retry_state.outcome.exception()!r}; "
+        f"retrying (attempt {retry_state.attempt_number})"
+    )
+
+
+async def generate_content(model: genai.GenerativeModel, contents: Any, background: bool = False, **kwargs) -> Any:
+    """
+    Calls `model.generate_content_async` under the shared rate and concurrency limits,
+    retrying transient quota/availability errors after the server's retry-after delay,
+    or with jittered exponential backoff. With `stream=True` only the initial request
+    is guarded; the returned stream is not retried.
+    Pass `background=True` for work nobody is waiting on; it is capped to a share of the slots.
+    """
+    if background:
+        async with _background_semaphore:
+            return await _generate_content(model, contents, **kwargs)
+    return await _generate_content(model, contents, **kwargs)
+
+
+async def _generate_content(model: genai.GenerativeModel, contents: Any, **kwargs) -> Any:
+    async for attempt in AsyncRetrying(
+        wait=_retry_wait,
+        stop=stop_after_attempt(5),
+        retry=retry_if_exception_type(RETRYABLE_GEMINI_ERRORS),
+        before_sleep=_log_retry,
+        reraise=True,
+    ):
+        with attempt:
+            # Limits are taken per attempt, so a call waiting to retry does not hold a slot.
+            await _rate_window.wait_if_throttled()
+            async with _gemini_limiter:
+                response = await model.generate_content_async(contents, **kwargs)
+            usage = None if kwargs.get("stream") else getattr(response, "usage_metadata", None)
+            _rate_window.record_tokens(getattr(usage, "total_token_count", 0) if usage else 0)
+            return response
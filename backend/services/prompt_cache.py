@@ -0,0 +1,105 @@
+import asyncio
+import functools
+import hashlib
+import logging
+import time
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+import google.generativeai as genai
+from google.generativeai import caching
+
+from backend.core.config import settings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Configure the Gemini API
+genai.configure(api_key=settings.GEMINI_API_KEY)
+
+CACHE_MODEL_NAME = "models/gemini-2.5-flash"
+CACHE_TTL = timedelta(hours=1)
+
+# Gemini rejects cached content below a minimum token count (~1024 tokens for
+# 2.5 Flash). Skip the create call for prefixes that are clearly too short.
+MIN_CACHEABLE_CHARS = 4096
+
+# realm_id -> (prefix_hash, cached content or None if not cacheable, monotonic expiry)
+_realm_caches: Dict[str, Tuple[str, Optional[caching.CachedContent], float]] = {}
+
+
+@functools.lru_cache(maxsize=16)
+def _uncached_model(system_instruction: str) -> genai.GenerativeModel:
+    """Shared model per system instruction; models are stateless, so reuse is safe."""
+    return genai.GenerativeModel('gemini-2.5-flash', system_instruction=system_instruction)
+
+
+def _prefix_hash(system_instruction: str, realm_context: str) -> str:
+    return hashlib.sha256(f"{system_instruction}\0{realm_context}".encode("utf-8")).hexdigest()
+
+
+def _delete_cached_content(cache: caching.CachedContent):
+    try:
+        cache.delete()
+    except Exception as e:
+        # The cache expires on its own after CACHE_TTL, so this is best-effort.
+        logger.warning(f"Failed to delete cached content {cache.name}: {e}")
+
+
+def _create_cached_content(realm_id: str, system_instruction: str, realm_context: str) -> Optional[caching.CachedContent]:
+    if len(system_instruction) + len(realm_context) < MIN_CACHEABLE_CHARS:
+        return None
+    try:
+        cache = caching.CachedContent.create(
+            model=CACHE_MODEL_NAME,
+            display_name=f"realm-{realm_id}",
+            system_instruction=system_instruction,
+            contents=[realm_context],
+            ttl=CACHE_TTL,
+        )
+        logger.info(f"Created Gemini context cache {cache.name} for realm {realm_id}")
+        return cache
+    except Exception as e:
+        logger.warning(f"Could not create Gemini context cache for realm {realm_id}: {e}")
+        return None
+
+
+async def get_realm_synthesis_model(
+    realm_id: str,
+    system_instruction: str,
+    realm_context: str,
+    request_prompt: str
+) -> Tuple[genai.GenerativeModel, str]:
+    """
+    Returns a model and the prompt to send for a realm synthesis call.
+
+    The static scaffolding (system instruction plus the realm's current profile)
+    is registered once as Gemini cached content and reused until the realm's
+    prompt changes, so only `request_prompt` is sent per call. When the prefix
+    is too small to cache, or caching fails, a plain model is returned with the
+    realm context prepended to the prompt.
+    """
+    prefix_hash = _prefix_hash(system_instruction, realm_context)
+    entry = _realm_caches.get(realm_id)
+
+    if entry is None or entry[0] != prefix_hash or entry[2] <= time.monotonic():
+        if entry and entry[1] and entry[0] != prefix_hash:
+            await asyncio.to_thread(_delete_cached_content, entry[1])
+        cache = await asyncio.to_thread(_create_cached_content, realm_id, system_instruction, realm_context)
+        # Renew slightly before the server-side TTL so requests never hit an expired cache.
+        expires_at = time.monotonic() + CACHE_TTL.total_seconds() - 60
+        entry = (prefix_hash, cache, expires_at)
+        _realm_caches[realm_id] = entry
+
+    cache = entry[1]
+    if cache:
+        return genai.GenerativeModel.from_cached_content(cached_content=cache), request_prompt
+
+    return _uncached_model(system_instruction), f"{realm_context}\n\n{request_prompt}"
+
+
+def invalidate_realm_cache(realm_id: str):
+    """Drops the cached synthesis scaffolding for a realm after its system prompt changes."""
+    entry = _realm_caches.pop(realm_id, None)
+    if entry and entry[1]:
+        _delete_cached_content(entry[1])
@@ -1,15 +1,101 @@
+import asyncio
+import hashlib
 import logging
-from datetime import datetime, timedelta
+import re
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any, Optional, Tuple
+from cachetools import TTLCache
+from postgrest import AsyncPostgrestClient
+import redis.asyncio as redis
 from supabase import Client
 import json
-import uuid
 
+from backend.core.config import settings
+from backend.db.supabase import async_postgrest_client
 from backend.models.schemas import ContentSource, SynthesisType, SourceType
 from backend.services.synthesis_engine import AdvancedSynthesisEngine
+from backend.services.gemini import generate_content
 
 logger = logging.getLogger(__name__)
 
+# Keyword sets for the lightweight analysis, matched as whole words or phrases
+_THEME_KEYWORDS = {
+    "professional": frozenset({"work", "working", "job", "jobs", "career", "careers", "professional"}),
+    "learning": frozenset({"learn", "learning", "learned", "study", "studying", "education", "knowledge"}),
+    "goals": frozenset({"goal", "goals", "aspiration", "aspirations", "dream", "dreams", "want to"}),
+    "values": frozenset({"value", "values", "believe", "belief", "principle", "principles", "important"}),
+}
+_TRAIT_KEYWORDS = {
+    "detail-oriented": frozenset({"detail", "details", "detailed", "precise", "accurate", "careful"}),
+    "creative": frozenset({"creative", "innovative", "artistic", "design", "designing"}),
+    "collaborative": frozenset({"help", "helping", "support", "assist", "collaborate", "collaborating"}),
+}
+_IMPORTANCE_KEYWORDS = frozenset({"important", "key", "essential", "critical"})
+
+# Content shorter than this (titles, chat-sized snippets) is recorded by length only
+MIN_ANALYSIS_CHARS = 40
+
+# One alternation over every keyword, so a single case-insensitive scan finds all
+# hits. Longer keywords go first so phrases win over their leading word.
+_ALL_KEYWORDS = frozenset().union(*_THEME_KEYWORDS.values(), *_TRAIT_KEYWORDS.values(), _IMPORTANCE_KEYWORDS)
+_KEYWORD_RE = re.compile(
+    r"\b(" + "|".join(map(re.escape, sorted(_ALL_KEYWORDS, key=len, reverse=True))) + r")\b",
+    re.IGNORECASE
+)
+
+# With REDIS_URL set, each realm's batch queue is a Redis set of content source ids
+# (key below); otherwise it lives in the synthesis_queue table.
+BATCH_QUEUE_KEY = "synth:queue:{realm_id}"
+_redis = redis.from_url(settings.REDIS_URL, decode_responses=True) if settings.REDIS_URL else None
+
+# Realms drained concurrently by process_all_batch_queues
+BATCH_DRAIN_CONCURRENCY = 8
+
+def _parse_iso(value: str) -> datetime:
+    """Parse a Postgres/ISO timestamp as an aware datetime, assuming UTC when no offset is given."""
+    parsed = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+# Managers are built per request, so the realm content-length totals are cached at
+# module level. Adds bump a cached total in place; anything else (deletes, edits)
+# is picked up when the entry expires.
+CONTENT_LENGTH_CACHE_TTL_SECONDS = 60
+_content_length_cache: TTLCache = TTLCache(maxsize=1024, ttl=CONTENT_LENGTH_CACHE_TTL_SECONDS)
+
+# Realm state read by the trigger check (last synthesis time, pending queue size),
+# reused for a short window so bursts of adds do not re-query it every time.
+REALM_STATE_CACHE_TTL_SECONDS = 10
+_realm_state_cache: TTLCache = TTLCache(maxsize=1024, ttl=REALM_STATE_CACHE_TTL_SECONDS)
+
+# Integration results keyed by a fingerprint of the existing prompt and the new
+# sources, so retries and replays of the same batch skip the Gemini call.
+INTEGRATION_CACHE_TTL_SECONDS = 6 * 60 * 60
+_integration_cache: TTLCache = TTLCache(maxsize=256, ttl=INTEGRATION_CACHE_TTL_SECONDS)
+
+def _integration_cache_key(existing_prompt: str, sources: List[ContentSource]) -> str:
+    digest = hashlib.sha256(existing_prompt.encode("utf-8"))
+    for source_id, content in sorted((str(source.id), source.content) for source in sources):
+        digest.update(b"\0" + source_id.encode("utf-8") + b"\0" + content.encode("utf-8"))
+    return digest.hexdigest()
+
+INTEGRATION_PROMPT_TEMPLATE = """You are updating an existing AI assistant system prompt by integrating new content.
+
+EXISTING PROMPT:
+{existing_prompt}
+
+NEW CONTENT TO INTEGRATE:
+{new_content}
+
+Instructions:
+1. Identify key information from the new content
+2. Seamlessly integrate it into the existing prompt
+3. Maintain the original tone and structure
+4. Don't repeat existing information
+5. Keep the update concise
+
+Return only the updated system prompt.
+"""
+
 class SmartSynthesisManager:
     """
     Intelligent synthesis manager that minimizes token usage through:
@@ -19,8 +105,11 @@ class SmartSynthesisManager:
     4. Change impact analysis
     """
     
-    def __init__(self, db: Client):
+    def __init__(self, db: Client, async_db: Optional[AsyncPostgrestClient] = None):
         self.db = db
+        # The manager's own queries go through the async PostgREST client so awaits
+        # actually yield; `db` is still what the synthesis engine uses.
+        self.async_db = async_db or async_postgrest_client
         self.synthesis_engine = AdvancedSynthesisEngine(db)
         
         # Thresholds for triggering re-synthesis
@@ -40,36 +129,36 @@ class SmartSynthesisManager:
         
         Returns: (content_source, synthesis_triggered)
         """
-        # Check if synthesis is disabled for this realm (prevents recursion)
-        realm_check = self.db.table("realms").select("synthesis_disabled").eq("id", realm_id).single().execute()
-        if realm_check.data and realm_check.data.get("synthesis_disabled"):
-            logger.info(f"Synthesis disabled for realm {realm_id} - preventing auto-synthesis")
-            auto_synthesize = False
-        
-        # Create the content source
-        source_id = str(uuid.uuid4())
+        # Create the content source; the lightweight analysis (no AI tokens) is
+        # computed up front so it is stored with the row instead of patched in later.
+        metadata = content_source_data.get("metadata") or {}
         new_source_data = {
-            "id": source_id,
             "realm_id": realm_id,
             "source_type": content_source_data["source_type"],
             "title": content_source_data.get("title"),
             "content": content_source_data["content"],
-            "metadata": content_source_data.get("metadata", {}),
+            "metadata": {**metadata, "lightweight_analysis": self._lightweight_content_analysis(content_source_data["content"])},
             "weight": content_source_data.get("weight", 1.0),
-            "created_at": datetime.utcnow().isoformat()
+            "created_at": datetime.now(timezone.utc).isoformat()
         }
         
-        # Store in database
-        response = self.db.table("content_sources").insert(new_source_data).execute()
-        content_source = ContentSource(**response.data[0])
+        # Realm check and insert in a single round trip (see backend/utils/add_rpc_functions.sql)
+        response = await self.async_db.rpc("add_content_source_v2", {"p_realm": realm_id, "p_payload": new_source_data}).execute()
+        content_source = ContentSource(**response.data["source"])
+        source_id = str(content_source.id)  # generated by Postgres (gen_random_uuid)
+        if realm_id in _content_length_cache:
+            _content_length_cache[realm_id] += len(content_source.content)
         
-        # Lightweight content analysis (not full synthesis)
-        await self._lightweight_content_analysis(content_source)
+        # Check if synthesis is disabled for this realm (prevents recursion)
+        if response.data.get("synthesis_disabled"):
+            logger.info(f"Synthesis disabled for realm {realm_id} - preventing auto-synthesis")
+            auto_synthesize = False
         
         # Check if synthesis should be triggered
         synthesis_triggered = False
         if auto_synthesize:
-            should_synthesize = await self._should_trigger_synthesis(realm_id, content_source)
+            # add_content_source_v2 already returned last_synthesis_at, so no realms select is needed
+            should_synthesize = await self._should_trigger_synthesis(realm_id, content_source, response.data)
             if should_synthesize:
                 # Use incremental synthesis instead of full
                 await self._trigger_incremental_synthesis(realm_id, [source_id])
@@ -81,50 +170,90 @@ class SmartSynthesisManager:
         logger.info(f"Added content source {source_id} to realm {realm_id}. Synthesis triggered: {synthesis_triggered}")
         return content_source, synthesis_triggered
     
-    async def _lightweight_content_analysis(self, content_source: ContentSource) -> Dict[str, Any]:
+    async def add_content_sources(self, content_sources_data: List[dict]) -> List[ContentSource]:
+        """
+        Add many content sources in one INSERT. Each row gets its lightweight analysis
+        like add_content_source, but no synthesis is triggered or queued (the same as
+        add_content_source with auto_synthesize=False). Callers validate the realms.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [
+            {
+                "realm_id": data.get("realm_id"),
+                "source_type": data["source_type"],
+                "title": data.get("title"),
+                "content": data["content"],
+                "metadata": {
+                    **(data.get("metadata") or {}),
+                    "lightweight_analysis": self._lightweight_content_analysis(data["content"])
+                },
+                "weight": data.get("weight", 1.0),
+                "created_at": now
+            }
+            for data in content_sources_data
+        ]
+        if not rows:
+            return []
+        
+        response = await self.async_db.table("content_sources").insert(rows).execute()
+        content_sources = [ContentSource(**row) for row in response.data]
+        for content_source in content_sources:
+            if content_source.realm_id in _content_length_cache:
+                _content_length_cache[content_source.realm_id] += len(content_source.content)
+        
+        logger.info(f"Added {len(content_sources)} content sources in bulk")
+        return content_sources
+    
+    def _lightweight_content_analysis(self, content: str) -> Dict[str, Any]:
         """
         Perform lightweight analysis of individual content without full synthesis.
-        Uses simple heuristics instead of expensive AI calls.
+        Uses simple heuristics instead of expensive AI calls. Pure: callers store the
+        result (add_content_source puts it in the insert payload).
         """
-        content = content_source.content.lower()
-        
-        # Simple keyword-based analysis (no AI tokens used)
-        themes = []
-        if any(word in content for word in ["work", "job", "career", "professional"]):
-            themes.append("professional")
-        if any(word in content for word in ["learn", "study", "education", "knowledge"]):
-            themes.append("learning")
-        if any(word in content for word in ["goal", "aspiration", "dream", "want to"]):
-            themes.append("goals")
-        if any(word in content for word in ["value", "believe", "principle", "important"]):
-            themes.append("values")
+        if len(content) < MIN_ANALYSIS_CHARS:
+            return {
+                "themes": [],
+                "traits": [],
+                "content_length": len(content),
+                "importance_indicators": 0,
+                "analyzed_at": datetime.now(timezone.utc).isoformat()
+            }
+        
+        # Keyword-based analysis (no AI tokens): one finditer scan collects the keyword hits,
+        # lowercasing each match rather than copying the document, then buckets them into themes
+        hits = {match.group(1).lower() for match in _KEYWORD_RE.finditer(content)}
+        
+        themes = [theme for theme, keywords in _THEME_KEYWORDS.items() if hits & keywords]
         
         # Simple persona trait detection
-        traits = []
-        if any(word in content for word in ["detail", "precise", "accurate", "careful"]):
-            traits.append("detail-oriented")
-        if any(word in content for word in ["creative", "innovative", "artistic", "design"]):
-            traits.append("creative")
-        if any(word in content for word in ["help", "support", "assist", "collaborate"]):
-            traits.append("collaborative")
-        
-        analysis = {
+        traits = [trait for trait, keywords in _TRAIT_KEYWORDS.items() if hits & keywords]
+        
+        return {
             "themes": themes,
             "traits": traits,
-            "content_length": len(content_source.content),
-            "importance_indicators": len([w for w in ["important", "key", "essential", "critical"] if w in content]),
-            "analyzed_at": datetime.utcnow().isoformat()
+            "content_length": len(content),
+            "importance_indicators": len(hits & _IMPORTANCE_KEYWORDS),
+            "analyzed_at": datetime.now(timezone.utc).isoformat()
         }
+    
+    async def refresh_lightweight_analysis(self, content_source: ContentSource) -> Dict[str, Any]:
+        """Re-analyze an existing content source and store the result in its metadata."""
+        analysis = self._lightweight_content_analysis(content_source.content)
         
-        # Store lightweight analysis in metadata
-        update_data = {
-            "metadata": {**content_source.metadata, "lightweight_analysis": analysis}
-        }
-        self.db.table("content_sources").update(update_data).eq("id", content_source.id).execute()
+        # Merge just the analysis key into metadata server-side (see backend/utils/add_rpc_functions.sql)
+        await self.async_db.rpc("update_metadata", {
+            "p_id": str(content_source.id),
+            "p_patch": {"lightweight_analysis": analysis}
+        }).execute()
         
         return analysis
     
-    async def _should_trigger_synthesis(self, realm_id: str, new_content: ContentSource) -> bool:
+    async def _should_trigger_synthesis(
+        self,
+        realm_id: str,
+        new_content: ContentSource,
+        realm_row: Optional[Dict[str, Any]] = None
+    ) -> bool:
         """
         Determine if new content warrants immediate synthesis.
         Uses heuristics to avoid unnecessary AI calls.
@@ -134,11 +263,17 @@ class SmartSynthesisManager:
             logger.info(f"Triggering synthesis for high-weight content (weight: {new_content.weight})")
             return True
         
+        # Fetch realm state and content size concurrently (both cached briefly)
+        state, total_content_length = await asyncio.gather(
+            self._get_realm_state(realm_id, realm_row),
+            self._get_total_content_length(realm_id),
+        )
+        pending_changes = state["pending_changes"]
+        
         # Check when last synthesis occurred
-        realm = self.db.table("realms").select("last_synthesis_at").eq("id", realm_id).single().execute()
-        if realm.data and realm.data.get("last_synthesis_at"):
-            last_synthesis = datetime.fromisoformat(realm.data["last_synthesis_at"].replace("Z", "+00:00"))
-            hours_since_last = (datetime.utcnow() - last_synthesis.replace(tzinfo=None)).total_seconds() / 3600
+        last_synthesis = state["last_synthesis_at"]
+        if last_synthesis:
+            hours_since_last = (datetime.now(timezone.utc) - last_synthesis).total_seconds() / 3600
             
             # Don't trigger if synthesized recently (unless high importance)
             if hours_since_last < 1 and new_content.weight < 2.5:
@@ -146,7 +281,6 @@ class SmartSynthesisManager:
                 return False
         
         # Check content change significance
-        total_content_length = await self._get_total_content_length(realm_id)
         new_content_ratio = len(new_content.content) / max(total_content_length, 1)
         
         if new_content_ratio >= self.SIGNIFICANT_CONTENT_THRESHOLD:
@@ -154,69 +288,70 @@ class SmartSynthesisManager:
             return True
         
         # Check pending changes
-        pending_changes = await self._get_pending_batch_size(realm_id)
         if pending_changes >= self.BATCH_SIZE_THRESHOLD:
             logger.info(f"Triggering synthesis for batch threshold ({pending_changes} pending)")
             return True
         
         return False
     
-    async def _trigger_incremental_synthesis(self, realm_id: str, new_source_ids: List[str]) -> str:
+    async def _trigger_incremental_synthesis(self, realm_id: str, new_source_ids: List[str], clear_queue: bool = True) -> str:
         """
         Run incremental synthesis focusing only on new content.
-        Much more efficient than full synthesis.
+        Much more efficient than full synthesis. Pass `clear_queue=False` when the
+        caller marks the batch queue itself.
         """
         logger.info(f"Running incremental synthesis for realm {realm_id}")
         
-        # Get existing prompt
-        realm = self.db.table("realms").select("system_prompt, current_version").eq("id", realm_id).single().execute()
+        # Get the existing prompt and only the new content sources (one IN query), concurrently
+        realm, sources_response = await asyncio.gather(
+            self.async_db.table("realms").select("system_prompt, current_version").eq("id", realm_id).single().execute(),
+            self.async_db.table("content_sources").select("*").in_("id", new_source_ids).execute()
+        )
         existing_prompt = realm.data.get("system_prompt", "") if realm.data else ""
         current_version = realm.data.get("current_version", 1) if realm.data else 1
         
-        # Get only the new content sources
-        new_sources = []
-        for source_id in new_source_ids:
-            source_response = self.db.table("content_sources").select("*").eq("id", source_id).single().execute()
-            if source_response.data:
-                new_sources.append(ContentSource(**source_response.data))
+        # IN returns rows in arbitrary order; keep the order the sources were queued in
+        position = {source_id: i for i, source_id in enumerate(new_source_ids)}
+        new_sources = [
+            ContentSource(**row)
+            for row in sorted(sources_response.data or [], key=lambda row: position.get(str(row["id"]), len(position)))
+        ]
         
         if not new_sources:
             return existing_prompt
         
-        # Use AI only for integrating new content into existing prompt (much cheaper)
-        integration_prompt = f"""
-        You are updating an existing AI assistant system prompt by integrating new content.
-        
-        EXISTING PROMPT:
-        {existing_prompt}
-        
-        NEW CONTENT TO INTEGRATE:
-        {self._format_sources_for_integration(new_sources)}
-        
-        Instructions:
-        1. Identify key information from the new content
-        2. Seamlessly integrate it into the existing prompt
-        3. Maintain the original tone and structure
-        4. Don't repeat existing information
-        5. Keep the update concise
-        
-        Return only the updated system prompt.
-        """
-        
+        cache_key = _integration_cache_key(existing_prompt, new_sources)
         try:
-            response = await self.synthesis_engine.model.generate_content_async(integration_prompt)
-            updated_prompt = response.text.strip()
+            updated_prompt = _integration_cache.get(cache_key)
+            if updated_prompt is None:
+                # Use AI only for integrating new content into existing prompt (much cheaper)
+                integration_prompt = INTEGRATION_PROMPT_TEMPLATE.format_map({
+                    "existing_prompt": existing_prompt,
+                    "new_content": self._format_sources_for_integration(new_sources),
+                })
+                # Streamed so the realm write starts as soon as the last chunk arrives
+                response = await generate_content(self.synthesis_engine.model, integration_prompt, stream=True)
+                chunks = []
+                async for chunk in response:
+                    if chunk.text:
+                        chunks.append(chunk.text)
+                updated_prompt = "".join(chunks).strip()
+                _integration_cache[cache_key] = updated_prompt
+            else:
+                logger.info(f"Reusing cached integration result for realm {realm_id}")
             
             # Update realm
             update_data = {
                 "system_prompt": updated_prompt,
-                "last_synthesis_at": datetime.utcnow().isoformat(),
+                "last_synthesis_at": datetime.now(timezone.utc).isoformat(),
                 "current_version": current_version + 1
             }
-            self.db.table("realms").update(update_data).eq("id", realm_id).execute()
-            
-            # Clear pending batch for this realm
-            await self._clear_batch_queue(realm_id)
+            await self.async_db.table("realms").update(update_data).eq("id", realm_id).execute()
+            _realm_state_cache.pop(realm_id, None)
+            # Clear the pending batch only once the realm holds the integrated prompt,
+            # so a failed update leaves the queue for the next drain
+            if clear_queue:
+                await self._clear_batch_queue(realm_id)
             
             logger.info(f"Incremental synthesis completed for realm {realm_id}")
             return updated_prompt
@@ -227,18 +362,21 @@ class SmartSynthesisManager:
     
     async def _queue_for_batch_processing(self, realm_id: str, source_id: str):
         """Queue content for batch processing instead of immediate synthesis."""
-        # Store in a simple queue table or Redis in production
-        queue_entry = {
-            "id": str(uuid.uuid4()),
-            "realm_id": realm_id,
-            "content_source_id": source_id,
-            "queued_at": datetime.utcnow().isoformat(),
-            "processed": False
-        }
-        
-        # For now, store in a simple table
         try:
-            self.db.table("synthesis_queue").insert(queue_entry).execute()
+            if _redis:
+                await _redis.sadd(BATCH_QUEUE_KEY.format(realm_id=realm_id), source_id)
+            else:
+                # id defaults to gen_random_uuid() in the table
+                queue_entry = {
+                    "realm_id": realm_id,
+                    "content_source_id": source_id,
+                    "queued_at": datetime.now(timezone.utc).isoformat(),
+                    "processed": False
+                }
+                await self.async_db.table("synthesis_queue").insert(queue_entry, returning="minimal").execute()
+            state = _realm_state_cache.get(realm_id)
+            if state:
+                state["pending_changes"] += 1
             logger.info(f"Queued content source {source_id} for batch processing")
         except Exception as e:
             logger.warning(f"Could not queue for batch processing: {e}")
@@ -247,21 +385,42 @@ class SmartSynthesisManager:
         """Process queued content sources in batches."""
         logger.info(f"Processing batch queue for realm {realm_id}")
         
-        # Get pending items
-        pending = self.db.table("synthesis_queue").select("*").eq("realm_id", realm_id).eq("processed", False).execute()
+        # Get pending items as (queue item id, content source id)
+        pending = await self._get_pending_items(realm_id)
+        return await self._drain_batch(realm_id, pending)
+    
+    async def process_all_batch_queues(self) -> List[str]:
+        """
+        Process the batch queues of every realm with pending items.
+        Pending items for all realms are read in one query and the realms are
+        drained concurrently (bounded). Returns the ids of realms that were synthesized.
+        """
+        pending_by_realm = await self._get_all_pending_items()
+        logger.info(f"Processing batch queues for {len(pending_by_realm)} realms")
+        
+        semaphore = asyncio.Semaphore(BATCH_DRAIN_CONCURRENCY)
         
-        if not pending.data or len(pending.data) < 2:  # No point batching small changes
+        async def drain(realm_id: str, pending: List[Tuple[str, str]]) -> bool:
+            async with semaphore:
+                return await self._drain_batch(realm_id, pending)
+        
+        realm_ids = list(pending_by_realm)
+        results = await asyncio.gather(*[drain(realm_id, pending_by_realm[realm_id]) for realm_id in realm_ids])
+        return [realm_id for realm_id, processed in zip(realm_ids, results) if processed]
+    
+    async def _drain_batch(self, realm_id: str, pending: List[Tuple[str, str]]) -> bool:
+        """Synthesize a realm's pending (queue item id, content source id) items and mark them processed."""
+        if len(pending) < 2:  # No point batching small changes
             return False
         
-        source_ids = [item["content_source_id"] for item in pending.data]
+        source_ids = [source_id for _, source_id in pending]
         
-        # Run incremental synthesis
-        await self._trigger_incremental_synthesis(realm_id, source_ids)
+        # Run incremental synthesis; the queue is marked below instead of cleared afterwards
+        await self._trigger_incremental_synthesis(realm_id, source_ids, clear_queue=False)
         
-        # Mark as processed
-        queue_ids = [item["id"] for item in pending.data]
-        for queue_id in queue_ids:
-            self.db.table("synthesis_queue").update({"processed": True}).eq("id", queue_id).execute()
+        # Mark the drained items as processed in a single update. Scoping to these ids
+        # leaves anything queued while synthesis was running for the next batch.
+        await self._clear_batch_queue(realm_id, [item_id for item_id, _ in pending])
         
         return True
     
@@ -273,7 +432,7 @@ class SmartSynthesisManager:
         logger.info(f"Running FULL synthesis for realm {realm_id} (user-triggered)")
         
         # Get all content sources
-        sources_response = self.db.table("content_sources").select("*").eq("realm_id", realm_id).execute()
+        sources_response = await self.async_db.table("content_sources").select("*").eq("realm_id", realm_id).execute()
         if not sources_response.data:
             raise ValueError("No content sources found for full synthesis")
         
@@ -288,33 +447,118 @@ class SmartSynthesisManager:
         return synthesized_prompt
     
     # Helper methods
+    async def _get_realm_state(self, realm_id: str, realm_row: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Get the realm's last synthesis time (parsed) and pending queue size, cached for a few seconds.
+        Pass `realm_row` when the caller already has the realm's last_synthesis_at to skip the realms select.
+        """
+        state = _realm_state_cache.get(realm_id)
+        if state is None:
+            if realm_row is None:
+                realm, pending_changes = await asyncio.gather(
+                    self.async_db.table("realms").select("last_synthesis_at").eq("id", realm_id).single().execute(),
+                    self._get_pending_batch_size(realm_id),
+                )
+                realm_row = realm.data or {}
+            else:
+                pending_changes = await self._get_pending_batch_size(realm_id)
+            last_synthesis_at = realm_row.get("last_synthesis_at")
+            state = {
+                "last_synthesis_at": _parse_iso(last_synthesis_at) if last_synthesis_at else None,
+                "pending_changes": pending_changes,
+            }
+            _realm_state_cache[realm_id] = state
+        return state
+    
     async def _get_total_content_length(self, realm_id: str) -> int:
         """Get total character count of all content in realm."""
-        response = self.db.table("content_sources").select("content").eq("realm_id", realm_id).execute()
-        return sum(len(item.get("content", "")) for item in (response.data or []))
+        total = _content_length_cache.get(realm_id)
+        if total is None:
+            # Summed server-side (see backend/utils/add_rpc_functions.sql)
+            response = await self.async_db.rpc("realm_content_length", {"p_realm": realm_id}).execute()
+            total = int(response.data or 0)
+            _content_length_cache[realm_id] = total
+        return total
+    
+    async def _get_pending_items(self, realm_id: str) -> List[Tuple[str, str]]:
+        """Get pending (queue item id, content source id) pairs; Redis items are keyed by source id."""
+        if _redis:
+            source_ids = await _redis.smembers(BATCH_QUEUE_KEY.format(realm_id=realm_id))
+            return [(source_id, source_id) for source_id in source_ids]
+        
+        response = await (
+            self.async_db.table("synthesis_queue")
+            .select("id, content_source_id")
+            .eq("realm_id", realm_id)
+            .eq("processed", False)
+            .order("queued_at")
+            .execute()
+        )
+        return [(item["id"], item["content_source_id"]) for item in (response.data or [])]
+    
+    async def _get_all_pending_items(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Get pending (queue item id, content source id) pairs for every realm, keyed by realm id."""
+        if _redis:
+            prefix = BATCH_QUEUE_KEY.format(realm_id="")
+            keys = [key async for key in _redis.scan_iter(match=f"{prefix}*")]
+            async with _redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.smembers(key)
+                members = await pipe.execute()
+            return {
+                key[len(prefix):]: [(source_id, source_id) for source_id in source_ids]
+                for key, source_ids in zip(keys, members) if source_ids
+            }
+        
+        # Grouped server-side (see backend/utils/add_rpc_functions.sql)
+        response = await self.async_db.rpc("pending_by_realm", {}).execute()
+        return {
+            str(row["realm_id"]): list(zip(row["queue_ids"], row["source_ids"]))
+            for row in (response.data or []) if row["realm_id"]
+        }
     
     async def _get_pending_batch_size(self, realm_id: str) -> int:
         """Get count of pending items in batch queue."""
         try:
-            response = self.db.table("synthesis_queue").select("id").eq("realm_id", realm_id).eq("processed", False).execute()
-            return len(response.data or [])
-        except:
+            if _redis:
+                return await _redis.scard(BATCH_QUEUE_KEY.format(realm_id=realm_id))
+            
+            # HEAD request: PostgREST returns only the count header, no rows
+            response = await (
+                self.async_db.table("synthesis_queue")
+                .select("id", count="exact", head=True)
+                .eq("realm_id", realm_id)
+                .eq("processed", False)
+                .execute()
+            )
+            return response.count or 0
+        except Exception as e:
+            logger.warning(f"Could not count pending batch items: {e}")
             return 0
     
-    async def _clear_batch_queue(self, realm_id: str):
-        """Clear processed items from batch queue."""
+    async def _clear_batch_queue(self, realm_id: str, queue_ids: Optional[List[str]] = None):
+        """Mark queued items as processed: the given queue ids, or every item for the realm."""
         try:
-            self.db.table("synthesis_queue").update({"processed": True}).eq("realm_id", realm_id).execute()
+            if _redis:
+                key = BATCH_QUEUE_KEY.format(realm_id=realm_id)
+                if queue_ids is None:
+                    await _redis.delete(key)
+                elif queue_ids:
+                    await _redis.srem(key, *queue_ids)
+                return
+            
+            query = self.async_db.table("synthesis_queue").update({"processed": True}).eq("realm_id", realm_id)
+            if queue_ids is not None:
+                query = query.in_("id", queue_ids)
+            await query.execute()
         except Exception as e:
             logger.warning(f"Could not clear batch queue: {e}")
+        finally:
+            _realm_state_cache.pop(realm_id, None)
     
     def _format_sources_for_integration(self, sources: List[ContentSource]) -> str:
         """Format sources for incremental integration."""
-        formatted = []
-        for source in sources:
-            formatted.append(f"""
-            {source.source_type.upper()} (Weight: {source.weight})
-            {source.title or 'Untitled'}
-            {source.content}
-            """)
-        return "\n---\n".join(formatted) 
\ No newline at end of file
+        return "\n---\n".join(
+            f"{source.source_type.upper()} (Weight: {source.weight})\n{source.title or 'Untitled'}\n{source.content}"
+            for source in sources
+        ) 
\ No newline at end of file
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from google import genai as genai_client
+
+from backend.core.config import settings
+from backend.models.schemas import ContentSource, SynthesisType
+from backend.services.synthesis_engine import AdvancedSynthesisEngine
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Offline full synthesis via the Gemini Batch API: stage 1 prompts for many realms
+# go out as one JSONL batch job (half the per-token price of online calls, separate
+# rate limits), then stages 2-4 run online from the returned analyses. Batch jobs
+# can take minutes to hours, so this is for migrations and scheduled refreshes only.
+BATCH_MODEL_NAME = "gemini-2.5-flash"
+BATCH_POLL_INTERVAL_SECONDS = 30
+BATCH_DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+
+def _write_requests_file(prompts: Dict[str, str]) -> str:
+    """Write one batch request per realm to a temporary JSONL file and return its path."""
+    with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8") as f:
+        for realm_id, prompt in prompts.items():
+            request = {
+                "key": realm_id,
+                "request": {
+                    "contents": [{"parts": [{"text": prompt}]}],
+                    "generation_config": {"response_mime_type": "application/json"},
+                },
+            }
+            f.write(json.dumps(request) + "\n")
+        return f.name
+
+
+def _response_text(response: Dict[str, Any]) -> Optional[str]:
+    """Join the text parts of the first candidate of a batch response."""
+    candidates = response.get("candidates") or []
+    if not candidates:
+        return None
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts) or None
+
+
+def _run_batch_job(prompts: Dict[str, str], poll_interval: float) -> Dict[str, str]:
+    """
+    Submit the prompts as one batch job, wait for it and return {key: response text}.
+    Blocking; call through asyncio.to_thread. Keys whose request failed are omitted.
+    """
+    client = genai_client.Client(api_key=settings.GEMINI_API_KEY)
+    requests_path = _write_requests_file(prompts)
+    try:
+        uploaded = client.files.upload(
+            file=requests_path,
+            config={"display_name": "realm-analysis-requests", "mime_type": "jsonl"},
+        )
+    finally:
+        os.remove(requests_path)
+
+    job = client.batches.create(
+        model=BATCH_MODEL_NAME,
+        src=uploaded.name,
+        config={"display_name": "realm-analysis"},
+    )
+    logger.info(f"Submitted Gemini batch job {job.name} with {len(prompts)} requests")
+
+    while job.state.name not in BATCH_DONE_STATES:
+        time.sleep(poll_interval)
+        job = client.batches.get(name=job.name)
+
+    if job.state.name != "JOB_STATE_SUCCEEDED":
+        raise RuntimeError(f"Gemini batch job {job.name} ended in state {job.state.name}: {job.error}")
+
+    results: Dict[str, str] = {}
+    content = client.files.download(file=job.dest.file_name).decode("utf-8")
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        text = _response_text(item.get("response") or {})
+        if text is None:
+            logger.warning(f"Batch request {item.get('key')} returned no text: {item.get('error')}")
+            continue
+        results[item["key"]] = text
+    return results
+
+
+async def run_full_synthesis_batch(
+    engine: AdvancedSynthesisEngine,
+    realm_ids: List[str],
+    synthesis_type: SynthesisType = SynthesisType.FULL,
+    max_concurrency: int = 8,
+    poll_interval: float = BATCH_POLL_INTERVAL_SECONDS
+) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    """
+    Run full synthesis for many realms with stage 1 submitted as a Gemini batch job.
+
+    Realms that cannot be loaded (missing, no content sources) are skipped. A realm
+    whose batch result is missing or unparseable falls back to an online stage 1 call.
+    Returns: {realm_id: (synthesized_prompt, quality_analysis)}, like run_full_synthesis_many.
+    """
+    loaded: Dict[str, Tuple[Dict[str, Any], List[ContentSource]]] = {}
+    for realm_id in realm_ids:
+        try:
+            loaded[realm_id] = await asyncio.to_thread(engine._load_realm_sources, realm_id)
+        except Exception as e:
+            logger.warning(f"Skipping realm {realm_id} for batch synthesis: {e}")
+
+    if not loaded:
+        return {}
+
+    formatted = {
+        realm_id: engine._prepare_content_for_analysis(sources)
+        for realm_id, (_, sources) in loaded.items()
+    }
+    prompts = {
+        realm_id: engine._build_analysis_prompt(sources, realm["name"], realm.get("system_prompt"), formatted[realm_id])
+        for realm_id, (realm, sources) in loaded.items()
+    }
+    batch_results = await asyncio.to_thread(_run_batch_job, prompts, poll_interval)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _complete(realm_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        realm, sources = loaded[realm_id]
+        async with semaphore:
+            try:
+                try:
+                    analysis = engine._parse_analysis_response(batch_results[realm_id])
+                except Exception:
+                    logger.warning(f"No usable batch analysis for realm {realm_id}; running stage 1 online")
+                    analysis = await engine.analyze_content_sources(
+                        sources, realm["name"], realm.get("system_prompt"), formatted[realm_id]
+                    )
+                return await engine.run_synthesis_from_analysis(realm, sources, analysis, synthesis_type)
+            except Exception as e:
+                logger.error(f"Batch synthesis failed for realm {realm_id}: {e}")
+                return None
+
+    realm_order = list(loaded)
+    results = await asyncio.gather(*[_complete(realm_id) for realm_id in realm_order])
+    return {realm_id: result for realm_id, result in zip(realm_order, results) if result is not None}
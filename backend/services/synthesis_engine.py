@@ -1,15 +1,24 @@
-import json
+import asyncio
+import copy
+import functools
+import hashlib
 import logging
-from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from operator import attrgetter
+from datetime import datetime, timezone
+from typing import Callable, List, Dict, Any, Optional, Tuple, Type, TypeVar
+from cachetools import TTLCache
+import orjson
 import google.generativeai as genai
+from pydantic import BaseModel
 from supabase import Client
 
 from backend.models.schemas import (
     ContentSource, SynthesisMethod, SynthesisType, 
-    ContentAnalysisResponse, QualityAssessmentResponse
+    ContentAnalysisResponse, PersonaProfile, QualityAssessmentResponse
 )
 from backend.core.config import settings
+from backend.services.gemini import generate_content
+from backend.services.prompt_cache import get_realm_synthesis_model
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,31 +27,189 @@ logger = logging.getLogger(__name__)
 # Configure the Gemini API
 genai.configure(api_key=settings.GEMINI_API_KEY)
 
+# Models are stateless, so one instance is shared by every engine.
+GEMINI_FLASH = genai.GenerativeModel('gemini-2.5-flash')
+
+T = TypeVar("T")
+
+# Parsed stage results keyed by SHA-256 of the full prompt. Engines are built per
+# request, so this lives at module level; an unchanged realm re-synthesized within
+# the TTL costs no Gemini calls. Only results that parsed successfully are stored.
+LLM_CACHE_TTL_SECONDS = 24 * 60 * 60
+_llm_cache: TTLCache = TTLCache(maxsize=512, ttl=LLM_CACHE_TTL_SECONDS)
+# Calls still in flight, by the same key: a concurrent identical prompt (e.g. a
+# double-clicked resynthesize) awaits the first call instead of paying for a second.
+_inflight: Dict[str, "asyncio.Task[Any]"] = {}
+
+# Columns ContentSource needs for prompt assembly, and rows per page when loading a realm's sources
+CONTENT_SOURCE_COLUMNS = "id,realm_id,source_type,title,content,metadata,weight,created_at"
+CONTENT_SOURCE_PAGE_SIZE = 500
+
+# Stage results used when a Gemini call or its parse fails. Built once; callers
+# get copies, since the results are passed on and may be mutated downstream.
+_FALLBACK_ANALYSIS = ContentAnalysisResponse(
+    themes=["General information"],
+    persona_traits=["User information available"],
+    content_gaps=["Analysis failed - manual review needed"],
+    quality_score=0.5,
+    suggestions=["Re-run analysis with valid content"]
+)
+_FALLBACK_PERSONA = PersonaProfile(
+    core_identity="User profile extraction failed",
+    values_beliefs=["Manual review needed"],
+    communication_style="Standard interaction style",
+    goals_aspirations=["Profile completion needed"],
+    context_background="Limited information available",
+    preferences_patterns=["Analysis incomplete"]
+)
+_FALLBACK_QUALITY = QualityAssessmentResponse(
+    coherence_score=0.5,
+    completeness_score=0.5,
+    effectiveness_score=0.5,
+    overall_quality=0.5,
+    improvement_suggestions=["Quality assessment failed - manual review needed"],
+    strengths=["Basic prompt structure"],
+    weaknesses=["Assessment incomplete"]
+)
+
+@functools.lru_cache(maxsize=None)
+def _response_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Gemini response schema for a flat Pydantic model. The SDK's own conversion of a
+    model class marks no property as required; listing them all makes JSON mode
+    always return every field the model validates.
+    """
+    properties = {
+        name: {key: value for key, value in prop.items() if key not in ("title", "default")}
+        for name, prop in model.model_json_schema()["properties"].items()
+    }
+    return {"type": "object", "properties": properties, "required": list(properties)}
+
+# Full synthesis sends a realm's formatted sources once as Gemini cached content
+# (a SourceContext of realm id and that text); stages 1 and 2 then carry only their
+# instructions, with this note where the sources would otherwise be inlined.
+SourceContext = Tuple[str, str]
+SOURCE_CONTEXT_INSTRUCTION = (
+    "You analyze a user's content sources to build a personalized AI assistant profile. "
+    "The content sources for the realm are provided in the context."
+)
+SOURCES_IN_CONTEXT = "(the content sources provided in the context; weigh higher-weight sources more)"
+
+# Importance markers for weighted sources: below 2.0, from 2.0, from 3.0
+_WEIGHT_TIERS = ("📝", "⭐", "🔥")
+
+def _weight_tier(weight: float) -> str:
+    return _WEIGHT_TIERS[(weight >= 2.0) + (weight >= 3.0)]
+
 class AdvancedSynthesisEngine:
     """
     Multi-stage synthesis engine that transforms content sources into 
     sophisticated system prompts through intelligent analysis and engineering.
     """
     
-    def __init__(self, db: Client):
+    def __init__(self, db: Client, background: bool = False):
         self.db = db
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        # Background engines (jobs, batch re-synthesis) yield Gemini capacity to interactive requests
+        self.background = background
+        self.model = GEMINI_FLASH
+    
+    async def _cached_generate(
+        self,
+        prompt: str,
+        parse: Callable[[str], T],
+        response_schema: Optional[Type[BaseModel]] = None,
+        source_context: Optional[SourceContext] = None
+    ) -> T:
+        """
+        Generate and parse a response for `prompt`, reusing a cached or in-flight result for an
+        identical prompt. With `response_schema`, Gemini's JSON mode is used so the response is
+        bare JSON matching it. With `source_context`, the realm's sources are sent as Gemini
+        cached content ahead of `prompt` (see prompt_cache.py).
+        """
+        hashed = f"{source_context[1]}\0{prompt}" if source_context else prompt
+        key = hashlib.sha256(hashed.encode("utf-8")).hexdigest()
+        # Callers get their own copy: results are dicts/models that callers may mutate,
+        # and the cached and in-flight results are shared by every caller of the same prompt
+        if key in _llm_cache:
+            return copy.deepcopy(_llm_cache[key])
+        
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate_and_cache(key, prompt, parse, response_schema, source_context))
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+        # Shielded so one caller being cancelled does not cancel the call for the others
+        return copy.deepcopy(await asyncio.shield(task))
+    
+    async def _generate_and_cache(
+        self,
+        key: str,
+        prompt: str,
+        parse: Callable[[str], T],
+        response_schema: Optional[Type[BaseModel]],
+        source_context: Optional[SourceContext]
+    ) -> T:
+        model, contents = self.model, prompt
+        if source_context:
+            model, contents = await get_realm_synthesis_model(
+                f"{source_context[0]}:sources", SOURCE_CONTEXT_INSTRUCTION, source_context[1], prompt
+            )
+        
+        generation_config = None
+        if response_schema:
+            generation_config = {
+                "response_mime_type": "application/json",
+                "response_schema": _response_schema(response_schema),
+            }
+        response = await generate_content(
+            model, contents, background=self.background, generation_config=generation_config
+        )
+        result = parse(response.text)
+        _llm_cache[key] = result
+        return result
     
     async def analyze_content_sources(
         self, 
         content_sources: List[ContentSource],
         realm_name: str,
-        existing_prompt: Optional[str] = None
+        existing_prompt: Optional[str] = None,
+        formatted_content: Optional[str] = None,
+        source_context: Optional[SourceContext] = None
     ) -> ContentAnalysisResponse:
         """
         Stage 1: Analyze content sources to extract themes, patterns, and insights.
+        Pass `formatted_content` (from _prepare_content_for_analysis) when it is already built,
+        or `source_context` to send it as cached content instead of inline.
         """
         logger.info(f"Analyzing {len(content_sources)} content sources for realm '{realm_name}'")
         
+        analysis_prompt = self._build_analysis_prompt(
+            content_sources, realm_name, existing_prompt,
+            SOURCES_IN_CONTEXT if source_context else formatted_content
+        )
+        
+        try:
+            return await self._cached_generate(
+                analysis_prompt, self._parse_analysis_response,
+                response_schema=ContentAnalysisResponse, source_context=source_context
+            )
+            
+        except Exception as e:
+            logger.error(f"Error analyzing content sources: {e}")
+            return self._fallback_analysis()
+    
+    def _build_analysis_prompt(
+        self,
+        content_sources: List[ContentSource],
+        realm_name: str,
+        existing_prompt: Optional[str] = None,
+        formatted_content: Optional[str] = None
+    ) -> str:
+        """Build the stage 1 analysis prompt (also used by the batch runner in synthesis_batch.py)."""
         # Prepare content for analysis
-        content_analysis_input = self._prepare_content_for_analysis(content_sources)
+        content_analysis_input = formatted_content or self._prepare_content_for_analysis(content_sources)
         
-        analysis_prompt = f"""
+        return f"""
         You are an expert content analyst specializing in personal profiling and AI system design.
         
         Analyze the following content sources for the "{realm_name}" realm to extract:
@@ -68,41 +235,35 @@ class AdvancedSynthesisEngine:
         
         Focus on actionable insights that would help an AI assistant provide more personalized responses.
         """
-        
-        try:
-            response = await self.model.generate_content_async(analysis_prompt)
-            analysis_text = response.text.strip()
-            
-            # Clean and parse JSON response
-            cleaned_response = analysis_text.replace("```json", "").replace("```", "").strip()
-            analysis_data = json.loads(cleaned_response)
-            
-            return ContentAnalysisResponse(**analysis_data)
-            
-        except Exception as e:
-            logger.error(f"Error analyzing content sources: {e}")
-            # Return fallback analysis
-            return ContentAnalysisResponse(
-                themes=["General information"],
-                persona_traits=["User information available"],
-                content_gaps=["Analysis failed - manual review needed"],
-                quality_score=0.5,
-                suggestions=["Re-run analysis with valid content"]
-            )
+    
+    def _parse_analysis_response(self, analysis_text: str) -> ContentAnalysisResponse:
+        """Parse a stage 1 response; raises if it is not the expected JSON."""
+        return ContentAnalysisResponse.model_validate_json(analysis_text)
+    
+    def _fallback_analysis(self) -> ContentAnalysisResponse:
+        """Analysis used when stage 1 fails."""
+        return _FALLBACK_ANALYSIS.model_copy(deep=True)
     
     async def extract_persona_profile(
         self, 
         content_sources: List[ContentSource],
         analysis: ContentAnalysisResponse,
-        realm_name: str
+        realm_name: str,
+        weighted_content: Optional[str] = None,
+        source_context: Optional[SourceContext] = None
     ) -> Dict[str, Any]:
         """
         Stage 2: Extract detailed persona profile from analyzed content.
+        Pass `weighted_content` (from _weight_content_sources) when it is already built,
+        or `source_context` to reuse the sources cached for stage 1 instead.
         """
         logger.info(f"Extracting persona profile for realm '{realm_name}'")
         
         # Weight content by importance and recency
-        weighted_content = self._weight_content_sources(content_sources)
+        if source_context:
+            weighted_content = SOURCES_IN_CONTEXT
+        else:
+            weighted_content = weighted_content or self._weight_content_sources(content_sources)
         
         persona_prompt = f"""
         Based on the content analysis, create a detailed persona profile for the "{realm_name}" realm.
@@ -137,24 +298,16 @@ class AdvancedSynthesisEngine:
         """
         
         try:
-            response = await self.model.generate_content_async(persona_prompt)
-            persona_text = response.text.strip()
-            
-            cleaned_response = persona_text.replace("```json", "").replace("```", "").strip()
-            persona_data = json.loads(cleaned_response)
-            
-            return persona_data
+            return await self._cached_generate(
+                persona_prompt,
+                lambda text: PersonaProfile.model_validate_json(text).model_dump(),
+                response_schema=PersonaProfile,
+                source_context=source_context
+            )
             
         except Exception as e:
             logger.error(f"Error extracting persona profile: {e}")
-            return {
-                "core_identity": "User profile extraction failed",
-                "values_beliefs": ["Manual review needed"],
-                "communication_style": "Standard interaction style",
-                "goals_aspirations": ["Profile completion needed"],
-                "context_background": "Limited information available",
-                "preferences_patterns": ["Analysis incomplete"]
-            }
+            return _FALLBACK_PERSONA.model_dump()
     
     async def engineer_system_prompt(
         self,
@@ -203,13 +356,11 @@ class AdvancedSynthesisEngine:
         """
         
         try:
-            response = await self.model.generate_content_async(prompt_engineering_prompt)
-            engineered_prompt = response.text.strip()
-            
             # Clean up any unwanted formatting
-            engineered_prompt = engineered_prompt.replace("```", "").strip()
-            
-            return engineered_prompt
+            return await self._cached_generate(
+                prompt_engineering_prompt,
+                lambda text: text.strip().replace("```", "").strip()
+            )
             
         except Exception as e:
             logger.error(f"Error engineering system prompt: {e}")
@@ -236,7 +387,7 @@ class AdvancedSynthesisEngine:
         ---
         
         ORIGINAL PERSONA PROFILE:
-        {json.dumps(persona_profile, indent=2)}
+        {orjson.dumps(persona_profile, option=orjson.OPT_INDENT_2).decode()}
         
         CONTENT SOURCES COUNT: {len(content_sources)}
         
@@ -266,25 +417,51 @@ class AdvancedSynthesisEngine:
         """
         
         try:
-            response = await self.model.generate_content_async(quality_prompt)
-            quality_text = response.text.strip()
-            
-            cleaned_response = quality_text.replace("```json", "").replace("```", "").strip()
-            quality_data = json.loads(cleaned_response)
-            
-            return QualityAssessmentResponse(**quality_data)
+            return await self._cached_generate(
+                quality_prompt,
+                QualityAssessmentResponse.model_validate_json,
+                response_schema=QualityAssessmentResponse
+            )
             
         except Exception as e:
             logger.error(f"Error assessing prompt quality: {e}")
-            return QualityAssessmentResponse(
-                coherence_score=0.5,
-                completeness_score=0.5,
-                effectiveness_score=0.5,
-                overall_quality=0.5,
-                improvement_suggestions=["Quality assessment failed - manual review needed"],
-                strengths=["Basic prompt structure"],
-                weaknesses=["Assessment incomplete"]
-            )
+            return _FALLBACK_QUALITY.model_copy(deep=True)
+    
+    def _previous_quality_assessment(self, realm_id: str, system_prompt: str) -> Optional[QualityAssessmentResponse]:
+        """Quality assessment stored with the realm's latest prompt version, if that version has this exact prompt."""
+        latest = (
+            self.db.table("prompt_versions")
+            .select("content,effectiveness_metrics")
+            .eq("realm_id", realm_id)
+            .order("version_number", desc=True)
+            .limit(1)
+            .execute()
+        )
+        if not latest.data or latest.data[0]["content"] != system_prompt:
+            return None
+        try:
+            return QualityAssessmentResponse(**(latest.data[0].get("effectiveness_metrics") or {}))
+        except ValueError:
+            # Legacy versions carry empty or partial metrics
+            return None
+    
+    async def _assess_or_reuse_quality(
+        self,
+        realm: Dict[str, Any],
+        system_prompt: str,
+        persona_profile: Dict[str, Any],
+        content_sources: List[ContentSource]
+    ) -> QualityAssessmentResponse:
+        """Stage 4, skipped when the synthesized prompt is unchanged from the latest stored version."""
+        try:
+            previous = await asyncio.to_thread(self._previous_quality_assessment, realm["id"], system_prompt)
+        except Exception as e:
+            logger.warning(f"Could not load previous prompt version for realm {realm['id']}: {e}")
+            previous = None
+        if previous is not None:
+            logger.info(f"Prompt for realm '{realm['name']}' is unchanged; reusing its quality assessment")
+            return previous
+        return await self.assess_prompt_quality(system_prompt, persona_profile, content_sources, realm["name"])
     
     async def run_full_synthesis(
         self,
@@ -297,49 +474,110 @@ class AdvancedSynthesisEngine:
         
         Returns: (synthesized_prompt, quality_analysis)
         """
-        start_time = datetime.utcnow()
+        start_time = datetime.now(timezone.utc)
+        realm, content_sources = self._load_realm_sources(realm_id, content_source_ids)
+        
+        logger.info(f"Starting full synthesis for realm '{realm['name']}' (ID: {realm_id})")
+        
+        # Format the sources once; stages 1 and 2 share them as cached content
+        source_context = (realm_id, self._prepare_content_for_analysis(content_sources))
+        
+        # Stage 1: Content Analysis
+        analysis = await self.analyze_content_sources(
+            content_sources, realm["name"], realm.get("system_prompt"), source_context=source_context
+        )
         
+        return await self.run_synthesis_from_analysis(
+            realm, content_sources, analysis, synthesis_type, start_time, source_context=source_context
+        )
+    
+    def _load_realm_sources(
+        self,
+        realm_id: str,
+        content_source_ids: Optional[List[str]] = None
+    ) -> Tuple[Dict[str, Any], List[ContentSource]]:
+        """Load the realm row and the content sources to synthesize from."""
         # Get realm information
         realm_response = self.db.table("realms").select("*").eq("id", realm_id).single().execute()
         if not realm_response.data:
             raise ValueError(f"Realm {realm_id} not found")
         
         realm = realm_response.data
-        realm_name = realm["name"]
-        existing_prompt = realm.get("system_prompt")
-        
-        logger.info(f"Starting full synthesis for realm '{realm_name}' (ID: {realm_id})")
         
-        # Get content sources
-        if content_source_ids:
-            # Use specific content sources
-            content_sources = []
-            for source_id in content_source_ids:
-                source_response = self.db.table("content_sources").select("*").eq("id", source_id).single().execute()
-                if source_response.data:
-                    content_sources.append(ContentSource(**source_response.data))
-        else:
-            # Use all content sources for the realm
-            sources_response = self.db.table("content_sources").select("*").eq("realm_id", realm_id).execute()
-            content_sources = [ContentSource(**source) for source in (sources_response.data or [])]
+        # Get content sources, heaviest first (the order _weight_content_sources wants),
+        # page by page since PostgREST caps a single response
+        content_sources = []
+        start = 0
+        while True:
+            query = self.db.table("content_sources").select(CONTENT_SOURCE_COLUMNS)
+            if content_source_ids:
+                # Use specific content sources
+                query = query.in_("id", content_source_ids)
+            else:
+                # Use all content sources for the realm
+                query = query.eq("realm_id", realm_id)
+            page = (
+                query.order("weight", desc=True).order("id")
+                .range(start, start + CONTENT_SOURCE_PAGE_SIZE - 1)
+                .execute().data or []
+            )
+            content_sources.extend(ContentSource(**source) for source in page)
+            if len(page) < CONTENT_SOURCE_PAGE_SIZE:
+                break
+            start += CONTENT_SOURCE_PAGE_SIZE
         
         if not content_sources:
             raise ValueError(f"No content sources found for realm {realm_id}")
         
-        # Stage 1: Content Analysis
-        analysis = await self.analyze_content_sources(content_sources, realm_name, existing_prompt)
+        return realm, content_sources
+    
+    async def run_synthesis_from_analysis(
+        self,
+        realm: Dict[str, Any],
+        content_sources: List[ContentSource],
+        analysis: ContentAnalysisResponse,
+        synthesis_type: SynthesisType = SynthesisType.FULL,
+        start_time: Optional[datetime] = None,
+        weighted_content: Optional[str] = None,
+        source_context: Optional[SourceContext] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Run stages 2-4 from a completed stage 1 analysis.
+        
+        Returns: (synthesized_prompt, quality_analysis)
+        """
+        start_time = start_time or datetime.now(timezone.utc)
+        realm_name = realm["name"]
+        existing_prompt = realm.get("system_prompt")
         
         # Stage 2: Persona Extraction
-        persona_profile = await self.extract_persona_profile(content_sources, analysis, realm_name)
+        persona_profile = await self.extract_persona_profile(
+            content_sources, analysis, realm_name, weighted_content, source_context
+        )
         
         # Stage 3: Prompt Engineering
         synthesized_prompt = await self.engineer_system_prompt(persona_profile, analysis, realm_name, existing_prompt)
         
         # Stage 4: Quality Assessment
-        quality_assessment = await self.assess_prompt_quality(synthesized_prompt, persona_profile, content_sources, realm_name)
+        quality_assessment = await self._assess_or_reuse_quality(realm, synthesized_prompt, persona_profile, content_sources)
         
+        return synthesized_prompt, self._compile_analysis(
+            realm_name, content_sources, analysis, persona_profile, quality_assessment, synthesis_type, start_time
+        )
+    
+    def _compile_analysis(
+        self,
+        realm_name: str,
+        content_sources: List[ContentSource],
+        analysis: ContentAnalysisResponse,
+        persona_profile: Dict[str, Any],
+        quality_assessment: QualityAssessmentResponse,
+        synthesis_type: SynthesisType,
+        start_time: datetime
+    ) -> Dict[str, Any]:
+        """Bundle the stage outputs into the analysis stored alongside a synthesized prompt."""
         # Calculate processing time
-        processing_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+        processing_time = (datetime.now(timezone.utc) - start_time).total_seconds() * 1000
         
         # Compile comprehensive analysis
         comprehensive_analysis = {
@@ -352,13 +590,95 @@ class AdvancedSynthesisEngine:
                 "content_source_ids": [cs.id for cs in content_sources],
                 "processing_time_ms": int(processing_time),
                 "synthesis_type": synthesis_type.value,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.now(timezone.utc).isoformat()
             }
         }
         
         logger.info(f"Completed synthesis for realm '{realm_name}' in {processing_time:.0f}ms")
         
-        return synthesized_prompt, comprehensive_analysis
+        return comprehensive_analysis
+    
+    async def run_full_synthesis_many(
+        self,
+        realm_ids: List[str],
+        synthesis_type: SynthesisType = SynthesisType.FULL,
+        max_concurrency: int = 8
+    ) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """
+        Run full synthesis for several realms as a four-stage pipeline.
+        
+        Each stage (analysis, persona, prompt, quality) has its own queue and
+        `max_concurrency` workers, so one realm's quality check overlaps the next
+        realm's prompt engineering instead of every realm running its stages in
+        lockstep. The shared Gemini limiter still bounds the total in flight.
+        A failing realm is logged and left out of the result, so it does not abort the others.
+        Returns: {realm_id: (synthesized_prompt, quality_analysis)}
+        """
+        results: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        
+        async def _analyze(state: Dict[str, Any]):
+            state["start_time"] = datetime.now(timezone.utc)
+            state["realm"], state["sources"] = await asyncio.to_thread(self._load_realm_sources, state["realm_id"])
+            realm, sources = state["realm"], state["sources"]
+            state["source_context"] = (state["realm_id"], self._prepare_content_for_analysis(sources))
+            state["analysis"] = await self.analyze_content_sources(
+                sources, realm["name"], realm.get("system_prompt"), source_context=state["source_context"]
+            )
+        
+        async def _extract_persona(state: Dict[str, Any]):
+            state["persona_profile"] = await self.extract_persona_profile(
+                state["sources"], state["analysis"], state["realm"]["name"], source_context=state["source_context"]
+            )
+        
+        async def _engineer_prompt(state: Dict[str, Any]):
+            realm = state["realm"]
+            state["prompt"] = await self.engineer_system_prompt(
+                state["persona_profile"], state["analysis"], realm["name"], realm.get("system_prompt")
+            )
+        
+        async def _assess_quality(state: Dict[str, Any]):
+            quality_assessment = await self._assess_or_reuse_quality(
+                state["realm"], state["prompt"], state["persona_profile"], state["sources"]
+            )
+            results[state["realm_id"]] = (state["prompt"], self._compile_analysis(
+                state["realm"]["name"], state["sources"], state["analysis"], state["persona_profile"],
+                quality_assessment, synthesis_type, state["start_time"]
+            ))
+        
+        stages: List[Callable[[Dict[str, Any]], Any]] = [_analyze, _extract_persona, _engineer_prompt, _assess_quality]
+        queues: List[asyncio.Queue] = [asyncio.Queue() for _ in stages]
+        
+        async def _worker(stage_index: int):
+            stage, queue_in = stages[stage_index], queues[stage_index]
+            queue_out = queues[stage_index + 1] if stage_index + 1 < len(queues) else None
+            while True:
+                state = await queue_in.get()
+                try:
+                    await stage(state)
+                    if queue_out is not None:
+                        queue_out.put_nowait(state)
+                except Exception as e:
+                    logger.error(f"Full synthesis failed for realm {state['realm_id']} at {stage.__name__}: {e}")
+                finally:
+                    queue_in.task_done()
+        
+        workers = [
+            asyncio.create_task(_worker(stage_index))
+            for stage_index in range(len(stages))
+            for _ in range(max_concurrency)
+        ]
+        for realm_id in realm_ids:
+            queues[0].put_nowait({"realm_id": realm_id})
+        try:
+            # Items only move forward, so once a queue drains every survivor is already downstream.
+            for queue in queues:
+                await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        
+        return {realm_id: results[realm_id] for realm_id in realm_ids if realm_id in results}
     
     def _prepare_content_for_analysis(self, content_sources: List[ContentSource]) -> str:
         """Prepare content sources for analysis with proper formatting and weighting."""
@@ -370,7 +690,7 @@ class AdvancedSynthesisEngine:
             SOURCE: {source.source_type.upper()} (Weight: {source.weight})
             Title: {source.title or 'Untitled'}
             Content: {source.content}
-            Metadata: {json.dumps(source.metadata, indent=2) if source.metadata else 'None'}
+            Metadata: {orjson.dumps(source.metadata, option=orjson.OPT_INDENT_2).decode() if source.metadata else 'None'}
             ---
             """
             formatted_content.append(source_text)
@@ -379,18 +699,12 @@ class AdvancedSynthesisEngine:
     
     def _weight_content_sources(self, content_sources: List[ContentSource]) -> str:
         """Apply weighting to content sources for persona extraction."""
-        # Sort by weight (highest first) and format
-        sorted_sources = sorted(content_sources, key=lambda x: x.weight, reverse=True)
-        
-        weighted_content = []
-        for source in sorted_sources:
-            importance_indicator = "🔥" if source.weight >= 3.0 else "⭐" if source.weight >= 2.0 else "📝"
-            
-            weighted_text = f"""
-            {importance_indicator} {source.source_type.upper()} (Weight: {source.weight})
-            {source.title or 'Untitled'}
-            {source.content}
-            """
-            weighted_content.append(weighted_text)
-        
-        return "\n---\n".join(weighted_content) 
\ No newline at end of file
+        # Sort by weight (highest first) and format; a no-op pass when loaded already ordered
+        sorted_sources = sorted(content_sources, key=attrgetter("weight"), reverse=True)
+        
+        return "\n---\n".join(
+            f"{_weight_tier(source.weight)} {source.source_type.upper()} (Weight: {source.weight})\n"
+            f"{source.title or 'Untitled'}\n"
+            f"{source.content}"
+            for source in sorted_sources
+        )
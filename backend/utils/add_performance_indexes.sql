@@ -0,0 +1,23 @@
+-- Performance indexes for hot API queries
+-- Migration: Match indexes to the filters and sort orders used by the API routers
+
+-- Reflections: the realm detail page lists unanswered questions and the
+-- archive lists answered ones, always filtered by realm_id.
+CREATE INDEX IF NOT EXISTS idx_reflections_realm_unanswered ON reflections(realm_id) WHERE answer IS NULL;
+CREATE INDEX IF NOT EXISTS idx_reflections_realm_answered ON reflections(realm_id) WHERE answer IS NOT NULL;
+
+-- Texts: GET /texts orders by created_at DESC.
+CREATE INDEX IF NOT EXISTS idx_texts_created_at ON texts(created_at DESC);
+
+-- Content sources: lookups by the row a source was migrated from.
+-- original_text_id is covered by the unique idx_content_sources_original_text_id
+-- in add_rpc_functions.sql; reflections get the matching expression index here.
+-- CONCURRENTLY avoids locking writes; run these statements outside a transaction.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_content_sources_original_reflection_id
+  ON content_sources ((metadata->>'original_reflection_id'));
+
+-- Realms: the synthesis trigger reads these small columns by id; covering them
+-- lets those lookups use an index-only scan. system_prompt is left out on
+-- purpose: long prompts would exceed the btree row size limit.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_realms_synthesis_state
+  ON realms(id) INCLUDE (synthesis_disabled, last_synthesis_at, current_version);
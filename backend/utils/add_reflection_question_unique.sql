@@ -0,0 +1,11 @@
+-- Add unique (realm_id, question) index to reflections
+-- Migration: Allow generate-questions to upsert instead of inserting duplicates on retry
+
+-- Remove existing duplicates first, keeping the oldest row for each question
+DELETE FROM reflections r
+USING reflections d
+WHERE r.realm_id = d.realm_id
+  AND r.question = d.question
+  AND (r.created_at, r.id::text) > (d.created_at, d.id::text);
+
+CREATE UNIQUE INDEX IF NOT EXISTS reflections_realm_question ON reflections (realm_id, question);
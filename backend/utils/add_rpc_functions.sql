@@ -0,0 +1,179 @@
+-- Postgres functions called from the API via db.rpc(...)
+-- Migration: Move multi-step read/write sequences into single round trips
+
+-- Content sources created from texts are unique per original text.
+-- If this fails, remove duplicate rows first:
+--   SELECT metadata->>'original_text_id', count(*) FROM content_sources
+--   WHERE metadata ? 'original_text_id' GROUP BY 1 HAVING count(*) > 1;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_content_sources_original_text_id
+  ON content_sources ((metadata->>'original_text_id'));
+
+-- Get or create the content source for a text, linking it to the realm if it
+-- has none yet. Returns NULL when the text does not exist.
+CREATE OR REPLACE FUNCTION get_or_create_content_source_for_text(p_text_id uuid, p_realm_id uuid)
+RETURNS uuid
+LANGUAGE sql
+AS $$
+  INSERT INTO content_sources (realm_id, source_type, title, content, metadata, weight, created_at)
+  SELECT p_realm_id, 'text', t.title, t.content,
+         jsonb_build_object('original_text_id', t.id::text, 'migrated_at', now()),
+         1.0, t.created_at
+  FROM texts t
+  WHERE t.id = p_text_id
+  ON CONFLICT ((metadata->>'original_text_id'))
+  DO UPDATE SET realm_id = COALESCE(content_sources.realm_id, EXCLUDED.realm_id)
+  RETURNING id;
+$$;
+
+-- Realms created by onboarding set this flag to keep "About Me" out of auto-synthesis.
+ALTER TABLE realms ADD COLUMN IF NOT EXISTS synthesis_disabled boolean DEFAULT false;
+
+-- Insert a content source and return the realm state the synthesis trigger needs.
+-- p_payload carries the content_sources columns (metadata already includes the
+-- lightweight analysis). Returns {"source": <row>, "synthesis_disabled": bool,
+-- "last_synthesis_at": timestamptz}.
+CREATE OR REPLACE FUNCTION add_content_source_v2(p_realm uuid, p_payload jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_disabled boolean;
+  v_last_synthesis_at timestamptz;
+  v_source content_sources;
+BEGIN
+  IF p_realm IS NOT NULL THEN
+    SELECT synthesis_disabled, last_synthesis_at INTO v_disabled, v_last_synthesis_at
+    FROM realms WHERE id = p_realm;
+  END IF;
+
+  INSERT INTO content_sources (id, realm_id, source_type, title, content, metadata, weight, created_at)
+  VALUES (
+    COALESCE((p_payload->>'id')::uuid, gen_random_uuid()),
+    p_realm,
+    p_payload->>'source_type',
+    p_payload->>'title',
+    p_payload->>'content',
+    COALESCE(p_payload->'metadata', '{}'::jsonb),
+    COALESCE((p_payload->>'weight')::float, 1.0),
+    COALESCE((p_payload->>'created_at')::timestamptz, now())
+  )
+  RETURNING * INTO v_source;
+
+  RETURN jsonb_build_object(
+    'source', to_jsonb(v_source),
+    'synthesis_disabled', COALESCE(v_disabled, false),
+    'last_synthesis_at', v_last_synthesis_at
+  );
+END;
+$$;
+
+-- Total characters of content in a realm, aggregated server-side so the
+-- synthesis trigger check does not download every document.
+CREATE OR REPLACE FUNCTION realm_content_length(p_realm uuid)
+RETURNS bigint
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT COALESCE(SUM(length(content)), 0)::bigint
+  FROM content_sources
+  WHERE realm_id = p_realm;
+$$;
+
+-- Merge a partial patch into a content source's metadata server-side, so callers
+-- send only the changed keys instead of the whole metadata object.
+CREATE OR REPLACE FUNCTION update_metadata(p_id uuid, p_patch jsonb)
+RETURNS void
+LANGUAGE sql
+AS $$
+  UPDATE content_sources
+  SET metadata = COALESCE(metadata, '{}'::jsonb) || p_patch
+  WHERE id = p_id;
+$$;
+
+-- Unprocessed batch-queue items grouped by realm, in queue order, so a drain of
+-- every realm starts from one query instead of one per realm.
+CREATE OR REPLACE FUNCTION pending_by_realm()
+RETURNS TABLE(realm_id uuid, queue_ids uuid[], source_ids uuid[])
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT q.realm_id,
+         array_agg(q.id ORDER BY q.queued_at),
+         array_agg(q.content_source_id ORDER BY q.queued_at)
+  FROM synthesis_queue q
+  WHERE NOT q.processed
+  GROUP BY q.realm_id;
+$$;
+
+-- Schema check for the integration tests: p_columns maps table name -> columns
+-- that must exist (an empty array only checks the table). Returns
+-- {table: {"exists": bool, "missing_columns": [...]}} from one information_schema pass.
+CREATE OR REPLACE FUNCTION check_schema(p_columns jsonb)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT COALESCE(jsonb_object_agg(t.key, jsonb_build_object(
+    'exists', EXISTS (
+      SELECT 1 FROM information_schema.tables
+      WHERE table_schema = 'public' AND table_name = t.key
+    ),
+    'missing_columns', COALESCE((
+      SELECT jsonb_agg(c.name)
+      FROM jsonb_array_elements_text(t.value) AS c(name)
+      WHERE NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = t.key AND column_name = c.name
+      )
+    ), '[]'::jsonb)
+  )), '{}'::jsonb)
+  FROM jsonb_each(p_columns) AS t;
+$$;
+
+-- Migration progress for GET /content-sources/migration-status. remaining counts the
+-- originals with no content source pointing at them (content_sources has no FK back, so
+-- subtracting the two totals goes wrong once originals are deleted). p_source_type is
+-- 'reflection' or 'text'; p_realm only narrows reflections. Returns
+-- {"total", "migrated", "remaining", "last_migrated_at"}.
+CREATE OR REPLACE FUNCTION migration_status(p_source_type text, p_realm uuid DEFAULT NULL)
+RETURNS jsonb
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+  v_key text := CASE p_source_type WHEN 'reflection' THEN 'original_reflection_id' ELSE 'original_text_id' END;
+  v_total bigint;
+  v_remaining bigint;
+  v_migrated bigint;
+  v_last text;
+BEGIN
+  IF p_source_type = 'reflection' THEN
+    SELECT count(*), count(*) FILTER (WHERE NOT EXISTS (
+             SELECT 1 FROM content_sources cs
+             WHERE cs.source_type = 'reflection' AND cs.metadata->>v_key = r.id::text))
+    INTO v_total, v_remaining
+    FROM reflections r
+    WHERE p_realm IS NULL OR r.realm_id = p_realm;
+  ELSE
+    SELECT count(*), count(*) FILTER (WHERE NOT EXISTS (
+             SELECT 1 FROM content_sources cs
+             WHERE cs.source_type = 'text' AND cs.metadata->>v_key = t.id::text))
+    INTO v_total, v_remaining
+    FROM texts t;
+  END IF;
+
+  SELECT count(*), (array_agg(cs.metadata->>'migrated_at' ORDER BY cs.created_at DESC))[1]
+  INTO v_migrated, v_last
+  FROM content_sources cs
+  WHERE cs.source_type = p_source_type
+    AND cs.metadata->>v_key IS NOT NULL
+    AND (p_source_type <> 'reflection' OR p_realm IS NULL OR cs.realm_id = p_realm);
+
+  RETURN jsonb_build_object(
+    'total', v_total,
+    'migrated', v_migrated,
+    'remaining', v_remaining,
+    'last_migrated_at', v_last
+  );
+END;
+$$;
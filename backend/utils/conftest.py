@@ -0,0 +1,100 @@
+"""
+Shared fixtures for the integration tests in this directory.
+
+Session-scoped, so one Supabase client and one pooled HTTP client serve every test
+in a run (one of each per worker under pytest-xdist).
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from typing import Awaitable, List
+
+import httpx
+import orjson
+import pytest
+import pytest_asyncio
+
+try:
+    import uvloop
+except ImportError:  # not available on Windows
+    uvloop = None
+
+# The tests and the services they exercise import the app as backend.*
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from supabase import create_client, Client
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+API_BASE_URL = "http://localhost:8000"
+# Preflight GET /health gets this long before every API test is skipped
+HEALTH_CHECK_TIMEOUT_SECONDS = 0.5
+
+# Realms have no metadata column, so the description marks test realms; any left behind by
+# an interrupted run can be removed with: delete from realms where description = 'test_only'
+TEST_REALM = {
+    "name": "Test Synthesis Realm",
+    "description": "test_only",
+    "system_prompt": "You are a helpful assistant for testing synthesis."
+}
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """
+    One event loop for the session, so session-scoped async fixtures outlive a single test;
+    uvloop where installed, for cheaper I/O on the gathered and burst requests.
+    """
+    loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+@pytest.fixture(scope="session")
+def db() -> Client:
+    """Supabase client shared by every database test."""
+    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+
+@pytest_asyncio.fixture(scope="session")
+async def http_client():
+    """
+    One pooled client for every API test, so requests reuse kept-alive connections;
+    HTTP/2 multiplexes concurrent calls over one socket when the server negotiates it.
+    If the server doesn't answer GET /health quickly, every test using this fixture is
+    skipped at once instead of each waiting out the request timeout; DB tests still run.
+    """
+    async with httpx.AsyncClient(
+        base_url=API_BASE_URL,
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+    ) as client:
+        try:
+            (await client.get("/health", timeout=HEALTH_CHECK_TIMEOUT_SECONDS)).raise_for_status()
+        except httpx.HTTPError as e:
+            pytest.skip(f"API not reachable at {API_BASE_URL} ({e!r}); skipping API tests")
+        yield client
+
+@pytest_asyncio.fixture(scope="session")
+async def cleanup(http_client):
+    """
+    Teardown requests (e.g. http_client.delete(...)) appended by tests and fixtures, run
+    concurrently when the session ends rather than one round trip at a time.
+    """
+    pending: List[Awaitable] = []
+    yield pending
+    for result in await asyncio.gather(*pending, return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.warning("Cleanup request failed: %s", result)
+
+@pytest_asyncio.fixture(scope="session")
+async def test_realm(http_client, cleanup):
+    """A realm created once per session for the synthesis tests and deleted during cleanup."""
+    response = await http_client.post(
+        "/realms", content=orjson.dumps(TEST_REALM), headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 200, f"Failed to create test realm: {response.status_code}"
+    realm = orjson.loads(response.content)
+    cleanup.append(http_client.delete(f"/realms/{realm['id']}"))
+    return realm
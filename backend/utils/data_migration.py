@@ -11,8 +11,9 @@ import logging
 import os
 import sys
 
-# Add the parent directory to the Python path
+# Add the parent directory to the Python path (and the repo root for backend.* imports)
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from supabase import create_client, Client
 from core.config import settings
@@ -22,61 +23,108 @@ from datetime import datetime
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Rows per page when reading whole tables, and rows per bulk INSERT
+FETCH_PAGE_SIZE = 1000
+INSERT_CHUNK_SIZE = 500
+# Supabase requests in flight at once; the sync client runs each one in a worker thread
+DB_CONCURRENCY = 16
+
 class DataMigrator:
     """Migrates existing data to new content sources structure."""
     
     def __init__(self):
         """Initialize the migrator with database connection."""
         self.db: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+        self._db_semaphore = asyncio.Semaphore(DB_CONCURRENCY)
+    
+    async def _execute(self, query):
+        """Run a blocking Supabase query in a worker thread, at most DB_CONCURRENCY at a time."""
+        async with self._db_semaphore:
+            return await asyncio.to_thread(query.execute)
+    
+    async def _fetch_all(self, build_query) -> list:
+        """Fetch every row of a query page by page (PostgREST caps a single response at 1000 rows)."""
+        rows = []
+        start = 0
+        while True:
+            page = (await self._execute(build_query().range(start, start + FETCH_PAGE_SIZE - 1))).data or []
+            rows.extend(page)
+            if len(page) < FETCH_PAGE_SIZE:
+                return rows
+            start += FETCH_PAGE_SIZE
+    
+    async def _insert_in_chunks(self, table: str, rows: list, label: str) -> int:
+        """
+        Insert rows in concurrent chunks of INSERT_CHUNK_SIZE; returns how many rows were inserted.
+        A chunk that fails is retried one row at a time, logging each row that still fails.
+        """
+        async def _insert_row(row: dict) -> int:
+            try:
+                await self._execute(self.db.table(table).insert(row, returning='minimal'))
+                return 1
+            except Exception as e:
+                metadata = row.get('metadata') or {}
+                source_id = metadata.get('reflection_id') or metadata.get('text_id')
+                logger.error(f"Error inserting {label} for source {source_id}: {str(e)}")
+                return 0
+        
+        async def _insert_chunk(i: int) -> int:
+            chunk = rows[i:i + INSERT_CHUNK_SIZE]
+            try:
+                await self._execute(self.db.table(table).insert(chunk, returning='minimal'))
+                logger.info(f"Inserted {label} {i + 1}-{i + len(chunk)} of {len(rows)}")
+                return len(chunk)
+            except Exception as e:
+                # One bad row fails the whole INSERT; retry the chunk row by row so only it is lost
+                logger.error(f"Error inserting {label} {i + 1}-{i + len(chunk)}: {str(e)}; retrying rows individually")
+                inserted = await asyncio.gather(*[_insert_row(row) for row in chunk])
+                return sum(inserted)
+        
+        counts = await asyncio.gather(*[_insert_chunk(i) for i in range(0, len(rows), INSERT_CHUNK_SIZE)])
+        return sum(counts)
     
     async def migrate_reflections_to_content_sources(self):
         """Migrate existing reflections to content_sources table."""
         logger.info("Starting migration of reflections to content_sources...")
         
         try:
-            # Get all answered reflections
-            reflections_response = self.db.table('reflections').select('*').neq('answer', None).execute()
-            reflections = reflections_response.data
+            # Get all answered reflections, and preload already-migrated reflection ids
+            # in the same pass (avoid duplicates)
+            reflections, migrated = await asyncio.gather(
+                self._fetch_all(lambda: self.db.table('reflections').select('id,realm_id,question,answer,created_at').neq('answer', None).order('id')),
+                self._fetch_all(
+                    lambda: self.db.table('content_sources')
+                    .select('reflection_id:metadata->>reflection_id')
+                    .eq('source_type', 'reflection')
+                    .order('id')
+                ),
+            )
+            existing = {row['reflection_id'] for row in migrated}
             
             logger.info(f"Found {len(reflections)} answered reflections to migrate")
             
-            migrated_count = 0
+            rows = []
             for reflection in reflections:
-                try:
-                    # Check if already migrated (avoid duplicates)
-                    existing_check = self.db.table('content_sources').select('id').eq(
-                        'metadata->>reflection_id', reflection['id']
-                    ).execute()
-                    
-                    if existing_check.data:
-                        logger.info(f"Reflection {reflection['id']} already migrated, skipping...")
-                        continue
-                    
-                    # Create content source from reflection
-                    content_source_data = {
-                        'realm_id': reflection['realm_id'],
-                        'source_type': 'reflection',
-                        'title': reflection['question'][:100] + '...' if len(reflection['question']) > 100 else reflection['question'],
-                        'content': f"Q: {reflection['question']}\n\nA: {reflection['answer']}",
-                        'metadata': {
-                            'reflection_id': reflection['id'],
-                            'original_question': reflection['question'],
-                            'migrated_at': datetime.utcnow().isoformat()
-                        },
-                        'weight': 1.0,  # Default weight
-                        'created_at': reflection.get('created_at', datetime.utcnow().isoformat())
-                    }
-                    
-                    result = self.db.table('content_sources').insert(content_source_data).execute()
-                    if result.data:
-                        migrated_count += 1
-                        logger.info(f"Migrated reflection {reflection['id']} to content source")
-                    else:
-                        logger.error(f"Failed to migrate reflection {reflection['id']}: No data returned")
-                        
-                except Exception as e:
-                    logger.error(f"Error migrating reflection {reflection['id']}: {str(e)}")
+                if reflection['id'] in existing:
+                    logger.info(f"Reflection {reflection['id']} already migrated, skipping...")
                     continue
+                
+                # Create content source from reflection
+                rows.append({
+                    'realm_id': reflection['realm_id'],
+                    'source_type': 'reflection',
+                    'title': reflection['question'][:100] + '...' if len(reflection['question']) > 100 else reflection['question'],
+                    'content': f"Q: {reflection['question']}\n\nA: {reflection['answer']}",
+                    'metadata': {
+                        'reflection_id': reflection['id'],
+                        'original_question': reflection['question'],
+                        'migrated_at': datetime.utcnow().isoformat()
+                    },
+                    'weight': 1.0,  # Default weight
+                    'created_at': reflection.get('created_at', datetime.utcnow().isoformat())
+                })
+            
+            migrated_count = await self._insert_in_chunks('content_sources', rows, 'reflection content sources')
             
             logger.info(f"Successfully migrated {migrated_count} reflections to content_sources")
             return migrated_count
@@ -90,54 +138,47 @@ class DataMigrator:
         logger.info("Starting migration of texts to content_sources...")
         
         try:
-            # Get all texts
-            texts_response = self.db.table('texts').select('*').execute()
-            texts = texts_response.data
+            # Get all texts, and preload already-migrated text ids in the same pass (avoid duplicates)
+            texts, migrated = await asyncio.gather(
+                self._fetch_all(lambda: self.db.table('texts').select('id,title,content,created_at').order('id')),
+                self._fetch_all(
+                    lambda: self.db.table('content_sources')
+                    .select('text_id:metadata->>text_id')
+                    .eq('source_type', 'text')
+                    .order('id')
+                ),
+            )
+            existing = {row['text_id'] for row in migrated}
             
             logger.info(f"Found {len(texts)} texts to migrate")
             
-            migrated_count = 0
+            rows = []
             for text in texts:
-                try:
-                    # Skip empty texts
-                    if not text['content'] or len(text['content'].strip()) < 10:
-                        logger.info(f"Skipping empty text {text['id']}")
-                        continue
-                    
-                    # Check if already migrated (avoid duplicates)
-                    existing_check = self.db.table('content_sources').select('id').eq(
-                        'metadata->>text_id', text['id']
-                    ).execute()
-                    
-                    if existing_check.data:
-                        logger.info(f"Text {text['id']} already migrated, skipping...")
-                        continue
-                    
-                    # Create content source from text (no realm assignment initially)
-                    content_source_data = {
-                        'realm_id': None,  # Texts start unassigned
-                        'source_type': 'text',
-                        'title': text['title'],
-                        'content': text['content'],
-                        'metadata': {
-                            'text_id': text['id'],
-                            'word_count': len(text['content'].split()),
-                            'migrated_at': datetime.utcnow().isoformat()
-                        },
-                        'weight': 1.0,  # Default weight
-                        'created_at': text.get('created_at', datetime.utcnow().isoformat())
-                    }
-                    
-                    result = self.db.table('content_sources').insert(content_source_data).execute()
-                    if result.data:
-                        migrated_count += 1
-                        logger.info(f"Migrated text {text['id']} to content source")
-                    else:
-                        logger.error(f"Failed to migrate text {text['id']}: No data returned")
-                        
-                except Exception as e:
-                    logger.error(f"Error migrating text {text['id']}: {str(e)}")
+                # Skip empty texts
+                if not text['content'] or len(text['content'].strip()) < 10:
+                    logger.info(f"Skipping empty text {text['id']}")
                     continue
+                
+                if text['id'] in existing:
+                    logger.info(f"Text {text['id']} already migrated, skipping...")
+                    continue
+                
+                # Create content source from text (no realm assignment initially)
+                rows.append({
+                    'realm_id': None,  # Texts start unassigned
+                    'source_type': 'text',
+                    'title': text['title'],
+                    'content': text['content'],
+                    'metadata': {
+                        'text_id': text['id'],
+                        'word_count': len(text['content'].split()),
+                        'migrated_at': datetime.utcnow().isoformat()
+                    },
+                    'weight': 1.0,  # Default weight
+                    'created_at': text.get('created_at', datetime.utcnow().isoformat())
+                })
+            
+            migrated_count = await self._insert_in_chunks('content_sources', rows, 'text content sources')
             
             logger.info(f"Successfully migrated {migrated_count} texts to content_sources")
             return migrated_count
@@ -151,45 +192,33 @@ class DataMigrator:
         logger.info("Creating default prompt versions for existing realms...")
         
         try:
-            # Get all realms
-            realms_response = self.db.table('realms').select('*').execute()
-            realms = realms_response.data
+            # Get all realms, and preload realms that already have a prompt version
+            realms, versioned = await asyncio.gather(
+                self._fetch_all(lambda: self.db.table('realms').select('id,system_prompt,created_at').order('id')),
+                self._fetch_all(lambda: self.db.table('prompt_versions').select('realm_id').order('id')),
+            )
+            existing = {row['realm_id'] for row in versioned}
             
             logger.info(f"Found {len(realms)} realms to create prompt versions for")
             
-            created_count = 0
+            rows = []
             for realm in realms:
-                try:
-                    # Check if prompt version already exists
-                    existing_check = self.db.table('prompt_versions').select('id').eq(
-                        'realm_id', realm['id']
-                    ).execute()
-                    
-                    if existing_check.data:
-                        logger.info(f"Prompt version for realm {realm['id']} already exists, skipping...")
-                        continue
-                    
-                    # Create initial prompt version
-                    prompt_version_data = {
-                        'realm_id': realm['id'],
-                        'version_number': 1,
-                        'content': realm.get('system_prompt', ''),
-                        'synthesis_method': 'legacy',
-                        'quality_score': None,
-                        'effectiveness_metrics': {},
-                        'created_at': realm.get('created_at', datetime.utcnow().isoformat())
-                    }
-                    
-                    result = self.db.table('prompt_versions').insert(prompt_version_data).execute()
-                    if result.data:
-                        created_count += 1
-                        logger.info(f"Created prompt version for realm {realm['id']}")
-                    else:
-                        logger.error(f"Failed to create prompt version for realm {realm['id']}: No data returned")
-                        
-                except Exception as e:
-                    logger.error(f"Error creating prompt version for realm {realm['id']}: {str(e)}")
+                if realm['id'] in existing:
+                    logger.info(f"Prompt version for realm {realm['id']} already exists, skipping...")
                     continue
+                
+                # Create initial prompt version
+                rows.append({
+                    'realm_id': realm['id'],
+                    'version_number': 1,
+                    'content': realm.get('system_prompt', ''),
+                    'synthesis_method': 'legacy',
+                    'quality_score': None,
+                    'effectiveness_metrics': {},
+                    'created_at': realm.get('created_at', datetime.utcnow().isoformat())
+                })
+            
+            created_count = await self._insert_in_chunks('prompt_versions', rows, 'prompt versions')
             
             logger.info(f"Successfully created {created_count} prompt versions")
             return created_count
@@ -203,25 +232,12 @@ class DataMigrator:
         logger.info("Updating realm current_version fields...")
         
         try:
-            # Get all realms
-            realms_response = self.db.table('realms').select('*').execute()
-            realms = realms_response.data
+            # One UPDATE for every realm still missing a current_version
+            result = await self._execute(self.db.table('realms').update({
+                'current_version': 1
+            }).is_('current_version', 'null'))
             
-            updated_count = 0
-            for realm in realms:
-                try:
-                    if realm.get('current_version') is None:
-                        result = self.db.table('realms').update({
-                            'current_version': 1
-                        }).eq('id', realm['id']).execute()
-                        
-                        if result.data:
-                            updated_count += 1
-                            logger.info(f"Updated current_version for realm {realm['id']}")
-                        
-                except Exception as e:
-                    logger.error(f"Error updating realm {realm['id']}: {str(e)}")
-                    continue
+            updated_count = len(result.data or [])
             
             logger.info(f"Successfully updated {updated_count} realm current_version fields")
             return updated_count
@@ -230,8 +246,42 @@ class DataMigrator:
             logger.error(f"Error during realm update: {str(e)}")
             return 0
     
-    async def run_complete_migration(self):
-        """Run the complete data migration process."""
+    async def resynthesize_realms(self):
+        """Re-run full synthesis for every realm, with stage 1 submitted as one Gemini batch job."""
+        logger.info("Re-synthesizing realms via the Gemini Batch API...")
+        
+        # Imported here so plain migrations do not need the synthesis dependencies
+        from backend.services.synthesis_batch import run_full_synthesis_batch
+        from backend.services.synthesis_engine import AdvancedSynthesisEngine
+        
+        try:
+            realms = await self._fetch_all(lambda: self.db.table('realms').select('id').order('id'))
+            realm_ids = [realm['id'] for realm in realms]
+            
+            results = await run_full_synthesis_batch(AdvancedSynthesisEngine(self.db, background=True), realm_ids)
+            
+            async def _save(realm_id: str, synthesized_prompt: str, quality_analysis: dict):
+                try:
+                    await self._execute(self.db.table('realms').update({
+                        'system_prompt': synthesized_prompt,
+                        'quality_score': quality_analysis['quality_assessment']['overall_quality'],
+                        'last_synthesis_at': datetime.utcnow().isoformat()
+                    }).eq('id', realm_id))
+                    logger.info(f"Updated synthesized prompt for realm {realm_id}")
+                except Exception as e:
+                    logger.error(f"Error saving synthesis for realm {realm_id}: {str(e)}")
+            
+            await asyncio.gather(*[_save(realm_id, *result) for realm_id, result in results.items()])
+            
+            logger.info(f"Successfully re-synthesized {len(results)} of {len(realm_ids)} realms")
+            return len(results)
+            
+        except Exception as e:
+            logger.error(f"Error during realm re-synthesis: {str(e)}")
+            return 0
+    
+    async def run_complete_migration(self, resynthesize: bool = False):
+        """Run the complete data migration process; `resynthesize` also regenerates realm prompts."""
         logger.info("=== Starting Complete Data Migration ===")
         
         try:
@@ -247,18 +297,23 @@ class DataMigrator:
             # Step 4: Update realm versions
             realm_update_count = await self.update_realm_current_versions()
             
+            # Step 5 (optional): Re-synthesize historical realms offline
+            resynthesized_count = await self.resynthesize_realms() if resynthesize else 0
+            
             logger.info("=== Migration Summary ===")
             logger.info(f"Reflections migrated: {reflection_count}")
             logger.info(f"Texts migrated: {text_count}")
             logger.info(f"Prompt versions created: {prompt_version_count}")
             logger.info(f"Realms updated: {realm_update_count}")
+            logger.info(f"Realms re-synthesized: {resynthesized_count}")
             logger.info("=== Migration Completed Successfully ===")
             
             return {
                 'reflections': reflection_count,
                 'texts': text_count,
                 'prompt_versions': prompt_version_count,
-                'realms_updated': realm_update_count
+                'realms_updated': realm_update_count,
+                'realms_resynthesized': resynthesized_count
             }
             
         except Exception as e:
@@ -269,7 +324,7 @@ async def main():
     """Main function to run the migration."""
     migrator = DataMigrator()
     try:
-        results = await migrator.run_complete_migration()
+        results = await migrator.run_complete_migration(resynthesize="--resynthesize" in sys.argv)
         print("\n✅ Data migration completed successfully!")
         print(f"📊 Summary: {results}")
     except Exception as e:
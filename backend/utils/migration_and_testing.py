@@ -7,105 +7,332 @@ and provides comprehensive testing of the enhanced synthesis features.
 """
 
 import asyncio
-import requests
-import json
+import hishel
+import httpx
+import logging
+import orjson
+import sys
+import time
 from datetime import datetime
+from itertools import islice
+from logging.handlers import MemoryHandler
+from pathlib import Path
 from typing import List, Dict, Any, Optional
+from urllib.parse import urlsplit
+from hishel.httpx import AsyncCacheTransport
+from tenacity import AsyncRetrying, RetryError, retry_if_result, stop_after_delay, wait_random_exponential
 
 # Configuration
 BASE_URL = "http://localhost:8000"
 
+# Buffered report output: lines are held and written in one go at each section header,
+# on errors, or when this many are pending
+OUTPUT_BUFFER_LINES = 1024
+
+class BufferedOutput(MemoryHandler):
+    """Holds formatted lines and writes them to stdout with a single write() per flush."""
+    
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                sys.stdout.write("".join(f"{self.format(record)}\n" for record in self.buffer))
+                sys.stdout.flush()
+                self.buffer.clear()
+        finally:
+            self.release()
+
+output = logging.getLogger("pathfinder_tester")
+output.setLevel(logging.INFO)
+output.propagate = False
+output_buffer = BufferedOutput(OUTPUT_BUFFER_LINES, flushLevel=logging.ERROR)
+output.addHandler(output_buffer)
+
+# Total time to wait for a synthesis job, and the server-side wait per long-poll request
+JOB_TIMEOUT_SECONDS = 300
+JOB_WAIT_SECONDS = 30
+# Jittered exponential pause between polls that come back with the job still running
+POLL_BACKOFF_MULTIPLIER = 0.25
+POLL_BACKOFF_MAX_SECONDS = 8
+TERMINAL_JOB_STATUSES = ("completed", "failed")
+
+# Demo realm content (one JSON object per line, realm_id filled in) and records per bulk POST
+SAMPLE_CONTENT_PATH = Path(__file__).with_name("sample_content.jsonl")
+SAMPLE_BATCH_SIZE = 100
+
+# Rows the server inserts per request when migrating reflections/texts
+MIGRATION_BATCH_SIZE = 500
+
+# Conditional-GET cache (url -> [etag, body]), kept across runs
+ETAG_CACHE_PATH = Path.home() / ".cache" / "pathfinder_tester_etags.json"
+
+# Disk cache of content analysis POSTs, which spend Gemini tokens, so re-runs within an
+# hour skip them (disable with --no-cache). GETs are not stored here: the server marks them
+# private, no-cache, and cached_get revalidates them with ETags instead.
+RESPONSE_CACHE_PATH = Path.home() / ".cache" / "pathfinder_tester_responses.db"
+ANALYZE_CACHE_TTL_SECONDS = 3600
+# Per-source analysis calls in flight at once (each one is a Gemini request server-side)
+ANALYZE_CONCURRENCY = 4
+
+class CacheableRequest(hishel.BaseFilter[hishel.Request]):
+    """Per-source analysis POSTs only."""
+    
+    def needs_body(self) -> bool:
+        return False
+    
+    def apply(self, item: hishel.Request, body: Optional[bytes]) -> bool:
+        return item.method == "POST" and urlsplit(item.url).path.endswith("/analyze")
+
+class SuccessfulResponse(hishel.BaseFilter[hishel.Response]):
+    def needs_body(self) -> bool:
+        return False
+    
+    def apply(self, item: hishel.Response, body: Optional[bytes]) -> bool:
+        return item.status_code == 200
+
+# Connection pool size, and retry policy for gateway errors on idempotent requests.
+# HTTP/2 multiplexes the fan-out over one connection when the server offers it (TLS + ALPN,
+# e.g. behind an h2 proxy or hypercorn); uvicorn speaks HTTP/1.1, which uses the pool.
+POOL_SIZE = 32
+KEEPALIVE_EXPIRY_SECONDS = 60
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.2
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Request and response bodies go through orjson rather than the stdlib json httpx uses
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+def _json(response: httpx.Response) -> Any:
+    """Parse a JSON response body."""
+    return orjson.loads(response.content)
+
+class RetryingTransport(httpx.AsyncHTTPTransport):
+    """Pooled keep-alive transport that retries idempotent requests on 502/503/504 with backoff."""
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(RETRY_TOTAL + 1):
+            response = await super().handle_async_request(request)
+            if (
+                response.status_code not in RETRY_STATUSES
+                or request.method not in IDEMPOTENT_METHODS
+                or attempt == RETRY_TOTAL
+            ):
+                return response
+            await response.aclose()
+            await asyncio.sleep(RETRY_BACKOFF_FACTOR * (2 ** attempt))
+
 class PathfinderMigrationTester:
     """Utility class for migrating data and testing the enhanced synthesis system."""
     
-    def __init__(self, base_url: str = BASE_URL):
+    def __init__(self, base_url: str = BASE_URL, use_cache: bool = True, analyze_concurrency: int = ANALYZE_CONCURRENCY):
         self.base_url = base_url
-        self.session = requests.Session()
+        self.analyze_concurrency = analyze_concurrency
+        # One pooled client for every call, so independent requests can run concurrently
+        # Connection failures are retried by the transport itself (retries=...)
+        transport = RetryingTransport(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=POOL_SIZE,
+                max_keepalive_connections=POOL_SIZE,
+                keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            retries=RETRY_TOTAL,
+        )
+        if use_cache:
+            RESPONSE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            transport = AsyncCacheTransport(
+                next_transport=transport,
+                storage=hishel.AsyncSqliteStorage(database_path=RESPONSE_CACHE_PATH, default_ttl=ANALYZE_CACHE_TTL_SECONDS),
+                policy=hishel.FilterPolicy(
+                    request_filters=[CacheableRequest()],
+                    response_filters=[SuccessfulResponse()],
+                ),
+            )
+        self.client = httpx.AsyncClient(base_url=base_url, transport=transport, timeout=30)
+        self._etag_cache: Dict[str, List[Any]] = self._load_etag_cache()
+        # Read-only GETs in flight, so concurrent callers of the same URL share one request
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    async def __aenter__(self) -> "PathfinderMigrationTester":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def close(self):
+        """Close the pooled HTTP client and persist the ETag cache."""
+        await self.client.aclose()
+        output_buffer.flush()
+        try:
+            ETAG_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            ETAG_CACHE_PATH.write_bytes(orjson.dumps(self._etag_cache))
+        except OSError as e:
+            self.print_info(f"Could not save ETag cache: {e}")
+    
+    @staticmethod
+    def _load_etag_cache() -> Dict[str, List[Any]]:
+        try:
+            return orjson.loads(ETAG_CACHE_PATH.read_bytes())
+        except (OSError, ValueError):
+            return {}
+    
+    async def cached_get(self, url: str) -> Any:
+        """GET a JSON resource, joining an identical request already in flight."""
+        if url in self._inflight:
+            return await asyncio.shield(self._inflight[url])
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[url] = future
+        try:
+            body = await self._conditional_get(url)
+            future.set_result(body)
+            return body
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark it retrieved so an unshared failure is not logged
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(url, None)
+    
+    async def _conditional_get(self, url: str) -> Any:
+        """GET a JSON resource with If-None-Match, reusing the cached body on 304."""
+        cached = self._etag_cache.get(url)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        response = await self.client.get(url, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        response.raise_for_status()
+        body = _json(response)
+        etag = response.headers.get("ETag")
+        if etag:
+            self._etag_cache[url] = [etag, body]
+        return body
     
     def print_header(self, title: str):
         """Print a formatted header."""
-        print(f"\n{'='*60}")
-        print(f"  {title}")
-        print(f"{'='*60}")
+        output_buffer.flush()
+        output.info(f"\n{'='*60}\n  {title}\n{'='*60}")
     
     def print_step(self, step: str):
         """Print a formatted step."""
-        print(f"\n🔄 {step}")
+        output.info(f"\n🔄 {step}")
     
     def print_success(self, message: str):
         """Print a success message."""
-        print(f"✅ {message}")
+        output.info(f"✅ {message}")
     
     def print_error(self, message: str):
         """Print an error message."""
-        print(f"❌ {message}")
+        output.error(f"❌ {message}")
     
     def print_info(self, message: str):
         """Print an info message."""
-        print(f"ℹ️  {message}")
+        output.info(f"ℹ️  {message}")
     
     # Migration Functions
-    def migrate_reflections_to_content_sources(self, realm_id: Optional[str] = None) -> Dict[str, Any]:
+    async def _nothing_to_migrate(self, source_type: str, realm_id: Optional[str] = None) -> bool:
+        """Cheap count check so a migration with nothing new is not run."""
+        url = f"/content-sources/migration-status?source_type={source_type}"
+        if realm_id:
+            url += f"&realm_id={realm_id}"
+        status = await self.cached_get(url)
+        return status["remaining"] == 0
+    
+    async def migrate_reflections_to_content_sources(self, realm_id: Optional[str] = None) -> Dict[str, Any]:
         """Migrate existing reflections to content sources."""
         self.print_step("Migrating reflections to content sources...")
         
-        endpoint = f"{self.base_url}/content-sources/migrate-from-reflections"
-        params = {"realm_id": realm_id} if realm_id else {}
+        params = {"batch_size": MIGRATION_BATCH_SIZE}
+        if realm_id:
+            params["realm_id"] = realm_id
         
         try:
-            response = self.session.post(endpoint, params=params)
+            if await self._nothing_to_migrate("reflection", realm_id):
+                self.print_info("All reflections already migrated, skipping")
+                return {"migrated_count": 0, "skipped": True}
+            
+            response = await self.client.post("/content-sources/migrate-from-reflections", params=params)
             response.raise_for_status()
-            result = response.json()
+            result = _json(response)
             
             self.print_success(f"Migrated {result['migrated_count']} reflections")
+            if result.get("failed_count"):
+                self.print_error(f"{result['failed_count']} reflections could not be migrated (see server log)")
             return result
         except Exception as e:
             self.print_error(f"Failed to migrate reflections: {e}")
             return {"migrated_count": 0, "error": str(e)}
     
-    def migrate_texts_to_content_sources(self) -> Dict[str, Any]:
+    async def migrate_texts_to_content_sources(self) -> Dict[str, Any]:
         """Migrate existing texts to content sources."""
         self.print_step("Migrating texts to content sources...")
         
-        endpoint = f"{self.base_url}/content-sources/migrate-from-texts"
-        
         try:
-            response = self.session.post(endpoint)
+            if await self._nothing_to_migrate("text"):
+                self.print_info("All texts already migrated, skipping")
+                return {"migrated_count": 0, "skipped": True}
+            
+            response = await self.client.post(
+                "/content-sources/migrate-from-texts", params={"batch_size": MIGRATION_BATCH_SIZE}
+            )
             response.raise_for_status()
-            result = response.json()
+            result = _json(response)
             
             self.print_success(f"Migrated {result['migrated_count']} texts")
+            if result.get("failed_count"):
+                self.print_error(f"{result['failed_count']} texts could not be migrated (see server log)")
             return result
         except Exception as e:
             self.print_error(f"Failed to migrate texts: {e}")
             return {"migrated_count": 0, "error": str(e)}
     
     # Testing Functions
-    def test_content_sources_api(self) -> bool:
+    async def test_content_sources_api(self) -> bool:
         """Test the content sources API endpoints."""
         self.print_step("Testing Content Sources API...")
         
         try:
             # Test GET all content sources
-            response = self.session.get(f"{self.base_url}/content-sources")
-            response.raise_for_status()
-            sources = response.json()
+            # Only ids are needed here, so skip the content bodies
+            sources = await self.cached_get("/content-sources?fields=id,title,source_type")
             self.print_success(f"Retrieved {len(sources)} content sources")
             
             if sources:
-                # Test GET specific content source
-                source_id = sources[0]["id"]
-                response = self.session.get(f"{self.base_url}/content-sources/{source_id}")
-                response.raise_for_status()
-                self.print_success("Successfully retrieved individual content source")
+                # Test GET of every individual content source, concurrently
+                responses = await asyncio.gather(*[
+                    self.client.get(f"/content-sources/{source['id']}") for source in sources
+                ])
+                for response in responses:
+                    response.raise_for_status()
+                self.print_success(f"Successfully retrieved {len(responses)} individual content sources")
+                
+                # Test content source analysis for every source, a few Gemini calls at a time
+                semaphore = asyncio.Semaphore(self.analyze_concurrency)
+                
+                async def _analyze(source_id: str) -> httpx.Response:
+                    async with semaphore:
+                        return await self.client.post(
+                            f"/content-sources/{source_id}/analyze",
+                            extensions={"hishel_ttl": ANALYZE_CACHE_TTL_SECONDS}
+                        )
                 
-                # Test content source analysis
-                response = self.session.post(f"{self.base_url}/content-sources/{source_id}/analyze")
-                if response.status_code == 200:
-                    analysis = response.json()
-                    self.print_success(f"Content analysis successful - Quality Score: {analysis.get('quality_score', 'N/A')}")
-                else:
-                    self.print_info("Content analysis API not fully configured (requires Gemini API key)")
+                results = await asyncio.gather(
+                    *[_analyze(source["id"]) for source in sources], return_exceptions=True
+                )
+                analyses = [
+                    _json(result) for result in results
+                    if isinstance(result, httpx.Response) and result.status_code == 200
+                ]
+                if analyses:
+                    scores = [a["quality_score"] for a in analyses if isinstance(a.get("quality_score"), (int, float))]
+                    average = f"{sum(scores) / len(scores):.2f}" if scores else "N/A"
+                    self.print_success(f"Content analysis successful for {len(analyses)}/{len(results)} sources - Average Quality Score: {average}")
+                if len(analyses) < len(results):
+                    self.print_info(f"Content analysis failed for {len(results) - len(analyses)} sources (the analysis API requires a Gemini API key)")
             
             return True
         except Exception as e:
@@ -118,9 +345,7 @@ class PathfinderMigrationTester:
         
         try:
             # Check if realm has content sources
-            response = self.session.get(f"{self.base_url}/realms/{realm_id}/content-sources")
-            response.raise_for_status()
-            content_sources = response.json()
+            content_sources = await self.cached_get(f"/realms/{realm_id}/content-sources")
             
             if not content_sources:
                 self.print_error("No content sources found for this realm. Run migration first.")
@@ -138,53 +363,63 @@ class PathfinderMigrationTester:
                 }
             }
             
-            response = self.session.post(
-                f"{self.base_url}/realms/{realm_id}/synthesize/advanced",
-                json=synthesis_request
+            response = await self.client.post(
+                f"/realms/{realm_id}/synthesize/advanced",
+                content=orjson.dumps(synthesis_request),
+                headers=JSON_HEADERS
             )
             response.raise_for_status()
-            job_info = response.json()
+            job_info = _json(response)
             
             job_id = job_info["job_id"]
             self.print_success(f"Started synthesis job: {job_id}")
             
-            # Monitor job status
-            max_attempts = 12  # Wait up to 60 seconds
-            for attempt in range(max_attempts):
-                await asyncio.sleep(5)  # Wait 5 seconds
-                
-                response = self.session.get(f"{self.base_url}/synthesis-jobs/{job_id}")
-                response.raise_for_status()
-                job_status = response.json()
-                
-                status = job_status["status"]
-                self.print_info(f"Job status: {status}")
-                
-                if status == "completed":
-                    self.print_success("Synthesis completed successfully!")
-                    quality_score = job_status.get("quality_analysis", {}).get("quality_assessment", {}).get("overall_quality", "Unknown")
-                    self.print_info(f"Quality Score: {quality_score}")
-                    return job_status.get("result_prompt")
-                elif status == "failed":
-                    error_msg = job_status.get("error_message", "Unknown error")
-                    self.print_error(f"Synthesis failed: {error_msg}")
-                    return None
+            # Monitor job status by long-polling: the server answers as soon as the job changes
+            deadline = time.monotonic() + JOB_TIMEOUT_SECONDS
+            polling = AsyncRetrying(
+                wait=wait_random_exponential(multiplier=POLL_BACKOFF_MULTIPLIER, max=POLL_BACKOFF_MAX_SECONDS),
+                stop=stop_after_delay(JOB_TIMEOUT_SECONDS),
+                retry=retry_if_result(lambda job: job["status"] not in TERMINAL_JOB_STATUSES),
+            )
+            try:
+                job_status = await polling(self._poll_job_status, job_id, deadline)
+            except RetryError:
+                self.print_error("Synthesis job timed out")
+                return None
             
-            self.print_error("Synthesis job timed out")
+            if job_status["status"] == "completed":
+                self.print_success("Synthesis completed successfully!")
+                quality_score = job_status.get("quality_analysis", {}).get("quality_assessment", {}).get("overall_quality", "Unknown")
+                self.print_info(f"Quality Score: {quality_score}")
+                return job_status.get("result_prompt")
+            
+            error_msg = job_status.get("error_message", "Unknown error")
+            self.print_error(f"Synthesis failed: {error_msg}")
             return None
             
         except Exception as e:
             self.print_error(f"Advanced synthesis test failed: {e}")
             return None
     
-    def test_content_analysis(self, realm_id: str) -> Dict[str, Any]:
+    async def _poll_job_status(self, job_id: str, deadline: float) -> Dict[str, Any]:
+        """One long-poll for a job's status, waiting server-side no longer than the deadline allows."""
+        wait = max(1, min(JOB_WAIT_SECONDS, int(deadline - time.monotonic())))
+        response = await self.client.get(
+            f"/synthesis-jobs/{job_id}", params={"wait": wait}, timeout=wait + 10
+        )
+        response.raise_for_status()
+        job_status = _json(response)
+        self.print_info(f"Job status: {job_status['status']}")
+        return job_status
+    
+    async def test_content_analysis(self, realm_id: str) -> Dict[str, Any]:
         """Test content analysis for a realm."""
         self.print_step(f"Testing Content Analysis for realm {realm_id}...")
         
         try:
-            response = self.session.get(f"{self.base_url}/realms/{realm_id}/content-analysis")
+            response = await self.client.get(f"/realms/{realm_id}/content-analysis")
             response.raise_for_status()
-            analysis = response.json()
+            analysis = _json(response)
             
             if "analysis" in analysis:
                 themes = analysis["analysis"].get("themes", [])
@@ -197,26 +432,24 @@ class PathfinderMigrationTester:
                 self.print_info(f"Quality score: {quality_score}")
                 
                 if themes:
-                    print(f"  📋 Top themes: {', '.join(themes[:3])}")
+                    output.info(f"  📋 Top themes: {', '.join(themes[:3])}")
                 if traits:
-                    print(f"  👤 Key traits: {', '.join(traits[:3])}")
+                    output.info(f"  👤 Key traits: {', '.join(traits[:3])}")
             
             return analysis
         except Exception as e:
             self.print_error(f"Content analysis test failed: {e}")
             return {}
     
-    def get_available_realms(self) -> List[Dict[str, Any]]:
+    async def get_available_realms(self) -> List[Dict[str, Any]]:
         """Get list of available realms."""
         try:
-            response = self.session.get(f"{self.base_url}/realms")
-            response.raise_for_status()
-            return response.json()
+            return await self.cached_get("/realms")
         except Exception as e:
             self.print_error(f"Failed to get realms: {e}")
             return []
     
-    def create_test_realm_with_content(self) -> Optional[str]:
+    async def create_test_realm_with_content(self) -> Optional[str]:
         """Create a test realm with sample content for demonstration."""
         self.print_step("Creating test realm with sample content...")
         
@@ -226,43 +459,27 @@ class PathfinderMigrationTester:
                 "name": "Synthesis Test Realm",
                 "system_prompt": "Basic test realm for synthesis enhancement demo"
             }
-            response = self.session.post(f"{self.base_url}/realms", json=realm_data)
+            response = await self.client.post("/realms", content=orjson.dumps(realm_data), headers=JSON_HEADERS)
             response.raise_for_status()
-            realm = response.json()
+            realm = _json(response)
             realm_id = realm["id"]
             
             self.print_success(f"Created test realm: {realm_id}")
             
-            # Add sample content sources
-            sample_content = [
-                {
-                    "realm_id": realm_id,
-                    "source_type": "text",
-                    "title": "Personal Philosophy",
-                    "content": "I believe in continuous learning and helping others grow. Technology should be used to empower people, not replace human connection. I value authenticity, curiosity, and kindness in all interactions.",
-                    "weight": 3.0
-                },
-                {
-                    "realm_id": realm_id,
-                    "source_type": "reflection",
-                    "title": "Communication Style",
-                    "content": "Q: How do you prefer to communicate complex ideas?\nA: I like to break down complex concepts into simple, relatable examples. I prefer direct but friendly communication, and I always try to acknowledge when I don't know something.",
-                    "weight": 2.5
-                },
-                {
-                    "realm_id": realm_id,
-                    "source_type": "text",
-                    "title": "Work Preferences",
-                    "content": "I work best in collaborative environments where ideas can be shared freely. I prefer asynchronous communication for deep work, but I value regular check-ins and feedback. I believe in iterative improvement over perfectionism.",
-                    "weight": 2.0
-                }
-            ]
-            
-            for content in sample_content:
-                response = self.session.post(f"{self.base_url}/content-sources", json=content)
-                response.raise_for_status()
+            # Add sample content sources, streamed from the data file a batch at a time
+            added = 0
+            with open(SAMPLE_CONTENT_PATH, 'rb') as f:
+                records = (orjson.loads(line) for line in f if line.strip())
+                while batch := list(islice(records, SAMPLE_BATCH_SIZE)):
+                    for record in batch:
+                        record["realm_id"] = realm_id
+                    response = await self.client.post(
+                        "/content-sources/bulk", content=orjson.dumps(batch), headers=JSON_HEADERS
+                    )
+                    response.raise_for_status()
+                    added += len(batch)
             
-            self.print_success("Added sample content sources")
+            self.print_success(f"Added {added} sample content sources")
             return realm_id
             
         except Exception as e:
@@ -273,33 +490,33 @@ class PathfinderMigrationTester:
         """Run a comprehensive test of the enhanced synthesis system."""
         self.print_header("PATHFINDER SYNTHESIS ENHANCEMENT TEST SUITE")
         
-        # Test 1: Migration
+        # Test 1: Migration (the two migrations are independent, so run them together)
         self.print_header("STEP 1: DATA MIGRATION")
-        migration_results = {
-            "reflections": self.migrate_reflections_to_content_sources(),
-            "texts": self.migrate_texts_to_content_sources()
-        }
-        
-        # Test 2: API Testing
-        self.print_header("STEP 2: API FUNCTIONALITY TEST")
-        api_test_passed = self.test_content_sources_api()
+        reflections_result, texts_result = await asyncio.gather(
+            self.migrate_reflections_to_content_sources(),
+            self.migrate_texts_to_content_sources()
+        )
+        migration_results = {"reflections": reflections_result, "texts": texts_result}
         
-        # Test 3: Get or create a realm for testing
-        self.print_header("STEP 3: REALM PREPARATION")
-        realms = self.get_available_realms()
+        # Test 2 & 3: API testing and realm lookup, concurrently
+        self.print_header("STEP 2: API FUNCTIONALITY TEST / STEP 3: REALM PREPARATION")
+        api_test_passed, realms = await asyncio.gather(
+            self.test_content_sources_api(),
+            self.get_available_realms()
+        )
         
         if realms:
             realm_id = realms[0]["id"]
             self.print_success(f"Using existing realm: {realms[0]['name']} ({realm_id})")
         else:
-            realm_id = self.create_test_realm_with_content()
+            realm_id = await self.create_test_realm_with_content()
             if not realm_id:
                 self.print_error("Cannot proceed without a realm")
                 return
         
         # Test 4: Content Analysis
         self.print_header("STEP 4: CONTENT ANALYSIS TEST")
-        analysis_results = self.test_content_analysis(realm_id)
+        analysis_results = await self.test_content_analysis(realm_id)
         
         # Test 5: Advanced Synthesis
         self.print_header("STEP 5: ADVANCED SYNTHESIS TEST")
@@ -311,61 +528,77 @@ class PathfinderMigrationTester:
         total_migrated = (migration_results["reflections"]["migrated_count"] + 
                          migration_results["texts"]["migrated_count"])
         
-        print(f"📊 Migration Results:")
-        print(f"   • Reflections migrated: {migration_results['reflections']['migrated_count']}")
-        print(f"   • Texts migrated: {migration_results['texts']['migrated_count']}")
-        print(f"   • Total content sources created: {total_migrated}")
+        output.info(f"📊 Migration Results:")
+        output.info(f"   • Reflections migrated: {migration_results['reflections']['migrated_count']}")
+        output.info(f"   • Texts migrated: {migration_results['texts']['migrated_count']}")
+        output.info(f"   • Total content sources created: {total_migrated}")
         
-        print(f"\n🔧 API Tests:")
-        print(f"   • Content Sources API: {'✅ PASSED' if api_test_passed else '❌ FAILED'}")
-        print(f"   • Content Analysis: {'✅ PASSED' if analysis_results else '❌ FAILED'}")
-        print(f"   • Advanced Synthesis: {'✅ PASSED' if synthesis_result else '❌ FAILED'}")
+        output.info(f"\n🔧 API Tests:")
+        output.info(f"   • Content Sources API: {'✅ PASSED' if api_test_passed else '❌ FAILED'}")
+        output.info(f"   • Content Analysis: {'✅ PASSED' if analysis_results else '❌ FAILED'}")
+        output.info(f"   • Advanced Synthesis: {'✅ PASSED' if synthesis_result else '❌ FAILED'}")
         
         if synthesis_result:
-            print(f"\n🎯 Generated System Prompt Preview:")
-            print(f"   {synthesis_result[:200]}...")
+            output.info(f"\n🎯 Generated System Prompt Preview:")
+            output.info(f"   {synthesis_result[:200]}...")
         
         self.print_header("NEXT STEPS")
-        print("1. The enhanced synthesis system is now operational")
-        print("2. Use the content sources API to manage your content")
-        print("3. Run advanced synthesis to generate improved prompts")
-        print("4. Monitor quality scores and iteratively improve content")
-        print("5. Check the SYNTHESIS_ENHANCEMENT_PLAN.md for detailed usage instructions")
+        output.info("1. The enhanced synthesis system is now operational")
+        output.info("2. Use the content sources API to manage your content")
+        output.info("3. Run advanced synthesis to generate improved prompts")
+        output.info("4. Monitor quality scores and iteratively improve content")
+        output.info("5. Check the SYNTHESIS_ENHANCEMENT_PLAN.md for detailed usage instructions")
+
+async def _cmd_comprehensive(tester: PathfinderMigrationTester):
+    await tester.run_comprehensive_test()
+
+async def _cmd_migrate(tester: PathfinderMigrationTester):
+    tester.print_header("MIGRATION ONLY")
+    await asyncio.gather(
+        tester.migrate_reflections_to_content_sources(),
+        tester.migrate_texts_to_content_sources()
+    )
+
+async def _cmd_test_api(tester: PathfinderMigrationTester):
+    tester.print_header("API TESTING ONLY")
+    await tester.test_content_sources_api()
+
+async def _cmd_create_demo(tester: PathfinderMigrationTester):
+    tester.print_header("DEMO REALM CREATION")
+    realm_id = await tester.create_test_realm_with_content()
+    if realm_id:
+        output.info(f"Demo realm created: {realm_id}")
+
+# CLI commands; running without one does the full comprehensive test
+COMMANDS = {
+    "migrate": _cmd_migrate,
+    "test-api": _cmd_test_api,
+    "create-demo": _cmd_create_demo,
+}
+
+async def run_command(tester: PathfinderMigrationTester, command: Optional[str]):
+    """Run one CLI command (or the comprehensive test when None), closing the client afterwards."""
+    async with tester:
+        await COMMANDS.get(command, _cmd_comprehensive)(tester)
 
 def main():
     """Main entry point for the migration and testing utility."""
-    import sys
+    import argparse
     
-    tester = PathfinderMigrationTester()
-    
-    if len(sys.argv) > 1:
-        command = sys.argv[1].lower()
-        
-        if command == "migrate":
-            # Just run migration
-            tester.print_header("MIGRATION ONLY")
-            tester.migrate_reflections_to_content_sources()
-            tester.migrate_texts_to_content_sources()
-        
-        elif command == "test-api":
-            # Just test APIs
-            tester.print_header("API TESTING ONLY")
-            tester.test_content_sources_api()
-        
-        elif command == "create-demo":
-            # Create demo realm
-            tester.print_header("DEMO REALM CREATION")
-            realm_id = tester.create_test_realm_with_content()
-            if realm_id:
-                print(f"Demo realm created: {realm_id}")
-        
-        else:
-            print("Usage: python migration_and_testing.py [migrate|test-api|create-demo]")
-            print("Or run without arguments for full comprehensive test")
+    parser = argparse.ArgumentParser(description="Pathfinder synthesis migration & testing utility")
+    parser.add_argument(
+        "command", nargs="?", choices=sorted(COMMANDS), type=str.lower,
+        help="run a single step; omit for the full comprehensive test"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="bypass the on-disk response cache")
+    parser.add_argument(
+        "--concurrency", type=int, default=ANALYZE_CONCURRENCY,
+        help=f"content analysis calls in flight at once (default {ANALYZE_CONCURRENCY})"
+    )
+    args = parser.parse_args()
     
-    else:
-        # Run comprehensive test
-        asyncio.run(tester.run_comprehensive_test())
+    tester = PathfinderMigrationTester(use_cache=not args.no_cache, analyze_concurrency=args.concurrency)
+    asyncio.run(run_command(tester, args.command))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -2,400 +2,331 @@
 """
 Enhanced Synthesis System Integration Test
 
-This script tests the complete enhanced synthesis system end-to-end,
-including content sources, advanced synthesis, and API endpoints.
+These tests exercise the complete enhanced synthesis system end-to-end,
+including content sources, advanced synthesis, and API endpoints. The API
+tests expect the server on http://localhost:8000; fixtures are in conftest.py.
+
+    pytest backend/utils/test_enhanced_synthesis.py
+    pytest -n auto --dist=loadfile backend/utils    # one xdist worker per test file
 """
 
 import asyncio
 import logging
 import os
+import statistics
 import sys
-import json
 import time
-from typing import Dict, Any, List
+from typing import Awaitable, Callable, Dict, Any, List, Tuple
 
-# Add the parent directory to the Python path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import orjson
+import pytest
+import pytest_asyncio
 
-from supabase import create_client, Client
-from core.config import settings
-import httpx
+# Imported once per process; test_synthesis_services reports the error if this fails
+try:
+    from backend.services.synthesis_engine import AdvancedSynthesisEngine
+    from backend.services.smart_synthesis_manager import SmartSynthesisManager
+    _SYNTH_IMPORT_ERROR = None
+except ImportError as e:
+    _SYNTH_IMPORT_ERROR = e
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging; TEST_LOG_LEVEL=INFO shows the burst latencies. Set on the logger too,
+# since basicConfig does nothing once pytest has installed its own handlers.
+LOG_LEVEL = (os.getenv("TEST_LOG_LEVEL") or "WARNING").upper()
+logging.basicConfig(level=LOG_LEVEL)
 logger = logging.getLogger(__name__)
+logger.setLevel(LOG_LEVEL)
 
-class EnhancedSynthesisSystemTest:
-    """Comprehensive test suite for the enhanced synthesis system."""
-    
-    def __init__(self):
-        """Initialize the test suite."""
-        self.db: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-        self.base_url = "http://localhost:8000"
-        self.test_results = {}
-        
-    async def test_database_schema(self):
-        """Test that all new database tables and columns exist."""
-        logger.info("Testing database schema...")
-        
-        tests = []
-        
-        try:
-            # Test content_sources table
-            content_sources = self.db.table('content_sources').select('*').limit(1).execute()
-            tests.append(("content_sources_table", True, "Content sources table exists"))
-            
-            # Test prompt_versions table  
-            prompt_versions = self.db.table('prompt_versions').select('*').limit(1).execute()
-            tests.append(("prompt_versions_table", True, "Prompt versions table exists"))
-            
-            # Test synthesis_jobs table
-            synthesis_jobs = self.db.table('synthesis_jobs').select('*').limit(1).execute()
-            tests.append(("synthesis_jobs_table", True, "Synthesis jobs table exists"))
-            
-            # Test conversation_metrics table
-            conversation_metrics = self.db.table('conversation_metrics').select('*').limit(1).execute()
-            tests.append(("conversation_metrics_table", True, "Conversation metrics table exists"))
-            
-            # Test realm enhancements
-            realms = self.db.table('realms').select('current_version,quality_score').limit(1).execute()
-            tests.append(("realm_enhancements", True, "Realm enhancements exist"))
-            
-        except Exception as e:
-            tests.append(("database_schema", False, f"Database schema test failed: {str(e)}"))
-        
-        self.test_results["database_schema"] = tests
-        return tests
-    
-    async def test_content_sources_api(self):
-        """Test content sources API endpoints."""
-        logger.info("Testing content sources API...")
-        
-        tests = []
-        
-        try:
-            async with httpx.AsyncClient() as client:
-                # Test getting content sources for a realm
-                response = await client.get(f"{self.base_url}/content-sources")
-                tests.append((
-                    "get_content_sources", 
-                    response.status_code in [200, 404], 
-                    f"GET /content-sources returned {response.status_code}"
-                ))
-                
-                # Test creating a content source
-                test_content_source = {
-                    "realm_id": None,
-                    "source_type": "structured",
-                    "title": "Test Content Source",
-                    "content": "This is a test content source for the enhanced synthesis system.",
-                    "metadata": {"test": True},
-                    "weight": 1.5
-                }
-                
-                response = await client.post(
-                    f"{self.base_url}/content-sources",
-                    json=test_content_source
-                )
-                
-                if response.status_code == 200:
-                    content_source_id = response.json().get("id")
-                    tests.append(("create_content_source", True, f"Created content source: {content_source_id}"))
-                    
-                    # Test updating weight
-                    response = await client.put(
-                        f"{self.base_url}/content-sources/{content_source_id}/weight",
-                        json={"weight": 2.0}
-                    )
-                    tests.append((
-                        "update_content_source_weight", 
-                        response.status_code == 200, 
-                        f"Updated weight returned {response.status_code}"
-                    ))
-                    
-                    # Test deleting content source
-                    response = await client.delete(f"{self.base_url}/content-sources/{content_source_id}")
-                    tests.append((
-                        "delete_content_source", 
-                        response.status_code == 200, 
-                        f"Delete content source returned {response.status_code}"
-                    ))
-                else:
-                    tests.append(("create_content_source", False, f"Failed to create content source: {response.status_code}"))
-                
-        except Exception as e:
-            tests.append(("content_sources_api", False, f"Content sources API test failed: {str(e)}"))
-        
-        self.test_results["content_sources_api"] = tests
-        return tests
-    
-    async def test_advanced_synthesis_api(self):
-        """Test advanced synthesis API endpoints."""
-        logger.info("Testing advanced synthesis API...")
-        
-        tests = []
-        
-        try:
-            async with httpx.AsyncClient() as client:
-                # Create a test realm first
-                test_realm = {
-                    "name": "Test Synthesis Realm",
-                    "system_prompt": "You are a helpful assistant for testing synthesis."
-                }
-                
-                realm_response = await client.post(f"{self.base_url}/realms", json=test_realm)
-                
-                if realm_response.status_code == 200:
-                    realm_id = realm_response.json().get("id")
-                    tests.append(("create_test_realm", True, f"Created test realm: {realm_id}"))
-                    
-                    # Test advanced synthesis endpoint
-                    synthesis_request = {
-                        "synthesis_type": "full",
-                        "configuration": {
-                            "include_quality_assessment": True,
-                            "generate_suggestions": True
-                        }
-                    }
-                    
-                    response = await client.post(
-                        f"{self.base_url}/realms/{realm_id}/synthesize/advanced",
-                        json=synthesis_request
-                    )
-                    
-                    if response.status_code == 200:
-                        job_data = response.json()
-                        job_id = job_data.get("job_id")
-                        tests.append(("start_advanced_synthesis", True, f"Started synthesis job: {job_id}"))
-                        
-                        # Test job status endpoint
-                        if job_id:
-                            await asyncio.sleep(2)  # Wait a moment for job to process
-                            status_response = await client.get(f"{self.base_url}/synthesis-jobs/{job_id}")
-                            tests.append((
-                                "get_synthesis_job_status", 
-                                status_response.status_code == 200, 
-                                f"Job status returned {status_response.status_code}"
-                            ))
-                    else:
-                        tests.append(("start_advanced_synthesis", False, f"Failed to start synthesis: {response.status_code}"))
-                    
-                    # Test batch processing endpoint
-                    batch_response = await client.post(f"{self.base_url}/realms/{realm_id}/process-batch-queue")
-                    tests.append((
-                        "process_batch_queue", 
-                        batch_response.status_code in [200, 204], 
-                        f"Batch processing returned {batch_response.status_code}"
-                    ))
-                    
-                    # Clean up - delete test realm
-                    await client.delete(f"{self.base_url}/realms/{realm_id}")
-                else:
-                    tests.append(("create_test_realm", False, f"Failed to create test realm: {realm_response.status_code}"))
-                
-        except Exception as e:
-            tests.append(("advanced_synthesis_api", False, f"Advanced synthesis API test failed: {str(e)}"))
-        
-        self.test_results["advanced_synthesis_api"] = tests
-        return tests
-    
-    async def test_synthesis_services(self):
-        """Test synthesis service components."""
-        logger.info("Testing synthesis services...")
-        
-        tests = []
-        
-        try:
-            # Import and test synthesis components
-            from services.synthesis_engine import SynthesisEngine
-            from services.smart_synthesis_manager import SmartSynthesisManager
-            
-            # Test SynthesisEngine initialization
-            engine = SynthesisEngine()
-            tests.append(("synthesis_engine_init", True, "SynthesisEngine initialized successfully"))
-            
-            # Test SmartSynthesisManager initialization  
-            manager = SmartSynthesisManager()
-            tests.append(("smart_synthesis_manager_init", True, "SmartSynthesisManager initialized successfully"))
-            
-            # Test basic synthesis functionality
-            test_sources = [
-                {"content": "This is test content 1", "weight": 1.0},
-                {"content": "This is test content 2", "weight": 1.5}
-            ]
-            
-            # This would normally require a realm, but we're testing the basic functionality
-            # result = await engine.synthesize_sources(test_sources, "Test prompt")
-            # tests.append(("basic_synthesis", True, "Basic synthesis completed"))
-            
-        except ImportError as e:
-            tests.append(("synthesis_services_import", False, f"Failed to import synthesis services: {str(e)}"))
-        except Exception as e:
-            tests.append(("synthesis_services", False, f"Synthesis services test failed: {str(e)}"))
-        
-        self.test_results["synthesis_services"] = tests
-        return tests
-    
-    async def test_data_migration_integrity(self):
-        """Test that data migration maintained integrity."""
-        logger.info("Testing data migration integrity...")
-        
-        tests = []
-        
+# How long test_advanced_synthesis_api long-polls the job status for a finished job
+JOB_STATUS_TIMEOUT_SECONDS = 5.0
+
+# (test id, table, columns that must exist) for test_database_schema
+SCHEMA_CHECKS = [
+    ("content_sources_table", "content_sources", []),
+    ("prompt_versions_table", "prompt_versions", []),
+    ("synthesis_jobs_table", "synthesis_jobs", []),
+    ("conversation_metrics_table", "conversation_metrics", []),
+    ("realm_enhancements", "realms", ["current_version", "quality_score"]),
+]
+
+# Concurrent requests per burst in the performance tests, and the bars they must clear
+BURST_SIZE = 50
+API_MIN_RPS = 20.0
+API_MAX_P95_SECONDS = 1.0
+DB_MIN_RPS = 10.0
+DB_MAX_P95_SECONDS = 2.0
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Batched calls for test_content_source_lifecycle: create, re-weight and delete one source
+CONTENT_SOURCE_CALLS = [
+    {
+        "call_id": "create", "method": "POST", "path": "/content-sources",
+        "body": {
+            "realm_id": None,
+            "source_type": "structured",
+            "title": "Test Content Source",
+            "content": "This is a test content source for the enhanced synthesis system.",
+            "metadata": {"test": True},
+            "weight": 1.5
+        }
+    },
+    {
+        "call_id": "update_weight", "method": "PUT",
+        "path": "/content-sources/{source_id}/weight?weight=2.0",
+        "input_from": {"source_id": "create.id"}
+    },
+    {
+        "call_id": "delete", "method": "DELETE",
+        "path": "/content-sources/{source_id}",
+        "input_from": {"source_id": "create.id"}, "depends_on": ["update_weight"]
+    },
+]
+
+# Batched calls for test_advanced_synthesis_api on the shared test realm: synthesis, then
+# batch processing; {realm_id} is filled in by _for_realm
+SYNTHESIS_CALLS = [
+    {
+        "call_id": "synthesize", "method": "POST",
+        "path": "/realms/{realm_id}/synthesize/advanced",
+        "body": {
+            "synthesis_type": "full",
+            "configuration": {
+                "include_quality_assessment": True,
+                "generate_suggestions": True
+            }
+        }
+    },
+    {
+        "call_id": "process_batch_queue", "method": "POST",
+        "path": "/realms/{realm_id}/process-batch-queue",
+        "depends_on": ["synthesize"]
+    },
+]
+
+async def _execute(query):
+    """Execute a blocking Supabase query in a worker thread so the event loop stays free."""
+    return await asyncio.to_thread(query.execute)
+
+async def _batch(http_client, calls: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Run dependent API calls in one POST /batch round trip, returning results by call_id.
+    Servers without /batch get one request per call, in list order (which must respect
+    the dependencies; input_from fields are looked up one level deep).
+    """
+    response = await http_client.post("/batch", content=orjson.dumps(calls), headers=JSON_HEADERS)
+    if response.status_code != 404:
+        response.raise_for_status()
+        return {result["call_id"]: result for result in orjson.loads(response.content)}
+
+    results = {}
+    for call in calls:
+        inputs = call.get("input_from", {})
+        sources = {name: ref.split(".", 1) for name, ref in inputs.items()}
+        if any(results[call_id]["status_code"] >= 400 for call_id, _ in sources.values()):
+            results[call["call_id"]] = {"call_id": call["call_id"], "status_code": 424, "body": None}
+            continue
+        values = {name: results[call_id]["body"][field] for name, (call_id, field) in sources.items()}
+        body = call.get("body")
+        if isinstance(body, dict):
+            body = {**body, **values}
+        response = await http_client.request(
+            call.get("method", "GET"), call["path"].format(**values),
+            content=None if body is None else orjson.dumps(body), headers=JSON_HEADERS
+        )
         try:
-            # Check that content sources were created from reflections
-            content_sources_response = self.db.table('content_sources').select('*').eq('source_type', 'reflection').execute()
-            reflection_sources = content_sources_response.data
-            
-            # Check that original reflections still exist
-            reflections_response = self.db.table('reflections').select('*').execute()
-            original_reflections = reflections_response.data
-            
-            tests.append((
-                "reflection_migration_integrity", 
-                len(reflection_sources) > 0, 
-                f"Found {len(reflection_sources)} migrated reflections"
-            ))
-            
-            # Check that content sources were created from texts
-            text_sources_response = self.db.table('content_sources').select('*').eq('source_type', 'text').execute()
-            text_sources = text_sources_response.data
-            
-            tests.append((
-                "text_migration_integrity", 
-                len(text_sources) > 0, 
-                f"Found {len(text_sources)} migrated texts"
-            ))
-            
-            # Verify metadata structure
-            if reflection_sources:
-                sample_reflection = reflection_sources[0]
-                has_metadata = 'metadata' in sample_reflection and 'reflection_id' in sample_reflection['metadata']
-                tests.append(("reflection_metadata_structure", has_metadata, "Reflection metadata properly structured"))
-            
-            if text_sources:
-                sample_text = text_sources[0]
-                has_metadata = 'metadata' in sample_text and 'text_id' in sample_text['metadata']
-                tests.append(("text_metadata_structure", has_metadata, "Text metadata properly structured"))
-            
-        except Exception as e:
-            tests.append(("data_migration_integrity", False, f"Data migration integrity test failed: {str(e)}"))
-        
-        self.test_results["data_migration_integrity"] = tests
-        return tests
-    
-    async def test_performance_metrics(self):
-        """Test performance and basic load handling."""
-        logger.info("Testing performance metrics...")
-        
-        tests = []
-        
+            result_body = orjson.loads(response.content)
+        except ValueError:
+            result_body = response.text or None
+        results[call["call_id"]] = {"call_id": call["call_id"], "status_code": response.status_code, "body": result_body}
+    return results
+
+def _for_realm(calls: List[Dict[str, Any]], realm_id: str) -> List[Dict[str, Any]]:
+    """Fill {realm_id} into each call's path and set it on object bodies."""
+    filled = []
+    for call in calls:
+        call = {**call, "path": call["path"].format(realm_id=realm_id)}
+        if isinstance(call.get("body"), dict):
+            call["body"] = {**call["body"], "realm_id": realm_id}
+        filled.append(call)
+    return filled
+
+async def _burst(request: Callable[[], Awaitable[Any]], count: int = BURST_SIZE) -> Tuple[List[float], int, float]:
+    """
+    Fire count copies of request() at once. Returns the latency in seconds of each call
+    that succeeded, how many raised, and requests per second over the whole burst.
+    """
+    async def _timed() -> float:
+        start_ns = time.perf_counter_ns()
+        await request()
+        return (time.perf_counter_ns() - start_ns) / 1e9
+
+    start_ns = time.perf_counter_ns()
+    outcomes = await asyncio.gather(*(_timed() for _ in range(count)), return_exceptions=True)
+    elapsed = (time.perf_counter_ns() - start_ns) / 1e9
+    latencies = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+    return latencies, count - len(latencies), count / elapsed
+
+def _p95(latencies: List[float]) -> float:
+    return statistics.quantiles(latencies, n=20)[18]
+
+async def _probe_schema(db, expected: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Fallback for databases without check_schema: one concurrent select per table."""
+    async def _probe(table: str, columns: List[str]) -> Dict[str, Any]:
+        query = db.table(table).select(','.join(columns) or 'id').limit(1)
         try:
-            start_time = time.time()
-            
-            # Test database query performance
-            content_sources_response = self.db.table('content_sources').select('*').limit(100).execute()
-            db_query_time = time.time() - start_time
-            
-            tests.append((
-                "database_query_performance", 
-                db_query_time < 2.0, 
-                f"Database query took {db_query_time:.2f}s"
-            ))
-            
-            # Test API response time
-            start_time = time.time()
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/content-sources")
-                api_response_time = time.time() - start_time
-                
-            tests.append((
-                "api_response_performance", 
-                api_response_time < 3.0, 
-                f"API response took {api_response_time:.2f}s"
-            ))
-            
-        except Exception as e:
-            tests.append(("performance_metrics", False, f"Performance test failed: {str(e)}"))
-        
-        self.test_results["performance_metrics"] = tests
-        return tests
-    
-    def print_test_results(self):
-        """Print comprehensive test results."""
-        print("\n" + "="*80)
-        print("ENHANCED SYNTHESIS SYSTEM TEST RESULTS")
-        print("="*80)
-        
-        total_tests = 0
-        passed_tests = 0
-        
-        for category, tests in self.test_results.items():
-            print(f"\n📋 {category.upper().replace('_', ' ')}")
-            print("-" * 50)
-            
-            for test_name, passed, message in tests:
-                total_tests += 1
-                if passed:
-                    passed_tests += 1
-                    print(f"✅ {test_name}: {message}")
-                else:
-                    print(f"❌ {test_name}: {message}")
-        
-        print("\n" + "="*80)
-        print(f"SUMMARY: {passed_tests}/{total_tests} tests passed ({(passed_tests/total_tests)*100:.1f}%)")
-        
-        if passed_tests == total_tests:
-            print("🎉 ALL TESTS PASSED! The enhanced synthesis system is working correctly.")
-        else:
-            print("⚠️  Some tests failed. Please review the issues above.")
-        
-        print("="*80)
-    
-    async def run_all_tests(self):
-        """Run all test suites."""
-        logger.info("Starting enhanced synthesis system test suite...")
-        
-        test_suites = [
-            self.test_database_schema,
-            self.test_data_migration_integrity,
-            self.test_content_sources_api,
-            self.test_advanced_synthesis_api,
-            self.test_synthesis_services,
-            self.test_performance_metrics,
-        ]
-        
-        for test_suite in test_suites:
-            try:
-                await test_suite()
-            except Exception as e:
-                logger.error(f"Test suite {test_suite.__name__} failed with exception: {str(e)}")
-        
-        self.print_test_results()
-        
-        # Return overall success status
-        total_tests = sum(len(tests) for tests in self.test_results.values())
-        passed_tests = sum(len([t for t in tests if t[1]]) for tests in self.test_results.values())
-        
-        return passed_tests == total_tests
-
-async def main():
-    """Main function to run the test suite."""
-    test_suite = EnhancedSynthesisSystemTest()
-    
+            await _execute(query)
+            return {'exists': True, 'missing_columns': []}
+        except Exception:
+            # PostgREST does not say whether the table or a column is missing
+            return {'exists': bool(columns), 'missing_columns': columns}
+
+    results = await asyncio.gather(*(_probe(table, columns) for table, columns in expected.items()))
+    return dict(zip(expected, results))
+
+@pytest_asyncio.fixture(scope="module")
+async def schema(db) -> Dict[str, Any]:
+    """Table/column status for every SCHEMA_CHECKS entry, from one check_schema RPC."""
+    expected = {table: columns for _, table, columns in SCHEMA_CHECKS}
     try:
-        success = await test_suite.run_all_tests()
-        
-        if success:
-            print("\n✅ Enhanced synthesis system is fully operational!")
-            sys.exit(0)
-        else:
-            print("\n❌ Enhanced synthesis system has issues that need attention.")
-            sys.exit(1)
-            
+        return (await _execute(db.rpc('check_schema', {'p_columns': expected}))).data
     except Exception as e:
-        print(f"\n💥 Test suite failed with critical error: {str(e)}")
-        sys.exit(1)
+        logger.warning("check_schema RPC unavailable (%s); probing tables directly", e)
+        return await _probe_schema(db, expected)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "table, columns",
+    [(table, columns) for _, table, columns in SCHEMA_CHECKS],
+    ids=[test_id for test_id, _, _ in SCHEMA_CHECKS]
+)
+async def test_database_schema(schema, table, columns):
+    """Test that all new database tables and columns exist (see add_rpc_functions.sql)."""
+    status = schema.get(table) or {}
+    assert status.get('exists'), f"Table {table} does not exist"
+    missing = status.get('missing_columns') or []
+    assert not missing, f"Table {table} is missing columns: {', '.join(missing)}"
+
+@pytest.mark.asyncio
+async def test_reflection_migration_integrity(db):
+    """Test that reflections were migrated to content sources with their metadata."""
+    # A count plus one sample row, instead of whole tables
+    sources_response, reflections_response = await asyncio.gather(
+        _execute(db.table('content_sources').select('id,metadata', count='exact').eq('source_type', 'reflection').limit(1)),
+        _execute(db.table('reflections').select('id', count='exact', head=True)),
+    )
+    source_count = sources_response.count or 0
+    assert source_count > 0, f"Found {source_count} migrated reflections ({reflections_response.count or 0} reflections)"
+
+    sample = sources_response.data[0]
+    assert 'reflection_id' in (sample.get('metadata') or {}), "Reflection metadata not properly structured"
+
+@pytest.mark.asyncio
+async def test_text_migration_integrity(db):
+    """Test that texts were migrated to content sources with their metadata."""
+    sources_response = await _execute(
+        db.table('content_sources').select('id,metadata', count='exact').eq('source_type', 'text').limit(1)
+    )
+    source_count = sources_response.count or 0
+    assert source_count > 0, f"Found {source_count} migrated texts"
+
+    sample = sources_response.data[0]
+    assert 'text_id' in (sample.get('metadata') or {}), "Text metadata not properly structured"
+
+@pytest.mark.asyncio
+async def test_get_content_sources(http_client):
+    """Test getting content sources."""
+    response = await http_client.get("/content-sources")
+    assert response.status_code in [200, 404], f"GET /content-sources returned {response.status_code}"
+
+@pytest.mark.asyncio
+async def test_content_source_lifecycle(http_client, cleanup):
+    """Test creating, re-weighting and deleting a content source in one batched round trip."""
+    results = await _batch(http_client, CONTENT_SOURCE_CALLS)
+    if results["create"]["status_code"] == 200 and results["delete"]["status_code"] != 200:
+        # Don't leave the source behind when the batched delete didn't go through
+        cleanup.append(http_client.delete(f"/content-sources/{results['create']['body']['id']}"))
+
+    assert results["create"]["status_code"] == 200, f"Failed to create content source: {results['create']['status_code']}"
+    assert results["update_weight"]["status_code"] == 200, f"Updated weight returned {results['update_weight']['status_code']}"
+    assert results["delete"]["status_code"] == 200, f"Delete content source returned {results['delete']['status_code']}"
+
+@pytest.mark.asyncio
+async def test_advanced_synthesis_api(http_client, test_realm):
+    """Test advanced synthesis API endpoints."""
+    # Synthesis and batch processing in one batched round trip
+    results = await _batch(http_client, _for_realm(SYNTHESIS_CALLS, test_realm["id"]))
+
+    response = results["synthesize"]
+    assert response["status_code"] == 200, f"Failed to start synthesis: {response['status_code']}"
+    job_id = response["body"].get("job_id")
+
+    # Test job status endpoint: the server holds each request (?wait=N) until the job
+    # changes status, so loop until it finishes or the deadline passes
+    if job_id:
+        deadline = time.monotonic() + JOB_STATUS_TIMEOUT_SECONDS
+        while True:
+            wait = max(1, int(deadline - time.monotonic()))
+            status_response = await http_client.get(
+                f"/synthesis-jobs/{job_id}", params={"wait": wait}, timeout=wait + 10
+            )
+            if (
+                status_response.status_code != 200
+                or orjson.loads(status_response.content).get("status") in ("completed", "failed")
+                or time.monotonic() >= deadline
+            ):
+                break
+        assert status_response.status_code == 200, f"Job status returned {status_response.status_code}"
+
+    batch_response = results["process_batch_queue"]
+    assert batch_response["status_code"] in [200, 204], f"Batch processing returned {batch_response['status_code']}"
+
+def test_synthesis_services(db):
+    """Test synthesis service components."""
+    if _SYNTH_IMPORT_ERROR is not None:
+        pytest.fail(f"Failed to import synthesis services: {str(_SYNTH_IMPORT_ERROR)}")
+
+    AdvancedSynthesisEngine(db)
+    SmartSynthesisManager(db)
+
+@pytest.mark.asyncio
+async def test_database_query_performance(db):
+    """
+    Test database throughput under a concurrent burst of small queries, each run in a
+    worker thread so the burst shares the client's connection pool.
+    """
+    async def _query():
+        return await _execute(db.table('content_sources').select('id').limit(1))
+
+    latencies, failures, rps = await _burst(_query)
+
+    assert not failures, f"{failures}/{BURST_SIZE} database queries failed"
+    p50, p95 = statistics.median(latencies), _p95(latencies)
+    logger.info("Database burst: %.1f queries/s, P50 %.0fms, P95 %.0fms", rps, p50 * 1000, p95 * 1000)
+    assert rps >= DB_MIN_RPS, f"Database handled {rps:.1f} queries/s (P50 {p50:.2f}s)"
+    assert p95 < DB_MAX_P95_SECONDS, f"Database P95 was {p95:.2f}s"
+
+@pytest.mark.asyncio
+async def test_api_response_performance(http_client):
+    """
+    Test API throughput under a concurrent burst on the pooled client; HEAD returns only
+    a count header, so this measures request handling rather than table size.
+    """
+    async def _request():
+        response = await http_client.head("/content-sources")
+        response.raise_for_status()
+
+    latencies, failures, rps = await _burst(_request)
+
+    assert not failures, f"{failures}/{BURST_SIZE} HEAD /content-sources requests failed"
+    p50, p95 = statistics.median(latencies), _p95(latencies)
+    logger.info("API burst: %.1f requests/s, P50 %.0fms, P95 %.0fms", rps, p50 * 1000, p95 * 1000)
+    assert rps >= API_MIN_RPS, f"API handled {rps:.1f} requests/s (P50 {p50:.2f}s)"
+    assert p95 < API_MAX_P95_SECONDS, f"API P95 was {p95:.2f}s"
+
+def main():
+    """Run these tests under pytest when the file is executed directly."""
+    sys.exit(pytest.main([__file__, "-v", *sys.argv[1:]]))
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    main()